@@ -0,0 +1,152 @@
+"""Shared Utilities for the Starter Template Benchmarks"""
+import atexit
+import contextlib
+import os
+import pathlib
+import shutil
+import statistics
+import sys
+import tempfile
+from typing import Any, Dict, Iterator, List, Sequence
+
+
+TEMPLATES_DIR = (
+    pathlib.Path(__file__).resolve().parent.parent / "starter_templates")
+
+
+# Questions about the default `sample.md` document of the documentation Q&A
+# templates.
+DOCUMENTATION_QA_QUESTIONS = [
+    "Can I create a model without validation?",
+    "What is ORM mode?",
+    "Can nested models have different config attributes?",
+    "How do I define a generic model?",
+    "How can I create a model dynamically at runtime?",
+    "What happens when a model receives extra fields?",
+    "How do private model attributes work?",
+    "Are Pydantic models immutable?",
+]
+
+
+def use_template(template_name: str) -> pathlib.Path:
+    """Makes the modules of a starter template importable.
+
+    The starter templates import their modules by bare name (e.g. `import
+    setup_db`) and use paths relative to the template directory (e.g. for
+    the vector DB), so the template directory is both prepended to `sys.path`
+    and made the working directory. Since templates share module names (e.g.
+    `app`), only one template should be used per process.
+
+    Args:
+        template_name: Name of the template directory within
+            `starter_templates`.
+
+    Returns:
+        Path to the template directory.
+    """
+    template_dir = TEMPLATES_DIR / template_name
+    os.chdir(template_dir)
+    sys.path.insert(0, str(template_dir))
+    return template_dir
+
+
+def use_template_copy(template_name: str) -> pathlib.Path:
+    """Makes the modules of a temporary copy of a starter template importable.
+
+    Like `use_template`, but for a copy of the template in a temporary
+    directory (excluding any local database), so that benchmarks can create
+    the template's database without overwriting the user's. The copy is
+    deleted when the process exits.
+
+    Args:
+        template_name: Name of the template directory within
+            `starter_templates`.
+
+    Returns:
+        Path to the copy of the template directory.
+    """
+    temp_dir = tempfile.mkdtemp(prefix=f"{template_name}_")
+    atexit.register(shutil.rmtree, temp_dir, ignore_errors=True)
+    template_dir = pathlib.Path(temp_dir) / template_name
+    shutil.copytree(
+        TEMPLATES_DIR / template_name,
+        template_dir,
+        ignore=shutil.ignore_patterns("chroma", "__pycache__"))
+    os.chdir(template_dir)
+    sys.path.insert(0, str(template_dir))
+    return template_dir
+
+
+def use_fake_openai(base_url: str):
+    """Points OpenAI clients created after this call at a stub server.
+
+    Args:
+        base_url: Base URL of the stub server.
+    """
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "fake-api-key"
+
+
+def use_hparams(hparams: Dict[str, Any]):
+    """Overrides the values of hyperparameters read by the templates.
+
+    Outside of an Inductor test suite, `inductor.hparam` returns each
+    hyperparameter's default value; after this call, it returns the given
+    values instead, so that a benchmark can run a template with
+    non-default hyperparameters (e.g. to compare vector search backends).
+
+    Args:
+        hparams: Value of each overridden hyperparameter, by name.
+    """
+    import inductor  # pylint: disable=import-outside-toplevel
+    hparam = inductor.hparam
+
+    def hparam_override(name: str, default_value: Any) -> Any:
+        if name in hparams:
+            return hparams[name]
+        return hparam(name, default_value)
+
+    inductor.hparam = hparam_override
+
+
+@contextlib.contextmanager
+def suppress_stdout() -> Iterator[None]:
+    """Discards stdout within this context manager.
+
+    Used to silence per-call output (e.g. `inductor.log` warnings when the
+    app is run outside of an Inductor logger or test suite) during timed
+    benchmark runs.
+    """
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            yield
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Returns the given percentile of values, using linear interpolation.
+
+    Args:
+        values: Values to compute the percentile of.
+        pct: Percentile between 0 and 100.
+    """
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[
+        min(max(int(round(pct)), 1), 99) - 1]
+
+
+def format_row(columns: Sequence[object], widths: Sequence[int]) -> str:
+    """Returns a row of a fixed-width text table.
+
+    Args:
+        columns: Column values.
+        widths: Column widths. The first column is left-aligned and all
+            other columns are right-aligned.
+    """
+    cells: List[str] = []
+    for i, (column, width) in enumerate(zip(columns, widths)):
+        if isinstance(column, float):
+            column = f"{column:.3f}"
+        cells.append(
+            f"{column:<{width}}" if i == 0 else f"{column:>{width}}")
+    return "  ".join(cells)
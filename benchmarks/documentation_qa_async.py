@@ -0,0 +1,145 @@
+"""Throughput Benchmark: Sync vs. Async Documentation Q&A Bot
+
+Compares the throughput of `documentation_qa` (sync, sequential and with a
+thread pool) against `documentation_qa_async` (a single event loop) using a
+local OpenAI stub server with injected latency, so that results reflect the
+app's own overhead and concurrency rather than OpenAI's.
+
+Requires the documentation Q&A vector DB to have been created by running
+`python setup_db.py` within `starter_templates/documentation_qa`.
+
+Usage:
+    python benchmarks/documentation_qa_async.py --latency 0.2 --concurrency 64
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import time
+from typing import Callable, List, Tuple
+
+import common
+import fake_openai_server
+
+
+def _timed(func: Callable[[], object]) -> float:
+    """Returns the wall time in seconds taken to call func."""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _run_sync_sequential(
+    app, questions: List[str]) -> Tuple[float, List[float]]:
+    """Answers the questions one at a time with the sync app function.
+
+    Returns:
+        A tuple of (total wall time, per-question latencies).
+    """
+    start = time.perf_counter()
+    latencies = [
+        _timed(lambda q=question: app.documentation_qa(q))
+        for question in questions]
+    return time.perf_counter() - start, latencies
+
+
+def _run_sync_threaded(
+    app,
+    questions: List[str],
+    concurrency: int) -> Tuple[float, List[float]]:
+    """Answers the questions with the sync app function in a thread pool.
+
+    Returns:
+        A tuple of (total wall time, per-question latencies).
+    """
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        latencies = list(executor.map(
+            lambda q: _timed(lambda: app.documentation_qa(q)), questions))
+    return time.perf_counter() - start, latencies
+
+
+async def _run_async(
+    app,
+    questions: List[str],
+    concurrency: int) -> Tuple[float, List[float]]:
+    """Answers the questions concurrently with the async app function.
+
+    Returns:
+        A tuple of (total wall time, per-question latencies).
+    """
+    # Warm up within this event loop, as the async client's pooled
+    # connections are bound to the event loop that created them.
+    await app.documentation_qa_async(questions[0])
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(question: str) -> float:
+        async with semaphore:
+            question_start = time.perf_counter()
+            await app.documentation_qa_async(question)
+            return time.perf_counter() - question_start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(
+        *(answer(question) for question in questions))
+    return time.perf_counter() - start, list(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--num-questions", type=int, default=64,
+        help="Number of questions answered by each mode.")
+    parser.add_argument(
+        "--concurrency", type=int, default=32,
+        help="Maximum number of questions in flight at once.")
+    parser.add_argument(
+        "--latency", type=float, default=0.2,
+        help="Injected latency (in seconds) of each OpenAI API call.")
+    parser.add_argument(
+        "--skip-sequential", action="store_true",
+        help="Skip the (slow) sequential sync mode.")
+    args = parser.parse_args()
+
+    with fake_openai_server.FakeOpenAIServer(latency=args.latency) as server:
+        common.use_fake_openai(server.base_url)
+        common.use_template("documentation_qa")
+        import app  # pylint: disable=import-outside-toplevel,import-error
+
+        questions = list(itertools.islice(
+            itertools.cycle(common.DOCUMENTATION_QA_QUESTIONS),
+            args.num_questions))
+
+        results = []
+        with common.suppress_stdout():
+            # Warm up (e.g. load the embedding model) before timing.
+            app.documentation_qa(questions[0])
+
+            if not args.skip_sequential:
+                results.append(
+                    ("sync (sequential)",
+                     *_run_sync_sequential(app, questions)))
+            results.append(
+                (f"sync ({args.concurrency} threads)",
+                 *_run_sync_threaded(app, questions, args.concurrency)))
+            results.append(
+                (f"async ({args.concurrency} in flight)",
+                 *asyncio.run(_run_async(app, questions, args.concurrency))))
+
+    widths = [24, 10, 10, 10, 10]
+    print(common.format_row(
+        ["mode", "total_s", "req/s", "p50_s", "p99_s"], widths))
+    for mode, total, latencies in results:
+        print(common.format_row(
+            [mode,
+             total,
+             len(latencies) / total,
+             common.percentile(latencies, 50),
+             common.percentile(latencies, 99)],
+            widths))
+
+
+if __name__ == "__main__":
+    main()
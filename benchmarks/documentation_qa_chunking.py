@@ -0,0 +1,113 @@
+"""Chunking Benchmark: Chunk Size Sweep for Documentation Q&A Retrieval
+
+Sweeps the chunk size (see `chunking.ChunkingConfig`) that
+`setup_db.py --chunk-size` splits the documentation Q&A bot's Markdown
+files with, from one node per section (the default) down to small
+token-bounded chunks. For each chunk size, reports:
+- The number of nodes and their mean, median and maximum size in tokens.
+- The total number of tokens embedded (which, with chunk overlap, can exceed
+  the size of the documents), as a proxy for embedding time.
+- Recall@k of BM25 keyword search over the nodes (see
+  `documentation_qa_retrieval.py`), where a node counts as the labelled
+  section if it has the section's citation URL.
+- The mean number of tokens of the top max(k) nodes, i.e. the context tokens
+  that retrieving them adds to the prompt.
+
+Only the keyword index is evaluated, as it requires no embedding model, so
+no database needs to be set up. Tokens are counted with the gpt-4o
+tokenizer, which tiktoken downloads on first use.
+
+Usage:
+    python benchmarks/documentation_qa_chunking.py --chunk-sizes 512 256 128
+"""
+import argparse
+import statistics
+from typing import List, Optional
+
+import common
+import documentation_qa_retrieval
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--chunk-sizes", type=int, nargs="+", default=[512, 256, 128, 64],
+        help="Chunk sizes (in tokens) to sweep, besides one node per "
+             "section.")
+    parser.add_argument(
+        "--chunk-overlap", type=int, default=32,
+        help="Maximum overlap (in tokens) between consecutive chunks of a "
+             "section. Capped at a quarter of the chunk size.")
+    parser.add_argument(
+        "--min-chunk-size", type=int, default=32,
+        help="Sections smaller than this many tokens are merged.")
+    parser.add_argument(
+        "--k", type=int, nargs="+", default=[1, 2, 4, 8],
+        help="Values of k for which to report recall@k.")
+    args = parser.parse_args()
+
+    common.use_template("documentation_qa")
+    # pylint: disable=import-outside-toplevel,import-error,protected-access
+    import bm25
+    import chunking
+    import context_packing
+    import setup_db
+
+    sample_url = dict(setup_db._iter_markdown_files())["sample.md"]
+    chunk_sizes: List[Optional[int]] = [None, *args.chunk_sizes]
+    max_k = max(args.k)
+    widths = [10, 8, 10, 10, 10, 10] + [10] * len(args.k) + [12]
+    print(common.format_row(
+        ["chunk_size", "nodes", "mean_tok", "p50_tok", "max_tok",
+         "embed_tok", *(f"recall@{k}" for k in args.k), "context_tok"],
+        widths))
+    for chunk_size in chunk_sizes:
+        config = chunking.ChunkingConfig(
+            chunk_size=chunk_size,
+            chunk_overlap=(
+                min(args.chunk_overlap, chunk_size // 4) if chunk_size
+                else 0),
+            min_chunk_size=args.min_chunk_size)
+        nodes = []
+        for file_path, base_url in setup_db._iter_markdown_files():
+            nodes.extend(
+                setup_db._get_nodes_from_file(file_path, base_url, config))
+        node_tokens = [
+            context_packing.count_tokens(node.text) for node in nodes]
+        index = bm25.BM25Index.build(
+            [node.id for node in nodes],
+            [node.text for node in nodes],
+            [node.metadata or {} for node in nodes])
+
+        ranks = []
+        context_tokens = []
+        for question, header in documentation_qa_retrieval.LABELLED_QUESTIONS:
+            # The citation URL of the labelled section of `sample.md`, as
+            # derived from its header by `setup_db.py`.
+            url = f"{sample_url}#{'-'.join(header.lower().split())}"
+            result = index.search(question, max_k)
+            urls = [metadata.get("url") for metadata in result["metadatas"][0]]
+            ranks.append(urls.index(url) + 1 if url in urls else None)
+            context_tokens.append(sum(
+                context_packing.count_tokens(document)
+                for document in result["documents"][0]))
+
+        recalls = [
+            sum(rank is not None and rank <= k for rank in ranks) / len(ranks)
+            for k in args.k]
+        print(common.format_row(
+            [chunk_size or "section",
+             len(nodes),
+             statistics.mean(node_tokens),
+             statistics.median(node_tokens),
+             max(node_tokens),
+             sum(node_tokens),
+             *recalls,
+             statistics.mean(context_tokens)],
+            widths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Spike Benchmark: Request Coalescing in Documentation Q&A Bot
+
+Simulates a spike of a popular question by sending many identical questions
+to the documentation Q&A bot at once, from a thread pool (`documentation_qa`)
+and from a single event loop (`documentation_qa_async`), with request
+coalescing (see `caching.SingleFlight`) disabled and enabled. Reports the
+number of OpenAI API calls made, the wall time and p50/p99 latency of the
+spike, and the number of coalesced questions.
+
+Runs against a temporary copy of the template, a local OpenAI stub server
+with injected latency and deterministic fake embeddings, so no database needs
+to be set up and no network access is needed.
+
+Usage:
+    python benchmarks/documentation_qa_coalescing.py --num-questions 64
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import time
+from typing import List, Tuple
+
+import common
+import fake_embeddings
+import fake_openai_server
+
+
+def _run_threaded(
+    app, questions: List[str]) -> Tuple[float, List[float]]:
+    """Answers the questions with the sync app function, all at once.
+
+    Returns:
+        A tuple of (total wall time, per-question latencies).
+    """
+    def answer(question: str) -> float:
+        question_start = time.perf_counter()
+        app.documentation_qa(question)
+        return time.perf_counter() - question_start
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(len(questions)) as executor:
+        latencies = list(executor.map(answer, questions))
+    return time.perf_counter() - start, latencies
+
+
+async def _run_async(app, questions: List[str]) -> Tuple[float, List[float]]:
+    """Answers the questions with the async app function, all at once.
+
+    Returns:
+        A tuple of (total wall time, per-question latencies).
+    """
+    async def answer(question: str) -> float:
+        question_start = time.perf_counter()
+        await app.documentation_qa_async(question)
+        return time.perf_counter() - question_start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(
+        *(answer(question) for question in questions))
+    return time.perf_counter() - start, list(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--num-questions", type=int, default=64,
+        help="Number of identical questions in the spike.")
+    parser.add_argument(
+        "--latency", type=float, default=0.2,
+        help="Injected latency (in seconds) of each OpenAI API call.")
+    args = parser.parse_args()
+
+    with fake_openai_server.FakeOpenAIServer(latency=args.latency) as server:
+        common.use_fake_openai(server.base_url)
+        fake_embeddings.install()
+        common.use_template_copy("documentation_qa")
+        # pylint: disable=import-outside-toplevel,import-error
+        import setup_db
+        setup_db._create_collection()  # pylint: disable=protected-access
+        import app
+
+        # Questions differing only in whitespace are identical after
+        # normalization.
+        questions = [
+            common.DOCUMENTATION_QA_QUESTIONS[0] + " " * (i % 2)
+            for i in range(args.num_questions)]
+        results = []
+
+        def prepare(coalesce: bool) -> Tuple[int, int]:
+            """Prepares a spike, returning the current counts."""
+            app.COALESCE_REQUESTS = coalesce
+            # Clear the rephrase cache, which would otherwise answer the
+            # rephrase requests of all but the first spike.
+            app.rephrase_cache = app.caching.TwoTierCache(
+                max_size=app.REPHRASE_CACHE_MAX_SIZE)
+            return (server.num_chat_completions,
+                    app.engine.coalescer.stats["coalesced"])
+
+        def record(
+            mode: str,
+            coalesce: bool,
+            counts: Tuple[int, int],
+            spike_result: Tuple[float, List[float]]):
+            """Records the results of a spike."""
+            results.append((
+                f"{mode} ({'on' if coalesce else 'off'})",
+                server.num_chat_completions - counts[0],
+                app.engine.coalescer.stats["coalesced"] - counts[1],
+                *spike_result))
+
+        async def run_async_spikes():
+            # Both async spikes run in the same event loop, as the async
+            # client's pooled connections are bound to the event loop that
+            # created them.
+            for coalesce in (False, True):
+                counts = prepare(coalesce)
+                record("async", coalesce, counts,
+                       await _run_async(app, questions))
+
+        with common.suppress_stdout():
+            app.warm_up()
+            for coalesce in (False, True):
+                counts = prepare(coalesce)
+                record("threads", coalesce, counts,
+                       _run_threaded(app, questions))
+            asyncio.run(run_async_spikes())
+
+    widths = [16, 10, 10, 10, 10, 10]
+    print(common.format_row(
+        ["mode", "api_calls", "coalesced", "total_s", "p50_s", "p99_s"],
+        widths))
+    for mode, num_calls, num_coalesced, total, latencies in results:
+        print(common.format_row(
+            [mode,
+             num_calls,
+             num_coalesced,
+             total,
+             common.percentile(latencies, 50),
+             common.percentile(latencies, 99)],
+            widths))
+
+
+if __name__ == "__main__":
+    main()
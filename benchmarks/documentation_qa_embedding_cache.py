@@ -0,0 +1,162 @@
+"""Embedding Cache Benchmark: Cold vs. Warm Re-Ingestion of Documentation Q&A
+
+Measures how much the on-disk embedding cache (`embedding_cache.py`, shared
+by the starter templates) saves when `setup_db.py` re-creates the
+documentation Q&A bot's vector DB from scratch. Each scenario rebuilds the
+vector DB (`python setup_db.py`) and reports its wall time, the number of
+texts embedded by the model (cache misses) and served from the cache (cache
+hits), and the size of the cache on disk:
+- "no cache": The cache is disabled (`EMBEDDING_CACHE_DIR=""`).
+- "cold cache": The cache is empty, so every node is embedded and cached.
+- "warm cache": Every node is cached, so none is embedded.
+- "warm, 1 edit": A single section was edited since the last rebuild.
+- "warm, evicting": The cache is limited to half of the nodes
+  (`EMBEDDING_CACHE_MAX_SIZE_MB`), so nodes are evicted as they are added.
+
+Also reports the mean latency of embedding a question through the app's
+embedding function with a cold and a warm cache.
+
+The corpus consists of `--num-files` copies of the template's sample
+document, whose section headers are numbered so that no section is a
+duplicate of another. Runs against a temporary copy of the template, with a
+temporary cache directory, using deterministic fake embeddings with an
+injected per-text latency (to simulate the cost of a real embedding model),
+so no network access is needed.
+
+Usage:
+    python benchmarks/documentation_qa_embedding_cache.py --num-files 200
+"""
+import argparse
+import atexit
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import List
+
+import common
+import fake_embeddings
+
+
+_HEADER_PATTERN = re.compile(r"^(#+ .*)$", re.MULTILINE)
+
+
+def _write_corpus(sample_path: str, num_files: int) -> List[str]:
+    """Writes the corpus of copies of the sample document.
+
+    Returns:
+        The path of each file of the corpus.
+    """
+    with open(sample_path, "r", encoding="utf-8") as f:
+        sample = f.read()
+    os.makedirs("corpus", exist_ok=True)
+    file_paths = []
+    for i in range(num_files):
+        file_path = os.path.join("corpus", f"page_{i}.md")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(_HEADER_PATTERN.sub(rf"\1 ({i})", sample))
+        file_paths.append(file_path)
+    return file_paths
+
+
+def _edit_section(file_path: str):
+    """Appends a sentence to the second section of a Markdown file."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    first_section_end = text.index("\n#", 1)
+    second_section_end = text.index("\n#", first_section_end + 1)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(
+            text[:second_section_end] + "\nAn edited sentence.\n"
+            + text[second_section_end:])
+
+
+def _disk_usage_mb(directory: str) -> float:
+    """Returns the disk space used by the files in a directory, in MB.
+
+    Counts allocated blocks, so sparse files only count their used parts.
+    """
+    return sum(
+        os.stat(os.path.join(directory, name)).st_blocks * 512
+        for name in os.listdir(directory)) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--num-files", type=int, default=50,
+        help="Number of Markdown files in the corpus.")
+    parser.add_argument(
+        "--seconds-per-text", type=float, default=0.002,
+        help="Injected latency (in seconds) of embedding each text.")
+    args = parser.parse_args()
+
+    fake_embeddings.install(seconds_per_text=args.seconds_per_text)
+    cache_dir = tempfile.mkdtemp(prefix="embedding_cache_")
+    atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+    common.use_template_copy("documentation_qa")
+    # pylint: disable=import-outside-toplevel,import-error,protected-access
+    import embedding_cache
+    import setup_db
+    setup_db.MARKDOWN_FILES = _write_corpus("sample.md", args.num_files)
+
+    widths = [16, 10, 10, 10, 10, 10]
+    print(common.format_row(
+        ["scenario", "seconds", "nodes", "embedded", "cached", "cache_mb"],
+        widths))
+    scenarios = [
+        ("no cache", "", None),
+        ("cold cache", os.path.join(cache_dir, "full"), None),
+        ("warm cache", os.path.join(cache_dir, "full"), None),
+        ("warm, 1 edit", os.path.join(cache_dir, "full"), "edit"),
+        ("warm, evicting", os.path.join(cache_dir, "half"), "half"),
+    ]
+    num_nodes = 0
+    for name, directory, change in scenarios:
+        os.environ[embedding_cache.CACHE_DIR_ENV_VAR] = directory
+        if change == "edit":
+            _edit_section(setup_db.MARKDOWN_FILES[0])
+        elif change == "half":
+            # Half of the (384-dimensional float32) embeddings of the nodes.
+            os.environ[embedding_cache.MAX_SIZE_MB_ENV_VAR] = str(
+                num_nodes * 384 * 4 / 2 / 2**20)
+            # Fills the cache, so that the measured rebuild evicts.
+            with common.suppress_stdout():
+                setup_db._ingest(reset=True)
+        cache = embedding_cache.get_cache(setup_db.EMBEDDING_MODEL_NAME)
+        stats_before = cache.stats if cache is not None else None
+        start = time.perf_counter()
+        with common.suppress_stdout():
+            _, report = setup_db._ingest(reset=True)
+        seconds = time.perf_counter() - start
+        num_nodes = report.num_nodes
+        if cache is None:
+            num_embedded, num_cached, cache_mb = report.num_added, 0, 0.0
+        else:
+            stats = cache.stats
+            num_embedded = stats["misses"] - stats_before["misses"]
+            num_cached = stats["hits"] - stats_before["hits"]
+            cache_mb = _disk_usage_mb(directory)
+        print(common.format_row(
+            [name, seconds, report.num_added, num_embedded, num_cached,
+             cache_mb],
+            widths))
+
+    os.environ[embedding_cache.CACHE_DIR_ENV_VAR] = os.path.join(
+        cache_dir, "questions")
+    embedding_function = setup_db.get_embedding_function()
+    for name in ("cold cache", "warm cache"):
+        start = time.perf_counter()
+        for question in common.DOCUMENTATION_QA_QUESTIONS:
+            embedding_function([question])
+        milliseconds = (
+            (time.perf_counter() - start) * 1000
+            / len(common.DOCUMENTATION_QA_QUESTIONS))
+        print(f"Question embedding ({name}): {milliseconds:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
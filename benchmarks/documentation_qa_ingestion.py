@@ -0,0 +1,210 @@
+"""Ingestion Benchmark: Full Rebuild vs. Incremental Sync of Documentation Q&A
+
+Measures how long `setup_db.py` takes to ingest the documentation Q&A bot's
+Markdown files when re-creating the vector DB from scratch, and when syncing
+it (`python setup_db.py --sync`) after no changes, after touching a file
+without changing it, and after editing a single section. Reports the wall
+time and the number of nodes added, deleted and left unchanged by each, along
+with setup_db.py's estimate of the embedding time saved.
+
+Each scenario is run with two ingestion configurations: "serial" (files are
+split in this process and all nodes are added in a single batch, as before
+ingestion was pipelined) and "pipelined" (files are split in worker processes
+while nodes are added in bounded batches, see `setup_db._ingest`). Each
+configuration runs in its own subprocess, so that its peak resident set size
+(RSS) is reported separately.
+
+The corpus consists of `--num-files` copies of the template's sample
+document, whose section headers are numbered so that no section is a
+duplicate of another. Runs against a temporary copy of the template, using
+deterministic fake embeddings with an injected per-text latency (to simulate
+the cost of a real embedding model), so no network access is needed.
+
+Usage:
+    python benchmarks/documentation_qa_ingestion.py --num-files 200
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+from typing import Any, Callable, Dict, List, Tuple
+
+import common
+import fake_embeddings
+
+
+# Maps each ingestion configuration to a tuple of (number of worker
+# processes, batch size), where None means setup_db.py's default.
+_CONFIGS = {
+    "serial": (1, 2**31 - 1),
+    "pipelined": (None, None),
+}
+
+# Each scenario is a tuple of (name, name of the function that changes the
+# files, whether the vector DB is re-created from scratch rather than
+# synced).
+_SCENARIOS = [
+    ("full rebuild", None, True),
+    ("sync (no changes)", None, False),
+    ("sync (touched)", "touch", False),
+    ("sync (1 edit)", "edit", False),
+]
+
+_HEADER_PATTERN = re.compile(r"^(#+ .*)$", re.MULTILINE)
+
+
+def _write_corpus(sample_path: str, num_files: int) -> List[str]:
+    """Writes the corpus of copies of the sample document.
+
+    Returns:
+        The path of each file of the corpus.
+    """
+    with open(sample_path, "r", encoding="utf-8") as f:
+        sample = f.read()
+    os.makedirs("corpus", exist_ok=True)
+    file_paths = []
+    for i in range(num_files):
+        file_path = os.path.join("corpus", f"page_{i}.md")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(_HEADER_PATTERN.sub(rf"\1 ({i})", sample))
+        file_paths.append(file_path)
+    return file_paths
+
+
+def _touch(file_path: str):
+    """Updates a file's modification time without changing its content."""
+    os.utime(file_path)
+
+
+def _edit_section(file_path: str):
+    """Appends a sentence to the second section of a Markdown file."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    first_section_end = text.index("\n#", 1)
+    second_section_end = text.index("\n#", first_section_end + 1)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(
+            text[:second_section_end] + "\nAn edited sentence.\n"
+            + text[second_section_end:])
+
+
+def _peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process, in MB."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    if sys.platform == "darwin":
+        return peak_rss / 2**20
+    return peak_rss / 2**10
+
+
+def _run_config(args: argparse.Namespace) -> Dict[str, Any]:
+    """Runs all scenarios with a single ingestion configuration.
+
+    Returns:
+        The benchmark results.
+    """
+    fake_embeddings.install(seconds_per_text=args.seconds_per_text)
+    common.use_template_copy("documentation_qa")
+    # pylint: disable=import-outside-toplevel,import-error,protected-access
+    import setup_db
+    setup_db.MARKDOWN_FILES = _write_corpus("sample.md", args.num_files)
+    changes: Dict[str, Callable[[], None]] = {
+        "touch": lambda: _touch(setup_db.MARKDOWN_FILES[0]),
+        "edit": lambda: _edit_section(setup_db.MARKDOWN_FILES[0]),
+    }
+    processes, batch_size = _CONFIGS[args.config]
+
+    scenarios = []
+    for name, change, reset in _SCENARIOS:
+        if change is not None:
+            changes[change]()
+        with common.suppress_stdout():
+            _, report = setup_db._ingest(
+                reset=reset,
+                processes=processes,
+                batch_size=batch_size or setup_db.INGEST_BATCH_SIZE)
+        scenarios.append({"scenario": name, **report.model_dump()})
+    return {"scenarios": scenarios, "peak_rss_mb": _peak_rss_mb()}
+
+
+def _run_config_subprocess(
+    config: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Runs all scenarios with a single ingestion configuration in a
+    subprocess.
+
+    Returns:
+        The benchmark results.
+    """
+    # Results are written to a file rather than stdout, as setup_db.py
+    # prints to stdout.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "results.json")
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__),
+             "--config", config,
+             "--output", output_path,
+             "--num-files", str(args.num_files),
+             "--seconds-per-text", str(args.seconds_per_text)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False)
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"Benchmark subprocess failed:\n{process.stderr}")
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--num-files", type=int, default=50,
+        help="Number of Markdown files in the corpus.")
+    parser.add_argument(
+        "--seconds-per-text", type=float, default=0.002,
+        help="Injected latency (in seconds) of embedding each text.")
+    # Used internally to run a single configuration in a subprocess.
+    parser.add_argument(
+        "--config", choices=sorted(_CONFIGS), help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.config is not None:
+        result = _run_config(args)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    results: List[Tuple[str, Dict[str, Any]]] = []
+    for config in _CONFIGS:
+        print(f"Benchmarking {config} ingestion...", file=sys.stderr)
+        results.append((config, _run_config_subprocess(config, args)))
+
+    widths = [10, 20, 10, 8, 8, 10, 10, 12]
+    print(common.format_row(
+        ["config", "scenario", "seconds", "added", "deleted", "unchanged",
+         "saved_s", "peak_rss_mb"],
+        widths))
+    for config, result in results:
+        for scenario in result["scenarios"]:
+            print(common.format_row(
+                [config,
+                 scenario["scenario"],
+                 scenario["seconds"],
+                 scenario["num_added"],
+                 scenario["num_deleted"],
+                 scenario["num_unchanged"],
+                 scenario["seconds_saved"],
+                 result["peak_rss_mb"]],
+                widths))
+
+
+if __name__ == "__main__":
+    main()
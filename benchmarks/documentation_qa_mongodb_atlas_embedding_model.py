@@ -0,0 +1,128 @@
+"""Embedding Model Benchmark: Per-Request Loading vs. Shared Model Registry
+
+Measures the per-request latency of the documentation Q&A (MongoDB Atlas)
+bot when its embedding model is loaded on every request (constructing a
+`sentence_transformers.SentenceTransformer`, which reloads the model's
+weights from disk) vs. when it is served from the process-wide model
+registry (`setup_db.get_embedding_model`), loaded once by `app.warm_up()`.
+Reports p50/p99 request latency and p50 latency of the `embedding` stage
+(see `spans.py`) of each scenario.
+
+Runs against a temporary copy of the template, an in-memory fake MongoDB
+collection and a local OpenAI stub server with injected latency. Questions
+are not rephrased (`vector_query_text_type` is "original"), and the
+embedding cache is disabled, so that every request embeds its question.
+Sentence-Transformers must be installed; the template's real embedding model
+is used (and downloaded on first use), unless `--fake-embeddings` is passed,
+in which case loading a model is simulated by `--load-seconds` of latency.
+
+Usage:
+    python benchmarks/documentation_qa_mongodb_atlas_embedding_model.py \\
+        --num-requests 20
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from typing import Any
+
+import common
+import fake_embeddings
+import fake_mongodb
+import fake_openai_server
+
+
+def _install_slow_loading_fake_model(load_seconds: float):
+    """Makes loading a (fake) Sentence-Transformers model take time."""
+
+    class SlowLoadingSentenceTransformer(
+        fake_embeddings.FakeSentenceTransformer):
+        """Fake model whose construction simulates loading its weights."""
+
+        def __init__(self, *args: Any, **kwargs: Any):
+            time.sleep(load_seconds)
+            super().__init__(*args, **kwargs)
+
+    sys.modules["sentence_transformers"].SentenceTransformer = (
+        SlowLoadingSentenceTransformer)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--num-requests", type=int, default=20,
+        help="Number of requests per scenario.")
+    parser.add_argument(
+        "--latency", type=float, default=0.2,
+        help="Injected latency (in seconds) of each OpenAI API call.")
+    parser.add_argument(
+        "--fake-embeddings", action="store_true",
+        help="Use fake embeddings instead of the template's real embedding "
+             "model.")
+    parser.add_argument(
+        "--load-seconds", type=float, default=0.5,
+        help="Injected latency (in seconds) of loading the fake embedding "
+             "model (with --fake-embeddings only).")
+    args = parser.parse_args()
+
+    with fake_openai_server.FakeOpenAIServer(latency=args.latency) as server:
+        common.use_fake_openai(server.base_url)
+        if args.fake_embeddings:
+            fake_embeddings.install()
+            _install_slow_loading_fake_model(args.load_seconds)
+        # Disables the embedding cache, so that every request embeds its
+        # question (see `embedding_cache.py`).
+        os.environ["EMBEDDING_CACHE_DIR"] = ""
+        common.use_hparams({"vector_query_text_type": "original"})
+        common.use_template_copy("documentation_qa_mongodb_atlas")
+        # pylint: disable=import-outside-toplevel,import-error,protected-access
+        import app
+        import setup_db
+        import spans
+        setup_db._documentation_collection = fake_mongodb.FakeCollection()
+        with common.suppress_stdout():
+            setup_db._populate_collection()
+        questions = list(itertools.islice(
+            itertools.cycle(common.DOCUMENTATION_QA_QUESTIONS),
+            args.num_requests))
+
+        get_embedding_model = setup_db.get_embedding_model
+
+        def load_embedding_model(
+            model_name: str = setup_db.EMBEDDING_MODEL_NAME):
+            """Loads the embedding model, as if it were loaded per request."""
+            import sentence_transformers
+            return sentence_transformers.SentenceTransformer(model_name)
+
+        scenarios = [
+            ("per-request load", load_embedding_model),
+            ("shared registry", get_embedding_model),
+        ]
+        sink = spans.HistogramSink()
+        spans.enable(sink, log_to_inductor=False)
+        widths = [18, 10, 10, 14]
+        print(common.format_row(
+            ["scenario", "p50_ms", "p99_ms", "embedding_ms"], widths))
+        for name, get_model in scenarios:
+            setup_db.get_embedding_model = get_model
+            with common.suppress_stdout():
+                app.warm_up()
+                sink.reset()
+                latencies = []
+                for question in questions:
+                    start = time.perf_counter()
+                    app.documentation_qa(question)
+                    latencies.append(time.perf_counter() - start)
+            print(common.format_row(
+                [name,
+                 common.percentile(latencies, 50) * 1000,
+                 common.percentile(latencies, 99) * 1000,
+                 sink.summary()["embedding"]["p50"] * 1000],
+                widths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Near-Duplicate Benchmark: MinHash/LSH Detection at Scale
+
+Measures the throughput, memory use and accuracy of the documentation Q&A
+bot's near-duplicate detection (`near_duplicates.py`, enabled during
+ingestion by `setup_db.py --near-duplicate-threshold`) on a synthetic corpus
+of `--num-chunks` chunks, a fraction of which are near-duplicates of an
+earlier original chunk with a few words replaced (as in versioned copies of
+a page).
+
+Reports the time to compute the chunks' MinHash signatures and to add them
+to the LSH index, the throughput of both (and the projected time for a
+million chunks), the increase in peak resident set size (RSS) per chunk, and
+the recall (fraction of injected near-duplicates whose exact Jaccard
+similarity is at or above the threshold that were detected) and precision
+(fraction of detected near-duplicates whose exact Jaccard similarity to
+their representative is at or above the threshold).
+
+Needs no database or network access. Signatures are computed in this
+process; during ingestion, they are computed in the worker processes that
+split the files.
+
+Usage:
+    python benchmarks/documentation_qa_near_duplicates.py --num-chunks 1000000
+"""
+import argparse
+import random
+import resource
+import sys
+import time
+from typing import List, Optional, Set, Tuple
+
+import common
+
+
+def _peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process, in MB."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    if sys.platform == "darwin":
+        return peak_rss / 2**20
+    return peak_rss / 2**10
+
+
+def _generate_corpus(
+    num_chunks: int,
+    chunk_words: int,
+    duplicate_fraction: float,
+    max_edited_words: int,
+    seed: int) -> Tuple[List[str], List[Optional[int]]]:
+    """Generates a corpus of chunks with injected near-duplicates.
+
+    Returns:
+        A tuple of (the chunks, the index of the chunk that each chunk is a
+        near-duplicate of, or None for original chunks).
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(20000)]
+    # Zipf-like word frequencies, as in natural text.
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    chunks = []
+    sources: List[Optional[int]] = []
+    originals: List[int] = []
+    for i in range(num_chunks):
+        if originals and rng.random() < duplicate_fraction:
+            source = rng.choice(originals)
+            words = chunks[source].split()
+            for _ in range(rng.randint(0, max_edited_words)):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            chunks.append(" ".join(words))
+            sources.append(source)
+        else:
+            chunks.append(" ".join(
+                rng.choices(vocabulary, weights, k=chunk_words)))
+            sources.append(None)
+            originals.append(i)
+    return chunks, sources
+
+
+def _shingles(text: str, shingle_size: int) -> Set[Tuple[str, ...]]:
+    """Returns the set of shingles of a text, as in `near_duplicates.py`."""
+    # pylint: disable=import-outside-toplevel,import-error
+    import bm25
+    tokens = bm25.tokenize(text)
+    size = min(shingle_size, len(tokens))
+    return {
+        tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _jaccard(a: str, b: str, shingle_size: int) -> float:
+    """Returns the exact Jaccard similarity of the shingles of two texts."""
+    a_shingles = _shingles(a, shingle_size)
+    b_shingles = _shingles(b, shingle_size)
+    return len(a_shingles & b_shingles) / len(a_shingles | b_shingles)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--num-chunks", type=int, default=200000,
+        help="Number of chunks in the corpus.")
+    parser.add_argument(
+        "--chunk-words", type=int, default=100,
+        help="Number of words of each original chunk.")
+    parser.add_argument(
+        "--duplicate-fraction", type=float, default=0.3,
+        help="Fraction of chunks that are near-duplicates of another.")
+    parser.add_argument(
+        "--max-edited-words", type=int, default=5,
+        help="Maximum number of words replaced in a near-duplicate.")
+    parser.add_argument(
+        "--threshold", type=float, default=0.8,
+        help="Jaccard similarity threshold of near-duplicates.")
+    parser.add_argument(
+        "--num-perm", type=int, default=128,
+        help="Number of hash functions of each MinHash signature.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    common.use_template("documentation_qa")
+    # pylint: disable=import-outside-toplevel,import-error
+    import near_duplicates
+
+    print("Generating corpus...", file=sys.stderr)
+    chunks, sources = _generate_corpus(
+        args.num_chunks, args.chunk_words, args.duplicate_fraction,
+        args.max_edited_words, args.seed)
+    config = near_duplicates.NearDuplicateConfig(
+        threshold=args.threshold, num_perm=args.num_perm)
+    baseline_rss_mb = _peak_rss_mb()
+
+    print("Computing signatures...", file=sys.stderr)
+    start = time.perf_counter()
+    signatures = near_duplicates.MinHasher(config).signatures(chunks)
+    signature_seconds = time.perf_counter() - start
+
+    print("Indexing signatures...", file=sys.stderr)
+    index = near_duplicates.NearDuplicateIndex(config)
+    start = time.perf_counter()
+    representatives = [
+        index.add(i, signature) for i, signature in enumerate(signatures)]
+    index_seconds = time.perf_counter() - start
+    # The signatures of all chunks are held only by this benchmark, so their
+    # size is excluded from the memory used by detection.
+    rss_increase_mb = (
+        _peak_rss_mb() - baseline_rss_mb - signatures.nbytes / 2**20)
+
+    print("Checking accuracy...", file=sys.stderr)
+    num_expected = 0
+    num_found = 0
+    for i, source in enumerate(sources):
+        if (source is not None and
+            _jaccard(chunks[i], chunks[source], config.shingle_size)
+            >= args.threshold):
+            num_expected += 1
+            num_found += representatives[i] is not None
+    detected = [
+        (i, representative)
+        for i, representative in enumerate(representatives)
+        if representative is not None]
+    num_correct = sum(
+        _jaccard(chunks[i], chunks[representative], config.shingle_size)
+        >= args.threshold
+        for i, representative in detected)
+
+    num_clusters = sum(1 for _ in index.iter_clusters())
+    print(f"{args.num_chunks} chunks: {len(detected)} near-duplicates "
+          f"detected in {num_clusters} clusters, {len(index)} chunks kept.")
+    widths = [12, 10, 14, 18]
+    print(common.format_row(
+        ["stage", "seconds", "chunks_per_s", "s_per_1M_chunks"], widths))
+    for stage, seconds in (("signatures", signature_seconds),
+                           ("lsh_index", index_seconds)):
+        print(common.format_row(
+            [stage, seconds, args.num_chunks / seconds,
+             seconds / args.num_chunks * 1e6],
+            widths))
+    print(f"Peak RSS increase: {rss_increase_mb:.1f} MB "
+          f"({rss_increase_mb * 2**20 / args.num_chunks:.0f} bytes/chunk)")
+    print(f"Recall: {num_found / max(num_expected, 1):.3f} "
+          f"({num_found}/{num_expected})")
+    print(f"Precision: {num_correct / max(len(detected), 1):.3f} "
+          f"({num_correct}/{len(detected)})")
+
+
+if __name__ == "__main__":
+    main()
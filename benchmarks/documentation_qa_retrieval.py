@@ -0,0 +1,151 @@
+"""Retrieval Benchmark: Vector vs. BM25 vs. Hybrid Documentation Q&A Retrieval
+
+Compares the recall@k and latency of vector-only search (the Chroma
+collection), keyword-only search (the BM25 index) and hybrid search (the two
+fused using reciprocal rank fusion, as in the "hybrid" retrieval mode of
+`documentation_qa`) on a set of questions labelled with the section of
+`sample.md` that answers each of them. Recall@k is the fraction of questions
+for which the labelled section is among the top k results.
+
+No LLM API calls are made. Requires the documentation Q&A vector DB and BM25
+index to have been created by running `python setup_db.py` within
+`starter_templates/documentation_qa`.
+
+Usage:
+    python benchmarks/documentation_qa_retrieval.py --k 1 2 4
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import common
+
+
+# Questions about `sample.md`, each labelled with the header of the section
+# that answers it. Some questions mention API names verbatim, which keyword
+# search matches exactly, and others paraphrase the section's topic.
+LABELLED_QUESTIONS = [
+    ("Can I create a model without validation?",
+     "Creating models without validation"),
+    ("When should I use model_construct?",
+     "Creating models without validation"),
+    ("What is ORM mode?", "Arbitrary class instances"),
+    ("How do I use from_attributes?", "Arbitrary class instances"),
+    ("How do I define a generic model?", "Generic models"),
+    ("How can I create a model dynamically at runtime?",
+     "Dynamic model creation"),
+    ("What does create_model do?", "Dynamic model creation"),
+    ("How do private model attributes work?", "Private model attributes"),
+    ("What is PrivateAttr used for?", "Private model attributes"),
+    ("Are Pydantic models immutable?", "Faux immutability"),
+    ("When do I need to call model_rebuild?", "Rebuild model schema"),
+    ("What does model_validate_json do?", "Helper functions"),
+    ("What is raised when validation fails?", "Error handling"),
+    ("How do I make a field required?", "Required fields"),
+    ("How do I use a default_factory?", "Fields with dynamic default values"),
+    ("Can I use a list as a default value?",
+     "Fields with non-hashable default values"),
+    ("How are class variables treated by models?", "Class vars"),
+    ("Can I use match statements with models?",
+     "Structural pattern matching"),
+    ("How is the signature of a model's __init__ generated?",
+     "Model signature"),
+    ("Does Pydantic copy the values passed to a model?", "Attribute copies"),
+]
+
+
+def _header(document: str) -> str:
+    """Returns the header of a section created by `setup_db.py`."""
+    return document.split("\n", 1)[0].removeprefix("# ").strip()
+
+
+def _evaluate(
+    search: Callable[[str, int], Dict[str, Any]],
+    max_k: int) -> Tuple[List[Optional[int]], List[float]]:
+    """Runs each labelled question through a search function.
+
+    Args:
+        search: Function that returns a single-query-text query result for a
+            query text and number of results.
+        max_k: Number of results to retrieve per question.
+
+    Returns:
+        A tuple of (rank of the labelled section for each question, or None
+        if it was not retrieved; latency of each search in seconds).
+    """
+    ranks = []
+    latencies = []
+    for question, header in LABELLED_QUESTIONS:
+        start = time.perf_counter()
+        result = search(question, max_k)
+        latencies.append(time.perf_counter() - start)
+        headers = [_header(document) for document in result["documents"][0]]
+        ranks.append(headers.index(header) + 1 if header in headers else None)
+    return ranks, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--k", type=int, nargs="+", default=[1, 2, 4, 8],
+        help="Values of k for which to report recall@k.")
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="Number of times each question is searched, for latency.")
+    args = parser.parse_args()
+
+    common.use_template("documentation_qa")
+    # pylint: disable=import-outside-toplevel,import-error
+    import bm25
+    import setup_db
+
+    collection = setup_db.get_chroma_client().get_collection(
+        name=setup_db.COLLECTION_NAME)
+    load_start = time.perf_counter()
+    bm25_index = bm25.BM25Index.load(setup_db.BM25_INDEX_PATH)
+    load_time = time.perf_counter() - load_start
+
+    def vector_search(query: str, n_results: int) -> Dict[str, Any]:
+        return collection.query(query_texts=[query], n_results=n_results)
+
+    def hybrid_search(query: str, n_results: int) -> Dict[str, Any]:
+        return bm25.reciprocal_rank_fusion(
+            [vector_search(query, n_results),
+             bm25_index.search(query, n_results)],
+            n_results)
+
+    max_k = max(args.k)
+    # Warm up (e.g. load the embedding model) before timing.
+    vector_search(LABELLED_QUESTIONS[0][0], max_k)
+
+    results = []
+    for mode, search in (("vector", vector_search),
+                         ("bm25", bm25_index.search),
+                         ("hybrid", hybrid_search)):
+        latencies = []
+        for _ in range(args.repeat):
+            ranks, run_latencies = _evaluate(search, max_k)
+            latencies.extend(run_latencies)
+        results.append((mode, ranks, latencies))
+
+    print(f"BM25 index load time: {load_time * 1000:.1f} ms")
+    widths = [8] + [10] * len(args.k) + [10, 10]
+    print(common.format_row(
+        ["mode", *(f"recall@{k}" for k in args.k), "p50_ms", "p99_ms"],
+        widths))
+    for mode, ranks, latencies in results:
+        recalls = [
+            sum(rank is not None and rank <= k for rank in ranks) / len(ranks)
+            for k in args.k]
+        print(common.format_row(
+            [mode,
+             *recalls,
+             common.percentile(latencies, 50) * 1000,
+             common.percentile(latencies, 99) * 1000],
+            widths))
+
+
+if __name__ == "__main__":
+    main()
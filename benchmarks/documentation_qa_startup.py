@@ -0,0 +1,176 @@
+"""Startup Benchmark: Import-to-First-Answer Latency of Documentation Q&A Bot
+
+Measures how long a fresh process takes to import the documentation Q&A app
+and answer its first question, with and without calling `app.warm_up()`
+after import. Without warm-up, the vector DB client and embedding model are
+initialized lazily while answering the first question; with warm-up, that
+cost moves to startup, so that the first answer is as fast as subsequent
+ones.
+
+Each measurement runs in a fresh subprocess, against a temporary copy of the
+template (whose vector DB is created once, beforehand), and a local OpenAI
+stub server with injected latency. By default, deterministic fake embeddings
+are used so that no network access is needed; pass `--real-embeddings` to
+instead load the template's real embedding model (which is downloaded on
+first use).
+
+Usage:
+    python benchmarks/documentation_qa_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import common
+import fake_embeddings
+import fake_openai_server
+
+
+_MODES = ["lazy", "warm_up"]
+
+
+def _setup(args: argparse.Namespace):
+    """Creates the vector DB of the template copy in the working directory."""
+    if not args.real_embeddings:
+        fake_embeddings.install()
+    sys.path.insert(0, os.getcwd())
+    import setup_db  # pylint: disable=import-outside-toplevel,import-error
+    setup_db._create_collection()  # pylint: disable=protected-access
+
+
+def _measure(args: argparse.Namespace) -> Dict[str, float]:
+    """Measures the startup of the template copy in the working directory.
+
+    Returns:
+        The duration in seconds of each startup phase.
+    """
+    with fake_openai_server.FakeOpenAIServer(latency=args.latency) as server:
+        common.use_fake_openai(server.base_url)
+        sys.path.insert(0, os.getcwd())
+        question, next_question = common.DOCUMENTATION_QA_QUESTIONS[:2]
+
+        with common.suppress_stdout():
+            start = time.perf_counter()
+            # Installing the fake embeddings imports Chroma, which the app
+            # imports anyway, so it is included in the import time.
+            if not args.real_embeddings:
+                fake_embeddings.install()
+            import app  # pylint: disable=import-outside-toplevel,import-error
+            imported = time.perf_counter()
+            if args.mode == "warm_up":
+                app.warm_up()
+            warmed_up = time.perf_counter()
+            app.documentation_qa(question)
+            answered = time.perf_counter()
+            app.documentation_qa(next_question)
+            answered_next = time.perf_counter()
+
+    return {
+        "import": imported - start,
+        "warm_up": warmed_up - imported,
+        "first_answer": answered - warmed_up,
+        "import_to_first_answer": answered - start,
+        "next_answer": answered_next - answered,
+    }
+
+
+def _run_subprocess(
+    template_dir: str, phase_args: List[str]) -> Dict[str, Any]:
+    """Runs a phase of this benchmark in a subprocess.
+
+    Args:
+        template_dir: Directory of the template copy, used as the working
+            directory of the subprocess.
+        phase_args: Command line arguments of the subprocess.
+
+    Returns:
+        The results written by the subprocess, if any.
+    """
+    # Results are written to a file rather than stdout, as the app prints to
+    # stdout (e.g. when Inductor is not configured).
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "results.json")
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__),
+             *phase_args, "--output", output_path],
+            cwd=template_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False)
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"Benchmark subprocess failed:\n{process.stderr}")
+        if not os.path.exists(output_path):
+            return {}
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Number of fresh processes measured per mode.")
+    parser.add_argument(
+        "--latency", type=float, default=0.2,
+        help="Injected latency (in seconds) of each OpenAI API call.")
+    parser.add_argument(
+        "--real-embeddings", action="store_true",
+        help="Use the template's real embedding model instead of fake "
+             "embeddings.")
+    # Used internally to run a phase of the benchmark in a subprocess.
+    parser.add_argument(
+        "--phase", choices=["setup", "measure"], help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=_MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "setup":
+        _setup(args)
+        return
+    if args.phase == "measure":
+        result = _measure(args)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    shared_args = ["--latency", str(args.latency)]
+    if args.real_embeddings:
+        shared_args.append("--real-embeddings")
+    template_dir = str(common.use_template_copy("documentation_qa"))
+    _run_subprocess(template_dir, ["--phase", "setup", *shared_args])
+
+    results = {mode: [] for mode in _MODES}
+    for _ in range(args.repeat):
+        # Modes are interleaved so that both are equally affected by e.g.
+        # warm OS file caches.
+        for mode in _MODES:
+            results[mode].append(_run_subprocess(
+                template_dir,
+                ["--phase", "measure", "--mode", mode, *shared_args]))
+
+    phases = [
+        "import", "warm_up", "first_answer", "import_to_first_answer",
+        "next_answer"]
+    widths = [10] + [max(len(phase), 8) + 2 for phase in phases]
+    print(f"Median over {args.repeat} processes, in seconds:")
+    print(common.format_row(["mode", *phases], widths))
+    for mode, mode_results in results.items():
+        print(common.format_row(
+            [mode,
+             *(statistics.median(result[phase] for result in mode_results)
+               for phase in phases)],
+            widths))
+
+
+if __name__ == "__main__":
+    main()
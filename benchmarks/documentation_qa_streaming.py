@@ -0,0 +1,118 @@
+"""Latency Benchmark: Streaming vs. Non-Streaming Documentation Q&A Bot
+
+Measures time to first token (TTFT) separately from total latency for
+`documentation_qa` (non-streaming), `documentation_qa_stream` and
+`documentation_qa_stream_async`, using a local OpenAI stub server that
+streams tokens with injected latency.
+
+Requires the documentation Q&A vector DB to have been created by running
+`python setup_db.py` within `starter_templates/documentation_qa`.
+
+Usage:
+    python benchmarks/documentation_qa_streaming.py --latency 0.2 \\
+        --token-latency 0.02
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from typing import List, Tuple
+
+import common
+import fake_openai_server
+
+
+def _measure_non_streaming(app, question: str) -> Tuple[float, float]:
+    """Returns (TTFT, total latency) of a non-streaming question.
+
+    Without streaming, the first token is only available once the whole
+    answer has been generated, so TTFT equals the total latency.
+    """
+    start = time.perf_counter()
+    app.documentation_qa(question)
+    total = time.perf_counter() - start
+    return total, total
+
+
+def _measure_streaming(app, question: str) -> Tuple[float, float]:
+    """Returns (TTFT, total latency) of a streamed question."""
+    start = time.perf_counter()
+    ttft = None
+    for _ in app.documentation_qa_stream(question):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start
+
+
+async def _measure_streaming_async(app, question: str) -> Tuple[float, float]:
+    """Returns (TTFT, total latency) of a streamed question (async)."""
+    start = time.perf_counter()
+    ttft = None
+    async for _ in app.documentation_qa_stream_async(question):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--num-questions", type=int, default=16,
+        help="Number of questions answered by each mode.")
+    parser.add_argument(
+        "--latency", type=float, default=0.2,
+        help="Injected latency (in seconds) before each OpenAI API response.")
+    parser.add_argument(
+        "--token-latency", type=float, default=0.02,
+        help="Injected latency (in seconds) between streamed tokens.")
+    args = parser.parse_args()
+
+    with fake_openai_server.FakeOpenAIServer(
+        latency=args.latency, token_latency=args.token_latency) as server:
+        common.use_fake_openai(server.base_url)
+        common.use_template("documentation_qa")
+        import app  # pylint: disable=import-outside-toplevel,import-error
+
+        questions = list(itertools.islice(
+            itertools.cycle(common.DOCUMENTATION_QA_QUESTIONS),
+            args.num_questions))
+
+        results: List[Tuple[str, List[Tuple[float, float]]]] = []
+        with common.suppress_stdout():
+            # Warm up (e.g. load the embedding model) before timing.
+            app.documentation_qa(questions[0])
+
+            results.append(
+                ("non-streaming",
+                 [_measure_non_streaming(app, q) for q in questions]))
+            results.append(
+                ("streaming",
+                 [_measure_streaming(app, q) for q in questions]))
+
+            async def measure_all_async() -> List[Tuple[float, float]]:
+                return [
+                    await _measure_streaming_async(app, q)
+                    for q in questions]
+
+            results.append(
+                ("streaming (async)", asyncio.run(measure_all_async())))
+
+    widths = [20, 10, 10, 10, 10]
+    print(common.format_row(
+        ["mode", "ttft_p50", "ttft_p99", "total_p50", "total_p99"], widths))
+    for mode, measurements in results:
+        ttfts = [ttft for ttft, _ in measurements]
+        totals = [total for _, total in measurements]
+        print(common.format_row(
+            [mode,
+             common.percentile(ttfts, 50),
+             common.percentile(ttfts, 99),
+             common.percentile(totals, 50),
+             common.percentile(totals, 99)],
+            widths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Vector Store Benchmark: Chroma vs. In-Process NumPy Vector Search
+
+Compares the query latency of the documentation Q&A bot's two vector
+backends (the "vector_backend" hyperparameter): querying the Chroma
+collection (`collection.query`) vs. searching the in-process vector store
+(`vector_store.py`), which scores every memory-mapped embedding with a
+single matrix product. Both hold the same `--num-vectors` synthetic
+embeddings (random unit vectors, in clusters so that queries have close
+neighbors), and are queried with the same embeddings, so embedding time is
+excluded. Reports p50/p99 latency for batches of `--batch-size` queries and
+the recall@k of each backend against exact search (Chroma's HNSW index is
+approximate, the NumPy store is exact).
+
+Then loads the store in `--workers` processes at once, each searching it,
+and reports each process's resident set size (RSS) and proportional set size
+(PSS, which splits shared pages between the processes that map them) of
+the store's embeddings on Linux, showing that the processes share their
+pages.
+
+Needs no network access; the Chroma collection is created in a temporary
+directory.
+
+Usage:
+    python benchmarks/documentation_qa_vector_store.py --num-vectors 100000
+"""
+import argparse
+import atexit
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import common
+
+
+# Dimensionality of `all-MiniLM-L6-v2` embeddings.
+_DIMENSION = 384
+
+
+def _random_unit_vectors(
+    rng: np.random.Generator, centers: np.ndarray, num_vectors: int
+) -> np.ndarray:
+    """Returns random unit vectors near randomly chosen centers."""
+    vectors = centers[rng.integers(len(centers), size=num_vectors)]
+    vectors = vectors + 0.5 * rng.standard_normal(
+        (num_vectors, _DIMENSION), dtype=np.float32) / np.sqrt(_DIMENSION)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _no_embedding_function(texts: List[str]):
+    """Placeholder embedding function, as queries are given as embeddings."""
+    raise NotImplementedError
+
+
+def _mapped_file_memory_mb(file_name: str) -> Tuple[float, float]:
+    """Returns the RSS and PSS of the mappings of a file, in MB (Linux only).
+
+    Args:
+        file_name: Name of the mapped file.
+    """
+    values = {"Rss": 0.0, "Pss": 0.0}
+    in_mapping = False
+    with open("/proc/self/smaps", "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if not line[0].isupper():
+                # The header line of a mapping, starting with its address.
+                in_mapping = fields[-1].endswith(file_name)
+            elif in_mapping and fields[0][:-1] in values:
+                values[fields[0][:-1]] += int(fields[1]) / 1024
+    return values["Rss"], values["Pss"]
+
+
+def _worker(
+    store_path: str,
+    queries: np.ndarray,
+    barrier: Any) -> Tuple[float, float]:
+    """Searches the store, then measures the memory of its embeddings."""
+    # pylint: disable=import-outside-toplevel,import-error
+    import vector_store
+    store = vector_store.VectorStore(store_path, _no_embedding_function)
+    store.query(query_embeddings=queries, n_results=4)
+    barrier.wait()
+    memory = _mapped_file_memory_mb("embeddings.npy")
+    barrier.wait()
+    return memory
+
+
+def _percentiles(latencies: List[float]) -> Tuple[float, float]:
+    """Returns the p50 and p99 of latencies, in milliseconds."""
+    return (common.percentile(latencies, 50) * 1000,
+            common.percentile(latencies, 99) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--num-vectors", type=int, default=20000,
+        help="Number of vectors in the collection and the store.")
+    parser.add_argument(
+        "--num-queries", type=int, default=200,
+        help="Number of query batches per backend.")
+    parser.add_argument(
+        "--batch-size", type=int, default=1,
+        help="Number of query embeddings per query.")
+    parser.add_argument(
+        "--k", type=int, default=4,
+        help="Number of results per query.")
+    parser.add_argument(
+        "--workers", type=int, default=4,
+        help="Number of processes that load the store at once.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    common.use_template_copy("documentation_qa")
+    # pylint: disable=import-outside-toplevel,import-error
+    import chromadb
+    import vector_store
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal(
+        (max(args.num_vectors // 100, 1), _DIMENSION), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    embeddings = _random_unit_vectors(rng, centers, args.num_vectors)
+    ids = [f"doc-{i}" for i in range(args.num_vectors)]
+    documents = [f"Document {i}." for i in range(args.num_vectors)]
+    metadatas = [{"url": f"https://example.com/{i}"}
+                 for i in range(args.num_vectors)]
+    queries = [
+        _random_unit_vectors(rng, centers, args.batch_size)
+        for _ in range(args.num_queries)]
+
+    print("Building the Chroma collection and the vector store...",
+          file=sys.stderr)
+    temp_dir = tempfile.mkdtemp(prefix="vector_store_")
+    atexit.register(shutil.rmtree, temp_dir, ignore_errors=True)
+    client = chromadb.PersistentClient(path=os.path.join(temp_dir, "chroma"))
+    collection = client.create_collection(
+        name="benchmark", embedding_function=None)
+    batch_size = client.get_max_batch_size()
+    store_path = os.path.join(temp_dir, "vector_store")
+    with vector_store.VectorStoreWriter(
+        store_path, args.num_vectors) as writer:
+        for start in range(0, args.num_vectors, batch_size):
+            end = start + batch_size
+            collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end].tolist(),
+                documents=documents[start:end],
+                metadatas=metadatas[start:end])
+            writer.add(
+                ids[start:end], embeddings[start:end], documents[start:end],
+                metadatas[start:end])
+    store = vector_store.VectorStore(store_path, _no_embedding_function)
+
+    backends: Dict[str, Any] = {
+        "chroma": lambda query: collection.query(
+            query_embeddings=query.tolist(), n_results=args.k),
+        "numpy": lambda query: store.query(
+            query_embeddings=query, n_results=args.k),
+    }
+    widths = [8, 10, 10, 10]
+    print(common.format_row(
+        ["backend", "p50_ms", "p99_ms", f"recall@{args.k}"], widths))
+    for name, query_backend in backends.items():
+        # Warms up the backend (e.g. loads Chroma's index).
+        query_backend(queries[0])
+        latencies = []
+        num_found = 0
+        for query in queries:
+            start = time.perf_counter()
+            result = query_backend(query)
+            latencies.append(time.perf_counter() - start)
+            exact = np.argsort(-(query @ embeddings.T), axis=1)[:, :args.k]
+            for result_ids, exact_indices in zip(result["ids"], exact):
+                num_found += len(
+                    set(result_ids) & {ids[i] for i in exact_indices})
+        print(common.format_row(
+            [name, *_percentiles(latencies),
+             num_found / (args.num_queries * args.batch_size * args.k)],
+            widths))
+
+    if sys.platform != "linux":
+        print("Skipping the shared memory measurement (Linux only).",
+              file=sys.stderr)
+        return
+    print(f"Embeddings file: {embeddings.nbytes / 2**20:.1f} MB")
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Manager().Barrier(args.workers)
+    with context.Pool(args.workers) as pool:
+        memory = pool.starmap(
+            _worker, [(store_path, queries[0], barrier)] * args.workers)
+    widths = [8, 10, 10]
+    print(common.format_row(["worker", "rss_mb", "pss_mb"], widths))
+    for i, (rss_mb, pss_mb) in enumerate(memory):
+        print(common.format_row([i, rss_mb, pss_mb], widths))
+
+
+if __name__ == "__main__":
+    main()
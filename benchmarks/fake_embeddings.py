@@ -0,0 +1,135 @@
+"""Deterministic Fake Embeddings for Offline Benchmarks
+
+The starter templates embed text with `all-MiniLM-L6-v2`, either via
+Chroma's default embedding function or via Sentence-Transformers, both of
+which download the model on first use. The fake embeddings below require no
+network access or model download, are deterministic across runs and
+processes, and are cheap to compute, so that benchmarks measure the
+templates' own overhead. Texts that share words have similar embeddings, so
+retrieval still returns plausible results.
+"""
+import hashlib
+import os
+import re
+import sys
+import time
+from typing import Any, List, Sequence, Union
+
+import numpy as np
+
+
+# Dimensionality of `all-MiniLM-L6-v2` embeddings, which the fake embeddings
+# match so that they can be stored in the same indexes.
+EMBEDDING_DIMENSION = 384
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Seconds that the patched embedding models take to embed each text (see
+# `install`).
+_seconds_per_text = 0.0
+
+
+def embed(text: str, dimension: int = EMBEDDING_DIMENSION) -> np.ndarray:
+    """Returns a deterministic unit-length embedding of the text.
+
+    The embedding is a bag of hashed words: each word of the text adds 1 to
+    one dimension (chosen by hashing the word).
+
+    Args:
+        text: Text to embed.
+        dimension: Dimensionality of the embedding.
+    """
+    embedding = np.zeros(dimension, dtype=np.float32)
+    for word in _WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        embedding[int.from_bytes(digest[:8], "little") % dimension] += 1.0
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm > 0 else embedding
+
+
+# pylint: disable-next=redefined-builtin
+def _chroma_embedding_function_call(
+    self, input: Sequence[str]) -> List[List[float]]:
+    """Replacement for `__call__` of Chroma's default embedding function."""
+    del self  # Unused.
+    time.sleep(_seconds_per_text * len(input))
+    return [embed(text).tolist() for text in input]
+
+
+class FakeSentenceTransformer:
+    """Drop-in replacement for `sentence_transformers.SentenceTransformer`.
+
+    Only `encode` is supported.
+    """
+
+    def __init__(
+        self, model_name_or_path: str = "", *args: Any, **kwargs: Any):
+        """Create a FakeSentenceTransformer.
+
+        Args:
+            model_name_or_path: Name of the model being replaced.
+            *args: Ignored.
+            **kwargs: Ignored.
+        """
+        del args, kwargs  # Unused.
+        self.model_name_or_path = model_name_or_path
+
+    def encode(
+        self,
+        sentences: Union[str, Sequence[str]],
+        **kwargs: Any) -> np.ndarray:
+        """Embeds one or more texts.
+
+        Args:
+            sentences: Text or texts to embed.
+            **kwargs: Ignored (e.g. `batch_size`, `show_progress_bar`).
+
+        Returns:
+            An embedding for a single text, or an array with one embedding
+            per text otherwise.
+        """
+        del kwargs  # Unused.
+        if isinstance(sentences, str):
+            time.sleep(_seconds_per_text)
+            return embed(sentences)
+        time.sleep(_seconds_per_text * len(sentences))
+        if not sentences:
+            return np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        return np.stack([embed(text) for text in sentences])
+
+
+def install(seconds_per_text: float = 0.0):
+    """Replaces the templates' embedding models with fake embeddings.
+
+    Must be called before the template's modules are imported. Patches
+    Chroma's default embedding function (used by the Chroma-based templates)
+    and, if Sentence-Transformers is importable, its `SentenceTransformer`
+    class (used by the MongoDB Atlas template). Also disables the templates'
+    on-disk embedding cache (see `embedding_cache.py`), so that fake
+    embeddings are never cached alongside real ones; set the
+    EMBEDDING_CACHE_DIR environment variable to a temporary directory after
+    calling this function to use the cache.
+
+    Args:
+        seconds_per_text: Injected latency, in seconds, of embedding each
+            text (e.g. to simulate the cost of a real embedding model in
+            ingestion benchmarks).
+    """
+    global _seconds_per_text  # pylint: disable=global-statement
+    _seconds_per_text = seconds_per_text
+    os.environ["EMBEDDING_CACHE_DIR"] = ""
+    # pylint: disable=import-outside-toplevel
+    from chromadb.utils import embedding_functions
+    # Chroma's default embedding function is instantiated as a default
+    # argument value at import time, so its class is patched rather than
+    # replaced.
+    embedding_functions.ONNXMiniLM_L6_V2.__call__ = (
+        _chroma_embedding_function_call)
+
+    if "sentence_transformers" not in sys.modules:
+        try:
+            import sentence_transformers  # pylint: disable=unused-import
+        except ImportError:
+            return
+    sys.modules["sentence_transformers"].SentenceTransformer = (
+        FakeSentenceTransformer)
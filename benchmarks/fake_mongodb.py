@@ -0,0 +1,110 @@
+"""In-Memory Fake MongoDB Atlas Collection for Offline Benchmarks
+
+Implements the subset of the `pymongo` collection API used by the
+documentation Q&A (MongoDB Atlas) template, including `$vectorSearch`
+aggregation stages, so that the template can be benchmarked without a
+MongoDB Atlas cluster.
+"""
+import threading
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+
+class FakeCollection:
+    """Thread-safe, in-memory stand-in for a MongoDB Atlas collection.
+
+    Supports `insert_many`, `delete_many({})` and `aggregate` with pipelines
+    consisting of a `$vectorSearch` stage (exact search, scored by cosine
+    similarity) optionally followed by a `$project` stage.
+    """
+
+    def __init__(self):
+        """Create an empty FakeCollection."""
+        self._documents: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def insert_many(self, documents: List[Dict[str, Any]]):
+        """Inserts documents into the collection.
+
+        Args:
+            documents: Documents to insert.
+        """
+        with self._lock:
+            self._documents.extend(dict(document) for document in documents)
+
+    def delete_many(self, query: Dict[str, Any]):
+        """Deletes all documents from the collection.
+
+        Args:
+            query: Must be empty (i.e. match all documents).
+        """
+        if query:
+            raise NotImplementedError("Only empty queries are supported.")
+        with self._lock:
+            self._documents = []
+
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        """Returns the number of documents in the collection.
+
+        Args:
+            query: Must be empty (i.e. match all documents).
+        """
+        if query:
+            raise NotImplementedError("Only empty queries are supported.")
+        with self._lock:
+            return len(self._documents)
+
+    def aggregate(
+        self, pipeline: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Runs an aggregation pipeline.
+
+        Args:
+            pipeline: Pipeline consisting of a `$vectorSearch` stage,
+                optionally followed by a `$project` stage.
+
+        Returns:
+            An iterator over the resulting documents.
+        """
+        with self._lock:
+            documents = list(self._documents)
+        scores: List[float] = [0.0] * len(documents)
+        for stage in pipeline:
+            (operator, options), = stage.items()
+            if operator == "$vectorSearch":
+                documents, scores = _vector_search(documents, options)
+            elif operator == "$project":
+                documents = [
+                    _project(document, options, score)
+                    for document, score in zip(documents, scores)]
+            else:
+                raise NotImplementedError(
+                    f"Unsupported pipeline stage: {operator}")
+        return iter(documents)
+
+
+def _vector_search(documents, options):
+    """Returns the documents most similar to the query vector, with scores."""
+    if not documents:
+        return [], []
+    query_vector = np.asarray(options["queryVector"], dtype=np.float32)
+    vectors = np.asarray(
+        [document[options["path"]] for document in documents],
+        dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+    similarities = vectors @ query_vector / np.where(norms > 0, norms, 1.0)
+    top_indices = np.argsort(-similarities, kind="stable")[:options["limit"]]
+    return (
+        [documents[i] for i in top_indices],
+        [float(similarities[i]) for i in top_indices])
+
+
+def _project(document, projection, score):
+    """Applies a `$project` stage to a document."""
+    projected = {}
+    for field, value in projection.items():
+        if value == {"$meta": "vectorSearchScore"}:
+            projected[field] = score
+        elif value and field in document:
+            projected[field] = document[field]
+    return projected
@@ -0,0 +1,302 @@
+"""Local OpenAI-compatible Stub Server for Offline Benchmarks"""
+import argparse
+import http.server
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import uuid
+
+
+# Default text returned by the stub server for every chat completion. The text
+# is fixed so that benchmark runs are deterministic and comparable.
+FAKE_COMPLETION_TEXT = (
+    "This is a fake response generated by the local OpenAI stub server. "
+    "It has a fixed length so that benchmark results are comparable across "
+    "runs, and it cites a reference (https://example.com/docs#reference) "
+    "like a real documentation Q&A answer would.")
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handles requests to the stub server's OpenAI-compatible endpoints."""
+
+    # HTTP/1.1 is required so that clients can keep connections alive.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args: Any):
+        """Silences per-request logging."""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Dispatches a POST request to the matching endpoint."""
+        content_length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(content_length) or b"{}")
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            with self.server.lock:
+                self.server.num_chat_completions += 1
+            time.sleep(self.server.latency)
+            if body.get("stream", False):
+                self._stream_chat_completion(body)
+            else:
+                # Without streaming, the response is only sent once all of
+                # its tokens have been "generated".
+                time.sleep(self.server.token_latency * (
+                    len(_tokenize(self.server.completion_text)) - 1))
+                self._send_json(
+                    _chat_completion(body, self.server.completion_text))
+        else:
+            self._send_json(
+                {"error": {"message": f"Unknown endpoint: {self.path}"}},
+                status=404)
+
+    def _send_json(self, data: Dict[str, Any], status: int = 200):
+        """Sends a JSON response.
+
+        Args:
+            data: JSON-serializable response body.
+            status: HTTP status code.
+        """
+        encoded = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _send_chunk(self, data: bytes):
+        """Sends a single chunk of a chunked transfer-encoded response.
+
+        Args:
+            data: Chunk data. An empty chunk terminates the response.
+        """
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_chat_completion(self, body: Dict[str, Any]):
+        """Streams a chat completion as server-sent events.
+
+        Args:
+            body: Request body.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        tokens = _tokenize(self.server.completion_text)
+        for i, token in enumerate(tokens):
+            if i > 0:
+                time.sleep(self.server.token_latency)
+            delta = {"content": token}
+            if i == 0:
+                delta["role"] = "assistant"
+            self._send_event(_chat_completion_chunk(
+                completion_id, body, [
+                    {"index": 0, "delta": delta, "finish_reason": None}]))
+        self._send_event(_chat_completion_chunk(
+            completion_id, body, [
+                {"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage", False):
+            chunk = _chat_completion_chunk(completion_id, body, [])
+            chunk["usage"] = _usage(body, self.server.completion_text)
+            self._send_event(chunk)
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_event(self, data: Dict[str, Any]):
+        """Sends a single server-sent event containing JSON data.
+
+        Args:
+            data: JSON-serializable event data.
+        """
+        self._send_chunk(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+
+
+def _tokenize(text: str) -> List[str]:
+    """Splits text into whitespace-delimited "tokens" that rejoin to the text.
+
+    Args:
+        text: Text to split.
+    """
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + words[-1:]
+
+
+def _usage(body: Dict[str, Any], completion_text: str) -> Dict[str, int]:
+    """Returns approximate token usage for a chat completion request.
+
+    Token counts are approximated by whitespace-delimited word counts.
+
+    Args:
+        body: Request body.
+        completion_text: Text of the completion.
+    """
+    prompt_tokens = sum(
+        len(str(message.get("content", "")).split())
+        for message in body.get("messages", []))
+    completion_tokens = len(_tokenize(completion_text))
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _chat_completion(
+    body: Dict[str, Any], completion_text: str) -> Dict[str, Any]:
+    """Returns a chat completion response for the given request.
+
+    Args:
+        body: Request body.
+        completion_text: Text of the completion.
+    """
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{
+            "index": 0,
+            "message": {
+                "role": "assistant", "content": completion_text},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(body, completion_text),
+    }
+
+
+def _chat_completion_chunk(
+    completion_id: str,
+    body: Dict[str, Any],
+    choices: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Returns a streamed chat completion chunk.
+
+    Args:
+        completion_id: ID shared by all chunks of the completion.
+        body: Request body.
+        choices: Choices included in the chunk.
+    """
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": choices,
+    }
+
+
+class FakeOpenAIServer:
+    """Local OpenAI-compatible stub server with injected latency.
+
+    Serves the chat completions endpoint (including streaming) of the OpenAI
+    API from a background thread. Each request is handled in its own thread,
+    so many requests can be in flight at once.
+
+    Usage:
+        with FakeOpenAIServer(latency=0.2) as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            ...
+
+    Attributes:
+        latency: Seconds to wait before responding to each request (i.e. the
+            time to first token).
+        token_latency: Seconds taken to "generate" each token after the
+            first. Streamed responses wait this long between tokens, and
+            non-streamed responses wait for all of their tokens.
+        completion_text: Text returned for every chat completion.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        token_latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        completion_text: str = FAKE_COMPLETION_TEXT):
+        """Create a FakeOpenAIServer.
+
+        Args:
+            latency: Seconds to wait before responding to each request.
+            token_latency: Seconds taken to "generate" each token after the
+                first.
+            host: Host to bind to.
+            port: Port to bind to. If 0, a free port is chosen.
+            completion_text: Text returned for every chat completion (e.g.
+                a SQL statement, for the text to SQL app).
+        """
+        self._server = http.server.ThreadingHTTPServer(
+            (host, port), _RequestHandler, bind_and_activate=False)
+        # Allow many concurrent connection attempts, as benchmarks open
+        # hundreds of connections at once.
+        self._server.request_queue_size = 1024
+        self._server.daemon_threads = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self._server.latency = latency
+        self._server.token_latency = token_latency
+        self._server.completion_text = completion_text
+        self._server.num_chat_completions = 0
+        self._server.lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to use as the OpenAI client's `base_url`."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def num_chat_completions(self) -> int:
+        """Number of chat completion requests received so far."""
+        with self._server.lock:
+            return self._server.num_chat_completions
+
+    def start(self):
+        """Starts serving requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops serving requests."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--latency", type=float, default=0.0,
+        help="Seconds to wait before responding to each request.")
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0,
+        help="Seconds taken to generate each token after the first.")
+    parser.add_argument(
+        "--completion-text", default=FAKE_COMPLETION_TEXT,
+        help="Text returned for every chat completion.")
+    args = parser.parse_args()
+
+    fake_server = FakeOpenAIServer(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        host=args.host,
+        port=args.port,
+        completion_text=args.completion_text)
+    print(f"Serving fake OpenAI API at {fake_server.base_url}")
+    fake_server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake_server.stop()
@@ -0,0 +1,210 @@
+"""Splitting Benchmark: Streaming vs. In-Memory Markdown Splitting
+
+Measures the time and peak memory of splitting a large generated Markdown
+file into sections by header, using the documentation Q&A bot's streaming
+splitter (`setup_db._split_markdown_by_header`, which reads the file object
+line by line and yields sections lazily) vs. the previous implementation
+(which read the whole file into memory, split it into a list of lines and
+built each section by repeated string concatenation). Each implementation
+runs in its own subprocess, so that its peak resident set size (RSS) is
+reported separately, along with the increase in peak RSS caused by
+splitting (i.e. excluding the interpreter and imported modules).
+
+The streaming splitter's output is tested by the template's unit tests
+(`starter_templates/documentation_qa/setup_db_test.py`).
+
+Usage:
+    python benchmarks/markdown_splitting.py --size-mb 300
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+import common
+
+
+def _legacy_split_markdown_by_header(text: str) -> List[str]:
+    """The previous implementation of `_split_markdown_by_header`."""
+    chunks = []
+    lines = text.split("\n")
+    code_block = False
+    current_section = ""
+
+    for line in lines:
+        if line.startswith("```"):
+            code_block = not code_block
+        header_match = re.match(r"^(#+) +(.*)", line)
+        if header_match and not code_block:
+            if current_section != "":
+                chunks.append(current_section.strip())
+            current_section = f"# {header_match.group(2)}\n"
+        else:
+            current_section += line + "\n"
+    return chunks
+
+
+def _split_legacy(file_path: str) -> Iterable[str]:
+    """Splits a Markdown file with the previous implementation."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return _legacy_split_markdown_by_header(text)
+
+
+def _split_streaming(file_path: str) -> Iterator[str]:
+    """Splits a Markdown file with the streaming implementation."""
+    # pylint: disable=import-outside-toplevel,import-error,protected-access
+    import setup_db
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield from setup_db._split_markdown_by_header(f)
+
+
+_IMPLEMENTATIONS: Dict[str, Callable[[str], Iterable[str]]] = {
+    "legacy": _split_legacy,
+    "streaming": _split_streaming,
+}
+
+
+def _write_markdown(file_path: str, size_mb: float, section_lines: int):
+    """Writes a generated Markdown file of about the given size.
+
+    Every fifth section includes a code block with comment lines that look
+    like headers.
+    """
+    paragraph = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 2
+    code_block = "```python\n# Not a header.\nprint('Hello')\n```\n"
+    size = 0
+    i = 0
+    with open(file_path, "w", encoding="utf-8") as f:
+        while size < size_mb * 2**20:
+            section = [f"## Section {i}\n"]
+            section.extend(f"{paragraph}{j}\n" for j in range(section_lines))
+            if i % 5 == 0:
+                section.append(code_block)
+            text = "".join(section)
+            f.write(text)
+            size += len(text)
+            i += 1
+
+
+def _peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process, in MB."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    if sys.platform == "darwin":
+        return peak_rss / 2**20
+    return peak_rss / 2**10
+
+
+def _run_implementation(implementation: str, file_path: str) -> Dict[str, Any]:
+    """Splits the Markdown file with a single implementation.
+
+    Returns:
+        The benchmark results.
+    """
+    common.use_template("documentation_qa")
+    # pylint: disable=import-outside-toplevel,import-error,unused-import
+    import setup_db
+    baseline_rss_mb = _peak_rss_mb()
+    num_sections = 0
+    num_chars = 0
+    start = time.perf_counter()
+    for section in _IMPLEMENTATIONS[implementation](file_path):
+        num_sections += 1
+        num_chars += len(section)
+    seconds = time.perf_counter() - start
+    peak_rss_mb = _peak_rss_mb()
+    return {
+        "seconds": seconds,
+        "num_sections": num_sections,
+        "num_chars": num_chars,
+        "peak_rss_mb": peak_rss_mb,
+        "rss_increase_mb": peak_rss_mb - baseline_rss_mb,
+    }
+
+
+def _run_implementation_subprocess(
+    implementation: str, file_path: str) -> Dict[str, Any]:
+    """Splits the Markdown file with a single implementation in a
+    subprocess.
+
+    Returns:
+        The benchmark results.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "results.json")
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__),
+             "--implementation", implementation,
+             "--input", file_path,
+             "--output", output_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False)
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"Benchmark subprocess failed:\n{process.stderr}")
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--size-mb", type=float, default=200,
+        help="Size of the generated Markdown file, in MB.")
+    parser.add_argument(
+        "--section-lines", type=int, default=20,
+        help="Number of lines of text in each section.")
+    # Used internally to run a single implementation in a subprocess.
+    parser.add_argument(
+        "--implementation", choices=sorted(_IMPLEMENTATIONS),
+        help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.implementation is not None:
+        result = _run_implementation(args.implementation, args.input)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "large.md")
+        _write_markdown(file_path, args.size_mb, args.section_lines)
+        for implementation in _IMPLEMENTATIONS:
+            print(f"Benchmarking {implementation} splitting...",
+                  file=sys.stderr)
+            results.append((
+                implementation,
+                _run_implementation_subprocess(implementation, file_path)))
+
+    widths = [10, 10, 12, 12, 12, 16]
+    print(common.format_row(
+        ["splitter", "seconds", "sections", "mb_per_s", "peak_rss_mb",
+         "rss_increase_mb"],
+        widths))
+    for implementation, result in results:
+        print(common.format_row(
+            [implementation,
+             result["seconds"],
+             result["num_sections"],
+             result["num_chars"] / 2**20 / result["seconds"],
+             result["peak_rss_mb"],
+             result["rss_increase_mb"]],
+            widths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Load Test: Starter Template ASGI Servers
+
+Sends concurrent HTTP requests to a starter template's ASGI server (see the
+template's `server.py`) over keep-alive connections, and reports throughput
+(requests/sec), p50/p99 latency, p50/p99 time to first byte (for streaming
+requests) and the number of requests that failed, by status code (e.g. 503
+when the server's `--max-pending` limit is exceeded).
+
+By default, the server is started in a subprocess against a temporary copy
+of the template, a local OpenAI stub server with injected latency and
+deterministic fake embeddings (as in `templates_suite.py`), so that the load
+test runs with no network access. Alternatively, pass `--url` to load test
+an already running server.
+
+Usage:
+    python benchmarks/server_load_test.py --template documentation_qa \\
+        --concurrency 64 --max-concurrency 16 --stream
+    python benchmarks/server_load_test.py --template text_to_sql \\
+        --url http://127.0.0.1:8000/get_analytics_results
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+import common
+import fake_embeddings
+import fake_openai_server
+import templates_suite
+
+
+# Result of a request: (status code, latency, time to first byte of the
+# response body), with times in seconds.
+_Result = Tuple[int, float, Optional[float]]
+
+# Path of the endpoint served by each template's server.
+ENDPOINT_PATHS = {
+    "documentation_qa": "/documentation_qa",
+    "chat_with_pdfs": "/chat_with_pdf",
+    "text_to_sql": "/get_analytics_results",
+}
+
+
+def _request_body(template: str, text: str, stream: bool) -> Dict[str, Any]:
+    """Returns the body of a request to a template's server.
+
+    Args:
+        template: Name of the template.
+        text: Question or analytics text.
+        stream: Whether to request a streaming response.
+    """
+    if template == "documentation_qa":
+        return {"question": text, "stream": stream}
+    if template == "chat_with_pdfs":
+        return {"messages": [{"role": "user", "content": text}],
+                "stream": stream}
+    return {"analytics_text": text}
+
+
+def _serve(args: argparse.Namespace):
+    """Serves a template copy, against the stub server, until killed."""
+    completion_text = (
+        templates_suite.TEXT_TO_SQL_COMPLETION
+        if args.template == "text_to_sql"
+        else fake_openai_server.FAKE_COMPLETION_TEXT)
+    with fake_openai_server.FakeOpenAIServer(
+        latency=args.latency, completion_text=completion_text) as server:
+        common.use_fake_openai(server.base_url)
+        fake_embeddings.install()
+        common.use_template_copy(args.template)
+        templates_suite.SETUP_FUNCTIONS[args.template]()
+        # pylint: disable=import-outside-toplevel,import-error
+        import asgi
+        import server as template_server
+        asgi.serve(
+            template_server.create_app(
+                args.max_concurrency, args.max_pending),
+            port=args.port,
+            keep_alive=args.keep_alive)
+
+
+def _free_port() -> int:
+    """Returns a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(
+    args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    """Starts a template's server in a subprocess and waits until it is ready.
+
+    Returns:
+        A tuple of (server process, URL of the template's endpoint).
+    """
+    port = _free_port()
+    # The server's output is discarded, as the templates print to stdout
+    # (e.g. when Inductor is not configured).
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, os.path.abspath(__file__),
+         "--template", args.template,
+         "--serve",
+         "--port", str(port),
+         "--latency", str(args.latency),
+         "--max-concurrency", str(args.max_concurrency),
+         "--max-pending", str(args.max_pending),
+         "--keep-alive", str(args.keep_alive)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"Server exited with code {process.returncode}. Run it with "
+                "`--serve` to see its output.")
+        try:
+            if httpx.get(f"{base_url}/healthz").status_code == 200:
+                return process, base_url + ENDPOINT_PATHS[args.template]
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Timed out waiting for the server to start.")
+
+
+async def _send_request(
+    client: httpx.AsyncClient,
+    url: str,
+    body: Dict[str, Any]) -> _Result:
+    """Sends a request and reads its full response.
+
+    Returns:
+        A tuple of (status code, latency, time to first byte of the response
+        body). Times are in seconds.
+    """
+    start = time.perf_counter()
+    first_byte_time = None
+    async with client.stream("POST", url, json=body) as response:
+        async for chunk in response.aiter_bytes():
+            if chunk and first_byte_time is None:
+                first_byte_time = time.perf_counter() - start
+    return response.status_code, time.perf_counter() - start, first_byte_time
+
+
+async def _run_load(
+    url: str,
+    bodies: List[Dict[str, Any]],
+    concurrency: int) -> Tuple[float, List[_Result]]:
+    """Sends the requests from `concurrency` concurrent clients.
+
+    Returns:
+        A tuple of (total wall time, result of each request).
+    """
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        # Warm up (e.g. open connections) before timing.
+        await _send_request(client, url, bodies[0])
+        queue = collections.deque(bodies)
+        results = []
+
+        async def worker():
+            while queue:
+                results.append(
+                    await _send_request(client, url, queue.popleft()))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--template", choices=sorted(ENDPOINT_PATHS),
+        default="documentation_qa",
+        help="Template whose server is load tested.")
+    parser.add_argument(
+        "--url",
+        help="URL of the endpoint of an already running server. If not "
+             "given, a server is started against a local OpenAI stub server.")
+    parser.add_argument(
+        "--num-requests", type=int, default=256,
+        help="Number of requests sent.")
+    parser.add_argument(
+        "--concurrency", type=int, default=32,
+        help="Number of concurrent clients.")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Request streaming responses (documentation_qa and "
+             "chat_with_pdfs only).")
+    parser.add_argument(
+        "--latency", type=float, default=0.2,
+        help="Injected latency (in seconds) of each OpenAI API call, if the "
+             "server is started by this script.")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=16,
+        help="Server's maximum number of requests handled at once, if the "
+             "server is started by this script.")
+    parser.add_argument(
+        "--max-pending", type=int, default=64,
+        help="Server's maximum number of waiting requests, if the server is "
+             "started by this script.")
+    parser.add_argument(
+        "--keep-alive", type=float, default=5.0,
+        help="Server's keep-alive timeout in seconds, if the server is "
+             "started by this script.")
+    # Used internally to start the server in a subprocess.
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args)
+        return
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = _start_server(args)
+    try:
+        texts = (
+            templates_suite.TEXT_TO_SQL_QUESTIONS
+            if args.template == "text_to_sql"
+            else common.DOCUMENTATION_QA_QUESTIONS)
+        bodies = [
+            _request_body(args.template, text, args.stream)
+            for text in itertools.islice(
+                itertools.cycle(texts), args.num_requests)]
+        total, results = asyncio.run(
+            _run_load(url, bodies, args.concurrency))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    succeeded = [result for result in results if result[0] == 200]
+    failed = collections.Counter(
+        result[0] for result in results if result[0] != 200)
+    widths = [12, 10, 10, 10, 10, 10]
+    print(common.format_row(
+        ["", "req/s", "p50_s", "p99_s", "ttfb_p50_s", "ttfb_p99_s"], widths))
+    if succeeded:
+        latencies = [latency for _, latency, _ in succeeded]
+        first_byte_times = [
+            first_byte_time for _, _, first_byte_time in succeeded
+            if first_byte_time is not None]
+        print(common.format_row(
+            ["succeeded",
+             len(succeeded) / total,
+             common.percentile(latencies, 50),
+             common.percentile(latencies, 99),
+             common.percentile(first_byte_times, 50),
+             common.percentile(first_byte_times, 99)],
+            widths))
+    print(f"{len(succeeded)}/{len(results)} requests succeeded"
+          + "".join(f", {count} failed with status {status}"
+                    for status, count in sorted(failed.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Benchmark Suite: Throughput, Latency and Memory of All Starter Templates
+
+Runs each starter template's app function against a local OpenAI stub server
+with injected latency, using deterministic fake embeddings (and, for the
+MongoDB Atlas template, an in-memory fake collection), so that the suite runs
+on a laptop with no network access, OpenAI API key or database server. For
+each template, reports throughput (requests/sec), p50/p99 request latency,
+peak resident set size (RSS) and a per-stage latency breakdown (from the
+templates' latency spans, see `spans.py`).
+
+Each template runs in its own subprocess (as templates share module names
+such as `app`, and so that peak RSS is measured per template), against a
+temporary copy of the template, so that the templates' own databases are
+left untouched. Each template's dependencies (see its `requirements.txt`)
+must be installed; templates whose dependencies are missing are reported as
+failed and skipped.
+
+Templates run with their default hyperparameter values, unless overridden
+with `--hparam` (e.g. `--hparam vector_backend=numpy` searches the in-process
+vector store of each retrieval template, rather than its database), so that
+the same requests can be benchmarked under different configurations.
+
+Usage:
+    python benchmarks/templates_suite.py --latency 0.2 --concurrency 8
+    python benchmarks/templates_suite.py --templates text_to_sql
+    python benchmarks/templates_suite.py --hparam vector_backend=numpy
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import common
+import fake_embeddings
+import fake_mongodb
+import fake_openai_server
+
+
+TEMPLATE_NAMES = [
+    "documentation_qa",
+    "documentation_qa_mongodb_atlas",
+    "chat_with_pdfs",
+    "text_to_sql",
+]
+
+
+# Questions about the sample SQLite database of the text to SQL template.
+TEXT_TO_SQL_QUESTIONS = [
+    "Show me the three most expensive products",
+    "Show me the top three customers by number of orders",
+    "How many items were sold in september 2023",
+    "What store locations had the most sales",
+]
+
+# Completion returned by the stub server for the text to SQL template, which
+# must be valid SQL for the SQL validation and execution stages to run.
+TEXT_TO_SQL_COMPLETION = "SELECT COUNT(*) FROM customers;"
+
+# Name of the fake PDF added to the collection of the chat with PDFs
+# template. The template's PDFs are not downloaded (or parsed); instead, the
+# collection is populated with the sections of the documentation Q&A
+# template's sample document.
+_FAKE_PDF_NAME = "sample.pdf"
+
+
+def _setup_documentation_qa() -> Tuple[Callable[[str], Any], List[str]]:
+    """Sets up the documentation Q&A template.
+
+    Returns:
+        A tuple of (function that handles a request, requests).
+    """
+    # pylint: disable=import-outside-toplevel,import-error
+    import setup_db
+    setup_db._create_collection()  # pylint: disable=protected-access
+    import app
+    return app.documentation_qa, common.DOCUMENTATION_QA_QUESTIONS
+
+
+def _setup_documentation_qa_mongodb_atlas(
+    ) -> Tuple[Callable[[str], Any], List[str]]:
+    """Sets up the documentation Q&A (MongoDB Atlas) template.
+
+    Returns:
+        A tuple of (function that handles a request, requests).
+    """
+    # pylint: disable=import-outside-toplevel,import-error,protected-access
+    import setup_db
+    # The MongoDB collection is created on first use, so no MongoDB server
+    # is needed as long as a fake collection is provided beforehand.
+    setup_db._documentation_collection = fake_mongodb.FakeCollection()
+    setup_db._populate_collection()
+    import app
+    return app.documentation_qa, common.DOCUMENTATION_QA_QUESTIONS
+
+
+def _setup_chat_with_pdfs() -> Tuple[Callable[[str], Any], List[str]]:
+    """Sets up the chat with PDFs template.
+
+    Returns:
+        A tuple of (function that handles a request, requests).
+    """
+    # pylint: disable=import-outside-toplevel,import-error
+    import inductor
+    import setup_db
+
+    with open(
+        common.TEMPLATES_DIR / "documentation_qa" / "sample.md",
+        "r",
+        encoding="utf-8") as f:
+        sections = [
+            section.strip() for section in f.read().split("\n## ")
+            if section.strip()]
+    chroma_client = setup_db.get_chroma_client()
+    chroma_client.reset()
+    collection = chroma_client.create_collection(
+        name=setup_db.PDF_COLLECTION_NAME,
+        metadata={_FAKE_PDF_NAME: sections[0]})
+    collection.add(
+        documents=sections,
+        ids=[str(i) for i in range(len(sections))],
+        metadatas=[{"file_location": _FAKE_PDF_NAME}] * len(sections))
+    setup_db.write_vector_store(collection)
+    import app
+
+    def chat_with_pdf(question: str) -> str:
+        return app.chat_with_pdf(inductor.ChatSession(messages=[
+            inductor.ChatMessage(role="user", content=question)]))
+
+    return chat_with_pdf, common.DOCUMENTATION_QA_QUESTIONS
+
+
+def _setup_text_to_sql() -> Tuple[Callable[[str], Any], List[str]]:
+    """Sets up the text to SQL template.
+
+    Returns:
+        A tuple of (function that handles a request, requests).
+    """
+    import app  # pylint: disable=import-outside-toplevel,import-error
+    return app.get_analytics_results, TEXT_TO_SQL_QUESTIONS
+
+
+# Function that sets up each template (within a temporary copy of the
+# template), returning a tuple of (function that handles a request,
+# requests).
+SETUP_FUNCTIONS = {
+    "documentation_qa": _setup_documentation_qa,
+    "documentation_qa_mongodb_atlas": _setup_documentation_qa_mongodb_atlas,
+    "chat_with_pdfs": _setup_chat_with_pdfs,
+    "text_to_sql": _setup_text_to_sql,
+}
+
+
+def _parse_hparam(text: str) -> Tuple[str, Any]:
+    """Parses a `--hparam` argument of the form NAME=VALUE.
+
+    Values that are valid JSON (e.g. numbers and booleans) are parsed as
+    JSON; other values are kept as strings.
+    """
+    name, separator, value = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(
+            f"Expected NAME=VALUE, got {text!r}.")
+    try:
+        return name, json.loads(value)
+    except json.JSONDecodeError:
+        return name, value
+
+
+def _peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process, in MB."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    if sys.platform == "darwin":
+        return peak_rss / 2**20
+    return peak_rss / 2**10
+
+
+def _run_template(args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmarks a single template within this process.
+
+    Returns:
+        The benchmark results.
+    """
+    completion_text = (
+        TEXT_TO_SQL_COMPLETION if args.template == "text_to_sql"
+        else fake_openai_server.FAKE_COMPLETION_TEXT)
+    with fake_openai_server.FakeOpenAIServer(
+        latency=args.latency, completion_text=completion_text) as server:
+        common.use_fake_openai(server.base_url)
+        fake_embeddings.install()
+        common.use_hparams(dict(args.hparam))
+        common.use_template_copy(args.template)
+        # pylint: disable-next=import-outside-toplevel,import-error
+        import spans
+
+        with common.suppress_stdout():
+            handle_request, requests = SETUP_FUNCTIONS[args.template]()
+            requests = list(itertools.islice(
+                itertools.cycle(requests), args.num_requests))
+
+            sink = spans.HistogramSink()
+            spans.enable(sink, log_to_inductor=False)
+            # Warm up before timing.
+            handle_request(requests[0])
+            sink.reset()
+
+            def timed(request: str) -> float:
+                start = time.perf_counter()
+                handle_request(request)
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            with concurrent.futures.ThreadPoolExecutor(
+                args.concurrency) as executor:
+                latencies = list(executor.map(timed, requests))
+            total = time.perf_counter() - start
+
+    return {
+        "template": args.template,
+        "requests_per_second": len(latencies) / total,
+        "p50_seconds": common.percentile(latencies, 50),
+        "p99_seconds": common.percentile(latencies, 99),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": sink.summary(),
+    }
+
+
+def _run_template_subprocess(
+    template: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmarks a single template in a subprocess.
+
+    Returns:
+        The benchmark results, or a dictionary containing the "error" output
+        of the subprocess if it failed.
+    """
+    # Results are written to a file rather than stdout, as the templates
+    # print to stdout (e.g. when Inductor is not configured).
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "results.json")
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__),
+             "--template", template,
+             "--output", output_path,
+             "--latency", str(args.latency),
+             "--num-requests", str(args.num_requests),
+             "--concurrency", str(args.concurrency),
+             *itertools.chain.from_iterable(
+                 ("--hparam", f"{name}={json.dumps(value)}")
+                 for name, value in args.hparam)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False)
+        if process.returncode != 0:
+            return {"template": template, "error": process.stderr}
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def _print_results(results: List[Dict[str, Any]]):
+    """Prints the benchmark results of each template as tables."""
+    widths = [32, 10, 10, 10, 12]
+    print(common.format_row(
+        ["template", "req/s", "p50_s", "p99_s", "peak_rss_mb"], widths))
+    for result in results:
+        if "error" in result:
+            print(common.format_row([result["template"], "failed"], widths))
+            continue
+        print(common.format_row(
+            [result["template"],
+             result["requests_per_second"],
+             result["p50_seconds"],
+             result["p99_seconds"],
+             result["peak_rss_mb"]],
+            widths))
+
+    print()
+    widths = [32, 20, 8, 10, 10, 10]
+    print(common.format_row(
+        ["template", "stage", "count", "mean_ms", "p50_ms", "p99_ms"],
+        widths))
+    for result in results:
+        for stage, stats in sorted(result.get("stages", {}).items()):
+            print(common.format_row(
+                [result["template"],
+                 stage,
+                 stats["count"],
+                 stats["mean"] * 1000,
+                 stats["p50"] * 1000,
+                 stats["p99"] * 1000],
+                widths))
+
+    for result in results:
+        if "error" in result:
+            last_line = (result["error"].strip().splitlines() or [""])[-1]
+            print(f"\n{result['template']} failed: {last_line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--templates", nargs="+", choices=TEMPLATE_NAMES,
+        default=TEMPLATE_NAMES,
+        help="Templates to benchmark.")
+    parser.add_argument(
+        "--num-requests", type=int, default=64,
+        help="Number of requests sent to each template.")
+    parser.add_argument(
+        "--concurrency", type=int, default=8,
+        help="Number of threads sending requests to each template.")
+    parser.add_argument(
+        "--latency", type=float, default=0.2,
+        help="Injected latency (in seconds) of each OpenAI API call.")
+    parser.add_argument(
+        "--hparam", type=_parse_hparam, action="append", default=[],
+        metavar="NAME=VALUE",
+        help="Hyperparameter value used by every template, instead of its "
+             "default (e.g. vector_backend=numpy). May be repeated.")
+    # Used internally to benchmark a single template in a subprocess.
+    parser.add_argument("--template", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.template is not None:
+        result = _run_template(args)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    results = []
+    for template in args.templates:
+        print(f"Benchmarking {template}...", file=sys.stderr)
+        results.append(_run_template_subprocess(template, args))
+    _print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,102 @@
 """Chat with PDF Bot."""
 import copy
-from typing import List
+import threading
+from typing import Dict, Iterator, List, Optional
 
+import chromadb
 import inductor
 import openai
 
 import prompts
+import retrievers
 import setup_db
+import spans
+import vector_store
 
 
 openai_client = openai.OpenAI()
 
+# In-process vector store, loaded on first use (see `_get_vector_store`).
+_vector_store: Optional[vector_store.VectorStore] = None
+_vector_store_lock = threading.Lock()
 
-@inductor.logger
-def chat_with_pdf(session: inductor.ChatSession) -> str:
-    """Answer questions about a collection of PDFs.
-    
-    Specifically, answers questions about the collection of
-    PDFs specified in setup_db.py, which must be run before
-    running this function.
+
+def _get_vector_store() -> vector_store.VectorStore:
+    """Returns the in-process vector store created by `setup_db.py`.
+
+    The store is loaded at most once per process, on first use, so after
+    re-creating the collection (by running `python setup_db.py`), restart the
+    process.
+    """
+    global _vector_store  # pylint: disable=global-statement
+    with _vector_store_lock:
+        if _vector_store is None:
+            try:
+                _vector_store = vector_store.VectorStore(
+                    setup_db.VECTOR_STORE_PATH,
+                    setup_db.get_embedding_function())
+            except (FileNotFoundError, ValueError) as error:
+                print("Vector store not found or outdated. Please create the "
+                      "store by running `python3 setup_db.py`.")
+                raise error
+        return _vector_store
+
+
+def _get_retriever(collection: chromadb.Collection) -> retrievers.Retriever:
+    """Returns the retriever of the selected vector search backend.
+
+    If the "vector_backend" hyperparameter is "numpy", the in-process vector
+    store (see `vector_store.py`), which holds the same embeddings as the
+    vector DB in memory-mapped files, is searched instead of querying the
+    vector DB. Otherwise (if it is "chroma", the default), the vector DB is
+    queried.
+
+    Args:
+        collection: The vector DB collection.
+
+    Raises:
+        ValueError: If the "vector_backend" hyperparameter is not a supported
+            backend.
+    """
+    vector_backend = inductor.hparam("vector_backend", "chroma")
+    if vector_backend == "chroma":
+        return retrievers.ChromaRetriever(collection)
+    if vector_backend == "numpy":
+        return _get_vector_store()
+    raise ValueError(f"Unsupported vector backend: {vector_backend}")
+
+
+def warm_up():
+    """Initializes the app's vector DB client, retriever and embedding model.
+
+    These are otherwise initialized lazily, while answering the first
+    question. Call this function at startup (e.g. before serving requests) to
+    instead pay that cost upfront.
+    """
+    collection = setup_db.get_chroma_client().get_collection(
+        name=setup_db.PDF_COLLECTION_NAME,
+        embedding_function=setup_db.get_embedding_function())
+    _get_retriever(collection)
+    # Loads the embedding model, bypassing the embedding cache (in which the
+    # warm-up text is likely cached).
+    setup_db.get_embedding_function().embedding_function(["warm-up"])
+
+
+def _get_llm_messages(
+    session: inductor.ChatSession) -> List[Dict[str, str]]:
+    """Returns the LLM messages used to respond to a chat session.
+
+    Retrieves the contexts relevant to the session's latest messages from
+    the vector DB, and adds them to either the system message or the last
+    user message.
 
     Args:
         session: The user's chat session with the Chat with PDF bot.
-    
-    Returns:
-        The LLM response to the messages in the chat session.
     """
     try:
-        collection = setup_db.chroma_client.get_collection(
-            name=setup_db.PDF_COLLECTION_NAME)
+        collection = setup_db.get_chroma_client().get_collection(
+            name=setup_db.PDF_COLLECTION_NAME,
+            embedding_function=setup_db.get_embedding_function())
     except ValueError as error:
         print("Vector DB collection not found. Please create the collection "
               "by running `python3 setup_db.py`.")
@@ -50,30 +118,26 @@ def chat_with_pdf(session: inductor.ChatSession) -> str:
     inductor.log(query_messages, name="query_messages")
 
     # Perform the query with the specified number of results
-    query_result = collection.query(
-        query_texts=[m.content for m in query_messages],
-        n_results=inductor.hparam("query_result_num", 5))
-
-    # Need to flatten documents and metadatas list
-    def flatten(l: List[List[str]]) -> List[str]:
-        return [x for subl in l for x in subl]
-
-    documents = flatten(query_result["documents"])
-    metadatas = flatten(query_result["metadatas"])
-    ids = flatten(query_result["ids"])
+    # (The vector DB query includes embedding the query texts.)
+    with spans.span("vector_search"):
+        query_result = _get_retriever(collection).query(
+            [m.content for m in query_messages],
+            inductor.hparam("query_result_num", 5))
     inductor.log(query_result, name="query_result")
 
-     # Build the context from the query results, avoiding duplicates
+    # Build the context from the results of all query messages, avoiding
+    # duplicates
     contexts = []
     seen = set()
-    for document, metadata, doc_id in zip(documents, metadatas, ids):
-        if doc_id in seen:
-            continue
-        context = (
-            f"CONTEXT: {document}\n\n"
-            f"REFERENCE: {metadata.get('file_location')}\n\n")
-        contexts.append(context)
-        seen.add(doc_id)
+    for i in range(len(query_messages)):
+        for document in retrievers.get_documents(query_result, i):
+            if document.id in seen:
+                continue
+            context = (
+                f"CONTEXT: {document.text}\n\n"
+                f"REFERENCE: {document.metadata.get('file_location')}\n\n")
+            contexts.append(context)
+            seen.add(document.id)
     contexts = "\n\n".join(contexts)
     inductor.log(contexts, name="contexts")
 
@@ -96,11 +160,70 @@ def chat_with_pdf(session: inductor.ChatSession) -> str:
         # Retrieved context is added to the user messages
         session_copy.messages[-1].content += (f"\n\n{contexts}")
 
+    return (
+        [{"role": "system", "content": system_prompt}] +
+        session_copy.openai_messages())
+
+
+@inductor.logger
+def chat_with_pdf(session: inductor.ChatSession) -> str:
+    """Answer questions about a collection of PDFs.
+    
+    Specifically, answers questions about the collection of
+    PDFs specified in setup_db.py, which must be run before
+    running this function.
+
+    Args:
+        session: The user's chat session with the Chat with PDF bot.
+    
+    Returns:
+        The LLM response to the messages in the chat session.
+    """
+    messages = _get_llm_messages(session)
+
     # Generate response
-    response = openai_client.chat.completions.create(
-        messages=(
-            [{"role": "system", "content": system_prompt}] +
-            session_copy.openai_messages()),
-        model="gpt-4o")
+    with spans.span("llm") as llm_span:
+        response = openai_client.chat.completions.create(
+            messages=messages,
+            model="gpt-4o")
+        llm_span.set_token_usage(response.usage)
     response = response.choices[0].message.content
     return response
+
+
+def _iter_response_deltas(stream: openai.Stream) -> Iterator[str]:
+    """Yields the response text deltas of a streamed chat completion."""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+@inductor.logger
+def chat_with_pdf_stream(session: inductor.ChatSession) -> Iterator[str]:
+    """Answer questions about a collection of PDFs, streaming.
+
+    Streaming variant of `chat_with_pdf`. Retrieval is performed (and its
+    values logged) before this function returns, and the response is then
+    streamed from the LLM as it is generated.
+
+    `inductor.logger` wraps the returned iterator and, once it is exhausted,
+    logs the concatenation of the yielded deltas (i.e. the final assembled
+    response) as the output of this execution.
+
+    Args:
+        session: The user's chat session with the Chat with PDF bot.
+
+    Returns:
+        An iterator over the text deltas of the LLM response to the messages
+        in the chat session.
+    """
+    messages = _get_llm_messages(session)
+
+    # For streamed responses, the "llm" span measures the time until the
+    # stream is opened, rather than until the whole response is generated.
+    with spans.span("llm"):
+        stream = openai_client.chat.completions.create(
+            messages=messages,
+            model="gpt-4o",
+            stream=True)
+    return _iter_response_deltas(stream)
@@ -0,0 +1,416 @@
+"""On-Disk Embedding Cache
+
+Caches text embeddings on disk, keyed on the embedding model's name and a
+hash of the text, so that unchanged texts are not embedded again (e.g. when
+the vector DB is set up again, or when the same question is asked again).
+The cache is shared by all templates and processes that use the same cache
+directory and embedding model.
+
+The same module is included in each template that embeds text.
+"""
+import collections
+import contextlib
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import (
+    Callable, Dict, Iterator, List, Optional, Sequence, Tuple)
+
+import numpy as np
+
+
+# Environment variable of the directory where embeddings are cached. Defaults
+# to DEFAULT_CACHE_DIR. Set it to an empty string to disable the cache.
+CACHE_DIR_ENV_VAR = "EMBEDDING_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "llm_toolkit", "embeddings")
+
+# Environment variable of the maximum size of the cached embeddings of each
+# model, in MB. Defaults to DEFAULT_MAX_SIZE_MB (about 350,000 embeddings of
+# 384 dimensions). When the cache is full, the least recently used embeddings
+# are evicted.
+MAX_SIZE_MB_ENV_VAR = "EMBEDDING_CACHE_MAX_SIZE_MB"
+DEFAULT_MAX_SIZE_MB = 512
+
+# Number of seconds to wait for another process's transaction on the cache's
+# index before giving up.
+_SQLITE_TIMEOUT = 60
+
+# Minimum number of seconds between updates of the time a cached embedding
+# was last used. Lookups of embeddings whose time was updated more recently
+# than that are read-only, so least recently used embeddings are evicted at
+# this granularity.
+_LAST_USED_UPDATE_INTERVAL = 60
+
+# Maximum number of keys per SQL statement, below SQLite's limit on the
+# number of statement parameters.
+_MAX_KEYS_PER_STATEMENT = 500
+
+
+def _hash_text(text: str) -> str:
+    """Returns the cache key of a text (the hex SHA-256 digest of it)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _checksum(vector: np.ndarray) -> int:
+    """Returns the checksum of a cached embedding."""
+    return zlib.crc32(vector.tobytes())
+
+
+def _batched(items: Sequence, size: int) -> Iterator[Sequence]:
+    """Yields consecutive slices of items of at most the given size."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class EmbeddingCache:
+    """Thread- and process-safe on-disk cache of the embeddings of a model.
+
+    Embeddings are stored as rows of a float32 memory-mapped file
+    (`<model>.f32`), which is allocated sparsely at its maximum size, so
+    that it only takes up disk space for the rows that are used. An SQLite
+    database (`<model>.sqlite`) indexes the rows by the hash of their text,
+    along with the time each row was last used and a checksum of its
+    contents, and keeps track of the rows that were freed. New embeddings
+    are written to freed rows first, then to unused rows, and when the
+    cache is full, to the rows of the least recently used embeddings.
+
+    Lookups are read transactions, which run concurrently across processes
+    (the database is in write-ahead logging mode); a lookup only writes to
+    the index if the time an embedding was last used is older than
+    `_LAST_USED_UPDATE_INTERVAL`, or if a row's contents do not match its
+    checksum (e.g. as a process was interrupted while writing it), in which
+    case the embedding is treated as a miss and its row is freed. Insertions
+    are write transactions, which are serialized across threads and
+    processes.
+
+    Texts are hashed exactly, not normalized, as the embeddings of texts
+    that differ only in case or whitespace can differ.
+
+    Attributes:
+        model_name: Name of the embedding model.
+        max_size_bytes: Maximum size of the cached embeddings, in bytes.
+            Changing it (or the embedding dimension) clears the cache the
+            next time that embeddings are cached.
+    """
+
+    def __init__(self, directory: str, model_name: str, max_size_bytes: int):
+        """Opens the cache of a model, creating its files if needed.
+
+        Args:
+            directory: Directory of the cache's files.
+            model_name: Name of the embedding model. Embeddings of different
+                models are cached separately.
+            max_size_bytes: Maximum size of the cached embeddings, in bytes.
+        """
+        self.model_name = model_name
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(directory, exist_ok=True)
+        # The model name is sanitized for use in file names, and suffixed
+        # with its hash so that sanitized names cannot collide.
+        file_name = re.sub(r"[^\w.-]+", "_", model_name)
+        file_name = f"{file_name}-{_hash_text(model_name)[:8]}"
+        self._vectors_path = os.path.join(directory, f"{file_name}.f32")
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+        # Transactions are begun explicitly (see `_transaction`).
+        self._connection = sqlite3.connect(
+            os.path.join(directory, f"{file_name}.sqlite"),
+            timeout=_SQLITE_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False)
+        # Lets lookups read the index while another process writes to it.
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                "name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, row INTEGER NOT NULL, "
+                "checksum INTEGER NOT NULL, last_used REAL NOT NULL)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_used "
+                "ON entries (last_used)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_row ON entries (row)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS free_rows ("
+                "row INTEGER PRIMARY KEY)")
+
+    def __len__(self) -> int:
+        """Returns the number of cached embeddings."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counts (per text) since the cache was opened."""
+        with self._lock:
+            counts = dict(self._counts)
+        for name in ("hits", "misses"):
+            counts.setdefault(name, 0)
+        return counts
+
+    def get_or_compute(
+        self,
+        texts: Sequence[str],
+        compute: Callable[[List[str]], Sequence[Sequence[float]]]
+    ) -> np.ndarray:
+        """Returns the embeddings of texts, computing those not cached.
+
+        Args:
+            texts: Texts to embed.
+            compute: Function that embeds a list of texts with the cache's
+                model. Called at most once, with the distinct texts whose
+                embeddings are not cached, which are then cached.
+
+        Returns:
+            A (number of texts x embedding dimension) float32 array of the
+            embeddings of the texts, in order.
+        """
+        if not texts:
+            return np.asarray(compute([]), dtype=np.float32)
+        keys = [_hash_text(text) for text in texts]
+        embeddings = self._get(set(keys))
+        # Maps the keys of texts that are not cached to their texts.
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in embeddings:
+                missing.setdefault(key, text)
+        if missing:
+            computed = np.asarray(
+                compute(list(missing.values())), dtype=np.float32).reshape(
+                    len(missing), -1)
+            embeddings.update(zip(missing, computed))
+            self._put(list(missing), computed)
+        num_misses = sum(key in missing for key in keys)
+        with self._lock:
+            self._counts["hits"] += len(keys) - num_misses
+            self._counts["misses"] += num_misses
+        return np.stack([embeddings[key] for key in keys])
+
+    @contextlib.contextmanager
+    def _transaction(self, write: bool = True) -> Iterator[None]:
+        """Runs the enclosed statements in a transaction.
+
+        Args:
+            write: Whether the transaction writes to the index. Write
+                transactions are exclusive; other transactions only read
+                from it, concurrently with other processes.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def _open_vectors(self, dimension: Optional[int] = None) -> bool:
+        """Opens the memory-mapped embeddings, if they exist.
+
+        Must be called within a transaction (a write transaction if a
+        dimension is given). Reopens the embeddings if their
+        shape was changed (by another process) since they were opened.
+
+        Args:
+            dimension: Dimension of the embeddings to be inserted, or None
+                if none are. If given and the embeddings do not exist or have
+                a different dimension, they are (re)created empty.
+
+        Returns:
+            Whether the embeddings are open.
+        """
+        meta = dict(self._connection.execute(
+            "SELECT name, value FROM meta").fetchall())
+        shape = (meta.get("num_rows"), meta.get("dimension"))
+        exists = (
+            shape[0] is not None and os.path.exists(self._vectors_path))
+        if dimension is not None:
+            num_rows = max(self.max_size_bytes // (4 * dimension), 1)
+        if dimension is not None and (
+            not exists or shape != (num_rows, dimension)):
+            shape = (num_rows, dimension)
+            self._connection.execute("DELETE FROM entries")
+            self._connection.execute("DELETE FROM free_rows")
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                [("num_rows", num_rows), ("dimension", dimension)])
+            self._vectors = None
+            with open(self._vectors_path, "wb") as f:
+                # Truncating to the full size creates a sparse file.
+                f.truncate(4 * num_rows * dimension)
+        elif not exists:
+            return False
+        if self._vectors is None or self._vectors.shape != shape:
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r+", shape=shape)
+        return True
+
+    def _get(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Returns the cached embeddings of keys, marking them as used.
+
+        Args:
+            keys: Keys (text hashes) to look up.
+
+        Returns:
+            A dictionary mapping each key whose embedding is cached to its
+            embedding.
+        """
+        embeddings = {}
+        # Keys whose time of last use is to be updated.
+        stale = []
+        # Tuples of (key, row, checksum) of the entries whose row does not
+        # match its checksum.
+        corrupted = []
+        now = time.time()
+        with self._transaction(write=False):
+            if not self._open_vectors():
+                return embeddings
+            for batch in _batched(list(keys), _MAX_KEYS_PER_STATEMENT):
+                rows = self._connection.execute(
+                    "SELECT key, row, checksum, last_used FROM entries "
+                    f"WHERE key IN ({', '.join('?' * len(batch))})",
+                    batch).fetchall()
+                for key, row, checksum, last_used in rows:
+                    vector = np.array(self._vectors[row])
+                    if _checksum(vector) != checksum:
+                        corrupted.append((key, row, checksum))
+                        continue
+                    embeddings[key] = vector
+                    if now - last_used > _LAST_USED_UPDATE_INTERVAL:
+                        stale.append(key)
+        if stale or corrupted:
+            with self._transaction():
+                self._connection.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in stale])
+                for key, row, checksum in corrupted:
+                    # The entry may have been replaced (by another thread or
+                    # process) since it was looked up.
+                    if self._connection.execute(
+                        "DELETE FROM entries "
+                        "WHERE key = ? AND row = ? AND checksum = ?",
+                        (key, row, checksum)).rowcount:
+                        self._connection.execute(
+                            "INSERT OR IGNORE INTO free_rows (row) VALUES (?)",
+                            (row,))
+        return embeddings
+
+    def _put(self, keys: Sequence[str], vectors: np.ndarray):
+        """Caches embeddings, evicting the least recently used if needed.
+
+        Args:
+            keys: Keys (text hashes) of the embeddings.
+            vectors: (number of keys x dimension) array of the embeddings.
+        """
+        with self._transaction():
+            self._open_vectors(vectors.shape[1])
+            num_rows = len(self._vectors)
+            # Embeddings that were cached (by another thread or process)
+            # since they were looked up are skipped.
+            cached = set()
+            for batch in _batched(list(keys), _MAX_KEYS_PER_STATEMENT):
+                cached.update(key for (key,) in self._connection.execute(
+                    "SELECT key FROM entries WHERE key IN "
+                    f"({', '.join('?' * len(batch))})", batch))
+            new: List[Tuple[str, np.ndarray]] = [
+                (key, vector) for key, vector in zip(keys, vectors)
+                if key not in cached][-num_rows:]
+            if not new:
+                return
+
+            # Rows are used in order, so the rows after the last one that is
+            # used or free have never been used.
+            next_row = max(
+                self._connection.execute(
+                    f"SELECT COALESCE(MAX(row) + 1, 0) FROM {table}"
+                ).fetchone()[0]
+                for table in ("entries", "free_rows"))
+            rows = [row for (row,) in self._connection.execute(
+                "SELECT row FROM free_rows ORDER BY row LIMIT ?",
+                (len(new),))]
+            self._connection.executemany(
+                "DELETE FROM free_rows WHERE row = ?",
+                [(row,) for row in rows])
+            rows.extend(range(
+                next_row, min(next_row + len(new) - len(rows), num_rows)))
+            if len(rows) < len(new):
+                evicted = self._connection.execute(
+                    "SELECT key, row FROM entries ORDER BY last_used LIMIT ?",
+                    (len(new) - len(rows),)).fetchall()
+                self._connection.executemany(
+                    "DELETE FROM entries WHERE key = ?",
+                    [(key,) for key, _ in evicted])
+                rows.extend(row for _, row in evicted)
+
+            for row, (_, vector) in zip(rows, new):
+                self._vectors[row] = vector
+            self._vectors.flush()
+            now = time.time()
+            self._connection.executemany(
+                "INSERT INTO entries (key, row, checksum, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, row, _checksum(vector), now)
+                 for row, (key, vector) in zip(rows, new)])
+
+
+# Caches opened by this process, keyed by tuples of (directory, model name)
+# (see `get_cache`).
+_caches: Dict[Tuple[str, str], EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(model_name: str) -> Optional[EmbeddingCache]:
+    """Returns the cache of a model, opening it if needed.
+
+    Each model's cache is opened at most once per process (and cache
+    directory), on first use, in the directory given by the
+    EMBEDDING_CACHE_DIR environment variable.
+
+    Args:
+        model_name: Name of the embedding model.
+
+    Returns:
+        The model's cache, or None if the cache is disabled.
+    """
+    directory = os.environ.get(CACHE_DIR_ENV_VAR, DEFAULT_CACHE_DIR)
+    if not directory:
+        return None
+    directory = os.path.expanduser(directory)
+    with _caches_lock:
+        if (directory, model_name) not in _caches:
+            max_size_mb = float(os.environ.get(
+                MAX_SIZE_MB_ENV_VAR, DEFAULT_MAX_SIZE_MB))
+            _caches[directory, model_name] = EmbeddingCache(
+                directory, model_name, int(max_size_mb * 2**20))
+        return _caches[directory, model_name]
+
+
+def get_or_compute(
+    model_name: str,
+    texts: Sequence[str],
+    compute: Callable[[List[str]], Sequence[Sequence[float]]]
+) -> np.ndarray:
+    """Returns the embeddings of texts, using the model's cache if enabled.
+
+    Args:
+        model_name: Name of the embedding model.
+        texts: Texts to embed.
+        compute: Function that embeds a list of texts with the model.
+
+    Returns:
+        A (number of texts x embedding dimension) float32 array of the
+        embeddings of the texts, in order.
+    """
+    cache = get_cache(model_name)
+    if cache is None:
+        return np.asarray(compute(list(texts)), dtype=np.float32)
+    return cache.get_or_compute(texts, compute)
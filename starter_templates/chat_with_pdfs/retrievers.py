@@ -0,0 +1,206 @@
+"""Retrievers
+
+A retriever searches a collection of documents for the documents most
+relevant to query texts. RAG apps query their collection through the
+`Retriever` interface, so that the vector search backend can be selected
+(e.g. with a hyperparameter) without changing how the results are used.
+
+The same module is included, unchanged, in each template that retrieves
+documents by embedding similarity, including the retrievers of backends
+that the template does not use (e.g. the Chat with PDFs template only
+queries Chroma). This keeps the copies identical, so that a fix applies to
+every template as is, and a template can switch backends without porting a
+retriever. Retrievers do not import their backend's client library, so
+unused retrievers add no dependencies.
+
+Query results have the format of the results of a Chroma collection query:
+a dictionary mapping "ids", "documents", "metadatas" and (optionally)
+"distances" or "scores" to one list of results per query text, in order of
+relevance. Use `get_documents` to read the results of a query text.
+"""
+from typing import Any, Callable, Dict, List, Optional, Protocol, Sequence
+
+import pydantic
+
+
+# Keys of a query result.
+_RESULT_KEYS = ("ids", "documents", "metadatas", "distances")
+
+
+class Retriever(Protocol):
+    """Searches a collection of documents for documents relevant to texts.
+
+    Implementations:
+    - `ChromaRetriever`: Queries a Chroma collection.
+    - `MongoDBAtlasRetriever`: Runs MongoDB Atlas Vector Search queries.
+    - `vector_store.VectorStore`: Searches an in-process vector store.
+    """
+
+    def query(
+        self, query_texts: List[str], n_results: int) -> Dict[str, Any]:
+        """Returns the documents most relevant to each query text.
+
+        Args:
+            query_texts: Texts to query the collection with.
+            n_results: Maximum number of results per query text.
+
+        Returns:
+            The most relevant documents, in the format of a Chroma collection
+            query result, with one list of results per query text.
+        """
+
+
+class RetrievedDocument(pydantic.BaseModel):
+    """Container for a retrieved document.
+
+    Attributes:
+        id: Unique identifier of the document.
+        text: Text content of the document.
+        metadata: Metadata associated with the document (empty if it has
+            none).
+        distance: Distance between the document's embedding and the query
+            text's embedding (lower is more relevant), or None if the
+            retriever does not report distances.
+        score: Relevance score of the document (higher is more relevant),
+            or None if the retriever does not report scores.
+    """
+    id: str
+    text: str
+    metadata: Dict[str, Any] = pydantic.Field(default_factory=dict)
+    distance: Optional[float] = None
+    score: Optional[float] = None
+
+
+def get_documents(
+    query_result: Dict[str, Any],
+    query_index: int = 0) -> List[RetrievedDocument]:
+    """Returns the documents retrieved for a query text, in relevance order.
+
+    Args:
+        query_result: Result of a `Retriever.query` call.
+        query_index: Index of the query text within the query.
+    """
+    distances = query_result.get("distances")
+    scores = query_result.get("scores")
+    return [
+        RetrievedDocument(
+            id=document_id,
+            text=document,
+            metadata=metadata or {},
+            distance=distances[query_index][i] if distances else None,
+            score=scores[query_index][i] if scores else None)
+        for i, (document_id, document, metadata) in enumerate(zip(
+            query_result["ids"][query_index],
+            query_result["documents"][query_index],
+            query_result["metadatas"][query_index]))]
+
+
+class ChromaRetriever:
+    """Retriever that queries a Chroma collection.
+
+    The collection embeds the query texts with its embedding function.
+
+    Attributes:
+        collection: The Chroma collection.
+    """
+
+    def __init__(self, collection: Any):
+        """Create a ChromaRetriever.
+
+        Args:
+            collection: The Chroma collection (a `chromadb.Collection`).
+        """
+        self.collection = collection
+
+    def query(
+        self, query_texts: List[str], n_results: int) -> Dict[str, Any]:
+        """Returns the documents most relevant to each query text.
+
+        See `Retriever.query`.
+        """
+        result = self.collection.query(
+            query_texts=query_texts, n_results=n_results)
+        # Drops the keys that other retrievers do not return (e.g. "uris"),
+        # so that results can be compared across retrievers.
+        return {key: result[key] for key in _RESULT_KEYS}
+
+
+class MongoDBAtlasRetriever:
+    """Retriever that runs MongoDB Atlas Vector Search queries.
+
+    The query texts are embedded in a single call to the embedding function,
+    then each is searched with a `$vectorSearch` aggregation stage. Each
+    document of the collection must hold its unique identifier, text
+    content, metadata and embedding in its "id", "text", "metadata" and
+    `embedding_path` fields. Results include the vector search score of each
+    document (higher is more similar) under "scores", rather than distances.
+
+    Attributes:
+        collection: The MongoDB collection.
+        index_name: Name of the collection's vector search index.
+    """
+
+    def __init__(
+        self,
+        collection: Any,
+        embedding_function: Callable[
+            [List[str]], Sequence[Sequence[float]]],
+        index_name: str,
+        embedding_path: str = "text_embedding",
+        exact: bool = True):
+        """Create a MongoDBAtlasRetriever.
+
+        Args:
+            collection: The MongoDB collection (a
+                `pymongo.collection.Collection`).
+            embedding_function: Function used to embed query texts. Must be
+                the embedding function that the documents were embedded
+                with.
+            index_name: Name of the collection's vector search index.
+            embedding_path: Field of each document holding its embedding.
+            exact: Whether to run an exact nearest neighbor search, rather
+                than an approximate one.
+        """
+        self.collection = collection
+        self.index_name = index_name
+        self._embedding_function = embedding_function
+        self._embedding_path = embedding_path
+        self._exact = exact
+
+    def query(
+        self, query_texts: List[str], n_results: int) -> Dict[str, Any]:
+        """Returns the documents most relevant to each query text.
+
+        See `Retriever.query`.
+        """
+        result = {"ids": [], "documents": [], "metadatas": [], "scores": []}
+        for query_vector in self._embedding_function(query_texts):
+            pipeline = [
+                {
+                    "$vectorSearch": {
+                        "index": self.index_name,
+                        "path": self._embedding_path,
+                        "queryVector": list(query_vector),
+                        "exact": self._exact,
+                        "limit": n_results,
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "id": 1,
+                        "text": 1,
+                        "metadata": 1,
+                        "score": {"$meta": "vectorSearchScore"},
+                    }
+                },
+            ]
+            documents = list(self.collection.aggregate(pipeline))
+            result["ids"].append([document["id"] for document in documents])
+            result["documents"].append(
+                [document["text"] for document in documents])
+            result["metadatas"].append(
+                [document.get("metadata") for document in documents])
+            result["scores"].append(
+                [document["score"] for document in documents])
+        return result
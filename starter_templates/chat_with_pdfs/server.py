@@ -0,0 +1,97 @@
+"""ASGI Server for Chat with PDF Bot
+
+Serves `chat_with_pdf` over HTTP:
+
+    POST /chat_with_pdf
+        {"messages": [{"role": "user", "content": "What is attention?"}]}
+        -> {"answer": "..."}
+    POST /chat_with_pdf
+        {"messages": [{"role": "user", "content": "What is attention?"}],
+         "stream": true}
+        -> The answer, streamed as plain text as it is generated.
+
+Messages alternate between the "user" and the "program" (i.e. the bot).
+
+Usage:
+    python server.py --port 8000 --max-concurrency 16
+    curl localhost:8000/chat_with_pdf \\
+        -d '{"messages": [{"role": "user", "content": "What is attention?"}]}'
+    curl -N localhost:8000/chat_with_pdf \\
+        -d '{"messages": [{"role": "user", "content": "What is attention?"}],
+             "stream": true}'
+
+The app is warmed up (see `app.warm_up`) before the server accepts requests.
+Other ASGI servers can serve the app created by `create_app` (e.g. `uvicorn
+--factory server:create_app`).
+"""
+import argparse
+from typing import Any, Dict, Iterator
+
+import inductor
+import pydantic
+
+import app
+import asgi
+
+
+def _get_session(request: Dict[str, Any]) -> inductor.ChatSession:
+    """Returns the chat session of a chat with PDF request."""
+    messages = asgi.get_field(request, "messages", list)
+    try:
+        return inductor.ChatSession(messages=messages)
+    except pydantic.ValidationError as error:
+        raise asgi.BadRequestError(f"Invalid messages: {error}") from error
+
+
+def _chat_with_pdf(request: Dict[str, Any]) -> Dict[str, str]:
+    """Handles a (non-streaming) chat with PDF request."""
+    return {"answer": app.chat_with_pdf(_get_session(request))}
+
+
+def _chat_with_pdf_stream(request: Dict[str, Any]) -> Iterator[str]:
+    """Handles a streaming chat with PDF request."""
+    return app.chat_with_pdf_stream(_get_session(request))
+
+
+def create_app(max_concurrency: int = 16, max_pending: int = 64) -> asgi.App:
+    """Returns the ASGI app serving the chat with PDF bot.
+
+    Args:
+        max_concurrency: Maximum number of chat messages answered at once.
+        max_pending: Maximum number of chat messages waiting to be answered,
+            beyond which requests are rejected with a 503 status code.
+    """
+    return asgi.App(
+        {"/chat_with_pdf": asgi.Endpoint(
+            _chat_with_pdf, _chat_with_pdf_stream)},
+        max_concurrency=max_concurrency,
+        max_pending=max_pending,
+        on_startup=app.warm_up)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to.")
+    parser.add_argument(
+        "--port", type=int, default=8000, help="Port to bind to.")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=16,
+        help="Maximum number of chat messages answered at once.")
+    parser.add_argument(
+        "--max-pending", type=int, default=64,
+        help="Maximum number of chat messages waiting to be answered.")
+    parser.add_argument(
+        "--keep-alive", type=float, default=5.0,
+        help="Number of seconds to keep idle HTTP connections open.")
+    args = parser.parse_args()
+    asgi.serve(
+        create_app(args.max_concurrency, args.max_pending),
+        host=args.host,
+        port=args.port,
+        keep_alive=args.keep_alive)
+
+
+if __name__ == "__main__":
+    main()
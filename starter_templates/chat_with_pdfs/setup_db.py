@@ -1,16 +1,19 @@
 """Set up the Vector DB for Chat with PDF Bot"""
+import os
 import pathlib
 import tempfile
+import threading
 from typing import Dict, List, Optional, Union
 from urllib import request as url_request
 import uuid
 
 import chromadb
 from chromadb import config
+from chromadb.utils import embedding_functions
 import pydantic
 
-from unstructured.partition import pdf as unstructured_partition
-from unstructured.chunking import title as unstructured_chunking
+import embedding_cache
+import vector_store
 
 
 # A list of PDFs that will be used to create the collection.
@@ -24,9 +27,87 @@ PDF_FILES = [
 # Name of the collection
 PDF_COLLECTION_NAME = "llm_papers"
 
+# Name under which the embeddings of Chroma's default embedding function are
+# cached (see `get_embedding_function` and `embedding_cache.py`).
+EMBEDDING_MODEL_NAME = "chroma-onnx/all-MiniLM-L6-v2"
 
-chroma_client = chromadb.PersistentClient(
-    settings=config.Settings(allow_reset=True))
+# Path of the in-process vector store of the collection, searched by the app
+# instead of querying the vector DB when the "vector_backend" hyperparameter
+# is "numpy" (see `vector_store.py`).
+VECTOR_STORE_PATH = os.path.join("chroma", "vector_store")
+
+
+# Chroma client, created on first use (see `get_chroma_client`) rather than at
+# import time, as opening the persistent vector DB is slow.
+_chroma_client: Optional[chromadb.ClientAPI] = None
+_chroma_client_lock = threading.Lock()
+_embedding_function: Optional["CachedEmbeddingFunction"] = None
+_embedding_function_lock = threading.Lock()
+
+
+def get_chroma_client() -> chromadb.ClientAPI:
+    """Returns the Chroma client, creating it if needed.
+
+    The client is created at most once per process, on first use.
+    """
+    global _chroma_client  # pylint: disable=global-statement
+    with _chroma_client_lock:
+        if _chroma_client is None:
+            _chroma_client = chromadb.PersistentClient(
+                settings=config.Settings(allow_reset=True))
+        return _chroma_client
+
+
+class CachedEmbeddingFunction(
+    chromadb.EmbeddingFunction[chromadb.Documents]):
+    """Chroma embedding function whose embeddings are cached on disk.
+
+    Texts whose embeddings are in the embedding cache (see
+    `embedding_cache.py`) are not embedded again, so the wrapped embedding
+    function's model is only loaded once a text is not cached.
+
+    Attributes:
+        embedding_function: Wrapped embedding function.
+        model_name: Name under which the embeddings are cached.
+    """
+
+    def __init__(
+        self,
+        embedding_function: chromadb.EmbeddingFunction[chromadb.Documents],
+        model_name: str):
+        """Create a CachedEmbeddingFunction.
+
+        Args:
+            embedding_function: Embedding function to wrap.
+            model_name: Name under which the embeddings are cached. Must
+                identify the wrapped embedding function's model.
+        """
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+
+    def __call__(
+        self,
+        input: chromadb.Documents  # pylint: disable=redefined-builtin
+    ) -> chromadb.Embeddings:
+        """Returns the embeddings of texts, computing those not cached."""
+        return embedding_cache.get_or_compute(
+            self.model_name, input, self.embedding_function).tolist()
+
+
+def get_embedding_function() -> CachedEmbeddingFunction:
+    """Returns the embedding function of the collection.
+
+    The embedding function is Chroma's default embedding function, with
+    embeddings cached on disk. It is created at most once per process, on
+    first use.
+    """
+    global _embedding_function  # pylint: disable=global-statement
+    with _embedding_function_lock:
+        if _embedding_function is None:
+            _embedding_function = CachedEmbeddingFunction(
+                embedding_functions.DefaultEmbeddingFunction(),
+                EMBEDDING_MODEL_NAME)
+        return _embedding_function
 
 
 class _Node(pydantic.BaseModel):
@@ -60,6 +141,13 @@ def _add_pdfs_to_collection(
         collection: The Chroma (vector DB) collection. 
         pdf_files: A list of either local paths or urls to pdf files.
     """
+    # Unstructured is imported here, as importing it is slow and it is only
+    # needed to create the collection, not to query it.
+    # pylint: disable=import-outside-toplevel
+    from unstructured.partition import pdf as unstructured_partition
+    from unstructured.chunking import title as unstructured_chunking
+    # pylint: enable=import-outside-toplevel
+
     new_collection_metadata = {}
     for pdf_file in pdf_files:
         file_path = pathlib.Path(pdf_file)
@@ -89,21 +177,46 @@ def _add_pdfs_to_collection(
     collection.modify(metadata=new_collection_metadata)
 
 
+def write_vector_store(collection: chromadb.Collection):
+    """Writes the in-process vector store of a collection.
+
+    The store holds the collection's embeddings, documents and metadata, and
+    replaces the store at VECTOR_STORE_PATH. The collection is read in
+    batches, so that only a batch of embeddings is held in memory at once.
+
+    Args:
+        collection: The Chroma (vector DB) collection.
+    """
+    ids = collection.get(include=[])["ids"]
+    batch_size = get_chroma_client().get_max_batch_size()
+    with vector_store.VectorStoreWriter(
+        VECTOR_STORE_PATH, len(ids)) as writer:
+        for i in range(0, len(ids), batch_size):
+            result = collection.get(
+                ids=ids[i:i + batch_size],
+                include=["embeddings", "documents", "metadatas"])
+            writer.add(
+                result["ids"], result["embeddings"], result["documents"],
+                result["metadatas"])
+
+
 def _create_default_pdf_collection() -> chromadb.Collection:
     """Creates and populates the default Chroma collection.
 
     Resets the Chroma client, creates a Chroma Collection 
     object, and populates it based on the PDF files given by PDF_FILES.
     The collection also contains the names of the processed files as
-    metadata.
+    metadata. Then writes the collection's in-process vector store.
 
     Returns:
         The created PDF collection.
     """
+    chroma_client = get_chroma_client()
     chroma_client.reset()
     collection = chroma_client.create_collection(
-        name=PDF_COLLECTION_NAME)
+        name=PDF_COLLECTION_NAME, embedding_function=get_embedding_function())
     _add_pdfs_to_collection(collection, PDF_FILES)
+    write_vector_store(collection)
     return collection
 
 
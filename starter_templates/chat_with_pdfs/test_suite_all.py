@@ -23,7 +23,7 @@ test_suite.add(pdf_combined_test_cases.invalid_test_cases)
 test_suite.add(quality_measures.PDF_CHAT_QUALITY_MEASURES)
 
 # Uncomment the following lines to use Inductor hyperparameters.
-# Be mindful that this will result in 16 (2*2*2*2) executions for
+# Be mindful that this will result in 32 (2*2*2*2*2) executions for
 # each test case if all are used at once. This can result in
 # non-trivial cost from your LLM provider
 # test_suite.add(
@@ -41,6 +41,12 @@ test_suite.add(quality_measures.PDF_CHAT_QUALITY_MEASURES)
 #         hparam_name="query_result_num",
 #         hparam_type="NUMBER",
 #         values=[5, 10]),
+#     # Compares querying the vector DB with searching the in-process vector
+#     # store (see `vector_store.py`).
+#     inductor.HparamSpec(
+#         hparam_name="vector_backend",
+#         hparam_type="SHORT_STRING",
+#         values=["chroma", "numpy"]),
 # )
 
 
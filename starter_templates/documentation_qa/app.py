@@ -1,14 +1,127 @@
 """Documentation Question-Answering (Q&A) Bot"""
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import json
 import os
+import threading
+import time
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple,
+    Union)
 
+import chromadb
 import inductor
 import openai
+import pydantic
 
+import bm25
+import caching
+import context_packing
 import prompts
+import reranking
+import retrievers
 import setup_db
+import spans
+import vector_store
 
 
-openai_client = openai.OpenAI()
+# Rephrased questions are cached, as production traffic often repeats the same
+# questions. Cache entries are keyed on the normalized question and a hash of
+# the rephrase prompt, so changing the "rephrase_prompt" hyperparameter
+# automatically invalidates them. The cache has an in-memory LRU tier and an
+# optional on-disk (SQLite) tier. Set REPHRASE_CACHE_PATH to a file path (e.g.
+# "rephrase_cache.sqlite3") to persist cached rephrased questions across
+# processes and restarts.
+REPHRASE_CACHE_MAX_SIZE = 1024
+REPHRASE_CACHE_TTL_SECONDS = 24 * 60 * 60
+REPHRASE_CACHE_PATH: Optional[str] = None
+
+# Answers can also be cached in a semantic cache, which reuses the answer to a
+# previous question if the embeddings of the two questions are similar enough
+# (per the "semantic_cache_similarity_threshold" hyperparameter). Cache entries
+# are keyed on the vector DB collection version and a hash of the main prompt,
+# so changing the collection's documents (by re-creating or syncing it) or the
+# "main_prompt" hyperparameter automatically invalidates them. As a
+# paraphrased question may call for a different answer, the semantic cache is
+# disabled by default and can be enabled via the "use_semantic_cache"
+# hyperparameter.
+ANSWER_CACHE_MAX_SIZE = 1024
+
+
+# The caches are shared by all engines in the process.
+rephrase_cache = caching.TwoTierCache(
+    max_size=REPHRASE_CACHE_MAX_SIZE,
+    ttl=REPHRASE_CACHE_TTL_SECONDS,
+    path=REPHRASE_CACHE_PATH)
+answer_cache = caching.SemanticCache(max_size=ANSWER_CACHE_MAX_SIZE)
+
+
+# Concurrent identical questions (e.g. when a popular question spikes) are
+# coalesced into a single computation, whose answer they all share (see
+# `caching.SingleFlight`). Questions are identical if their normalized text
+# and the values of the hyperparameters returned by `_get_coalescing_hparams`
+# are equal. Every hyperparameter that affects the answer must be included,
+# which `app_test.py` checks. A coalesced question only logs that it was
+# coalesced, so coalescing is disabled by default, so that concurrent test
+# suite replicas of a question are each answered (and fully logged); it is
+# enabled by `server.py`. It can also be enabled or disabled via the
+# "coalesce_requests" hyperparameter, which defaults to COALESCE_REQUESTS.
+COALESCE_REQUESTS = False
+# Hyperparameters that do not affect the answer, and so are not part of the
+# coalescing key.
+_NON_COALESCING_HPARAM_NAMES = (
+    "coalesce_requests",
+)
+
+
+def _hparam(
+    name: str, default_value: Union[str, int, float]
+) -> Union[str, int, float]:
+    """Returns the value of a hyperparameter (see `inductor.hparam`).
+
+    All of the app's hyperparameters are read through this function, so
+    that `app_test.py` can check that each one is either part of the
+    coalescing key or known not to affect the answer.
+
+    Args:
+        name: Name of the hyperparameter.
+        default_value: Value of the hyperparameter if it is not set.
+    """
+    return inductor.hparam(name, default_value)
+
+
+def _get_coalescing_hparams() -> Dict[str, Any]:
+    """Returns the values of the hyperparameters that affect the answer.
+
+    Each hyperparameter is read with the same default value as where the app
+    uses it (which `app_test.py` checks), so that no other default is
+    recorded for it.
+    """
+    return {
+        "context_token_budget": _hparam("context_token_budget", 0),
+        "main_prompt": _hparam("main_prompt", prompts.MAIN_PROMPT_DEFAULT),
+        "rephrase_prompt": _hparam(
+            "rephrase_prompt", prompts.REPHRASE_PROMPT_DEFAULT),
+        "rerank_batch_size": _hparam("rerank_batch_size", 32),
+        "rerank_candidate_num": _hparam("rerank_candidate_num", 0),
+        "rerank_model": _hparam(
+            "rerank_model", reranking.DEFAULT_CROSS_ENCODER_MODEL),
+        "retrieval_mode": _hparam("retrieval_mode", "vector"),
+        "semantic_cache_similarity_threshold": _hparam(
+            "semantic_cache_similarity_threshold", 0.95),
+        "speculative_overlap_threshold": _hparam(
+            "speculative_overlap_threshold", 0.5),
+        "speculative_rephrase_deadline": _hparam(
+            "speculative_rephrase_deadline", 2.0),
+        "use_rephrase_cache": _hparam("use_rephrase_cache", True),
+        "use_semantic_cache": _hparam("use_semantic_cache", False),
+        "vector_backend": _hparam("vector_backend", "chroma"),
+        "vector_query_result_num": _hparam("vector_query_result_num", 4),
+        "vector_query_text_type": _hparam(
+            "vector_query_text_type", "rephrase"),
+    }
 
 
 # Explicitly set the tokenizers parallelism to false to avoid transformers
@@ -16,6 +129,1100 @@ openai_client = openai.OpenAI()
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 
+# Start of the user message used to rephrase the user's question, which is
+# followed by the question.
+_REPHRASE_PROMPT_USER_PREFIX = (
+    "Rephrase the following question to fit the context of the "
+    "provided subject matter.\n"
+    "QUESTION:\n")
+
+
+class BatchAnswer(pydantic.BaseModel):
+    """Answer to one of the questions passed to `documentation_qa_batch`.
+
+    Attributes:
+        question: The user's question.
+        answer: The answer to the question, or None if an error occurred
+            while answering it.
+        error: Description of the error that occurred while answering the
+            question, or None if no error occurred.
+    """
+    question: str
+    answer: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _format_context(document: str, metadata: Dict[str, Any]) -> str:
+    """Returns a retrieved document formatted for inclusion in the main prompt.
+
+    Args:
+        document: Retrieved document.
+        metadata: Metadata of the retrieved document.
+    """
+    return (
+        "CONTEXT: " + document + "\n\n"
+        "REFERENCE: " + metadata.get("url", "N/A") + "\n\n")
+
+
+def _format_contexts(
+    documents: List[str], metadatas: List[Dict[str, Any]]) -> str:
+    """Returns the contexts string built from retrieved documents.
+
+    If the "context_token_budget" hyperparameter is positive, the documents
+    are first packed into that many tokens (in relevance order) by
+    `context_packing.pack_documents`, and the number of tokens used and of
+    documents truncated and dropped is logged.
+
+    Args:
+        documents: Retrieved documents, in order of relevance.
+        metadatas: Metadata of each retrieved document.
+    """
+    # A single long markdown section can otherwise dominate the prompt's
+    # token count (and so the LLM's latency and cost). A budget of 0 disables
+    # packing, so that all retrieved documents are included in full.
+    context_token_budget = _hparam("context_token_budget", 0)
+    if context_token_budget > 0:
+        with spans.span("context_packing"):
+            packed = context_packing.pack_documents(
+                documents, metadatas, _format_context, context_token_budget)
+        documents, metadatas = packed.documents, packed.metadatas
+
+    contexts = "\n\n".join(
+        _format_context(document, metadata)
+        for document, metadata in zip(documents, metadatas))
+    if context_token_budget > 0:
+        inductor.log(
+            {"token_budget": context_token_budget,
+             "tokens_used": context_packing.count_tokens(contexts),
+             "num_truncated": packed.num_truncated,
+             "num_dropped": packed.num_dropped},
+            name="context_packing")
+    return contexts
+
+
+def _get_contexts(query_result: Dict[str, Any]) -> str:
+    """Returns the contexts string built from a vector DB query result.
+
+    Args:
+        query_result: Result of a single-text vector DB query.
+    """
+    documents = retrievers.get_documents(query_result)
+    inductor.log(query_result, name="vector_query_result")
+
+    contexts = _format_contexts(
+        [document.text for document in documents],
+        [document.metadata for document in documents])
+    inductor.log(contexts, name="contexts")
+    return contexts
+
+
+def _resolve_speculative_query_results(
+    speculative_result: Dict[str, Any],
+    rephrased_result: Dict[str, Any],
+    n_results: int) -> Dict[str, Any]:
+    """Resolves the results of a speculative retrieval into a single result.
+
+    If the results retrieved using the original question (the speculative
+    results) overlap enough with the results retrieved using the rephrased
+    question, the speculative results are reused as is. Otherwise, the two
+    sets of results are merged by interleaving them by rank (starting with
+    the rephrased results), dropping duplicates, up to `n_results` results.
+
+    Args:
+        speculative_result: Result of the vector DB query using the user's
+            original question.
+        rephrased_result: Result of the vector DB query using the rephrased
+            question.
+        n_results: Maximum number of results to return.
+
+    Returns:
+        A vector DB query result for a single query text.
+    """
+    speculative_ids = speculative_result["ids"][0]
+    rephrased_ids = rephrased_result["ids"][0]
+    union_size = len(set(speculative_ids) | set(rephrased_ids))
+    overlap = (
+        len(set(speculative_ids) & set(rephrased_ids)) / union_size
+        if union_size else 1.0)
+    inductor.log(overlap, name="speculative_retrieval_overlap")
+
+    if overlap >= _hparam("speculative_overlap_threshold", 0.5):
+        inductor.log("reused", name="speculative_retrieval_outcome")
+        return speculative_result
+
+    inductor.log("merged", name="speculative_retrieval_outcome")
+    merged_result = {"ids": [[]], "documents": [[]], "metadatas": [[]]}
+    for rank in range(max(len(speculative_ids), len(rephrased_ids))):
+        for result in (rephrased_result, speculative_result):
+            if rank >= len(result["ids"][0]):
+                continue
+            result_id = result["ids"][0][rank]
+            if (result_id in merged_result["ids"][0] or
+                len(merged_result["ids"][0]) >= n_results):
+                continue
+            merged_result["ids"][0].append(result_id)
+            merged_result["documents"][0].append(
+                result["documents"][0][rank])
+            merged_result["metadatas"][0].append(
+                result["metadatas"][0][rank])
+    return merged_result
+
+
+def _get_cached_answer(
+    answer_cache_key: Tuple[str, List[float]]) -> Optional[str]:
+    """Returns the cached answer to a similar question, if any.
+
+    On a cache hit, the cached question and its similarity to the user's
+    question are logged (for auditing), as are the contexts that were used to
+    generate the cached answer.
+
+    Args:
+        answer_cache_key: Semantic answer cache key for the user's question,
+            as returned by `DocumentationQAEngine._get_answer_cache_key`.
+    """
+    cached = answer_cache.get(
+        *answer_cache_key,
+        similarity_threshold=_hparam(
+            "semantic_cache_similarity_threshold", 0.95))
+    if cached is None:
+        return None
+    cached_value, similarity = cached
+    inductor.log(
+        {"cached_question": cached_value["question"],
+         "similarity": similarity},
+        name="semantic_cache_hit")
+    inductor.log(cached_value["contexts"], name="contexts")
+    return cached_value["answer"]
+
+
+def _cache_answer(
+    answer_cache_key: Tuple[str, List[float]],
+    question: str,
+    contexts: str,
+    answer: str):
+    """Caches the answer to the user's question in the semantic answer cache.
+
+    Args:
+        answer_cache_key: Semantic answer cache key for the user's question,
+            as returned by `DocumentationQAEngine._get_answer_cache_key`.
+        question: The user's question.
+        contexts: The contexts used to generate the answer.
+        answer: The answer to the user's question.
+    """
+    answer_cache.set(
+        *answer_cache_key,
+        {"question": question, "contexts": contexts, "answer": answer})
+
+
+def _iter_answer_deltas(
+    stream: openai.Stream,
+    on_complete: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+    """Yields the answer text deltas of a streamed chat completion.
+
+    Args:
+        stream: Streamed chat completion.
+        on_complete: Optional function called with the full answer once the
+            stream is exhausted.
+    """
+    answer_deltas = []
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            answer_deltas.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    if on_complete is not None:
+        on_complete("".join(answer_deltas))
+
+
+def _map_batch(
+    executor: concurrent.futures.Executor,
+    func: Callable[..., Any],
+    args_by_index: Dict[int, Tuple[Any, ...]],
+    results: List[BatchAnswer]) -> Dict[int, Any]:
+    """Calls a function on each batch item concurrently.
+
+    Errors are recorded on the corresponding batch results rather than
+    raised, so that one failing item does not fail the whole batch. Each call
+    runs in a copy of the caller's context, so that its `inductor.log` calls
+    and latency spans are attributed to the caller's execution (worker
+    threads do not otherwise inherit context variables).
+
+    Args:
+        executor: Executor used to make the calls.
+        func: Function to call.
+        args_by_index: Maps the index of each batch item to the positional
+            arguments to call `func` with for that item.
+        results: Batch results, on which errors are recorded.
+
+    Returns:
+        A dictionary mapping the index of each batch item for which the call
+        succeeded to the call's return value.
+    """
+    futures = {
+        index: executor.submit(contextvars.copy_context().run, func, *args)
+        for index, args in args_by_index.items()}
+    outputs = {}
+    for index, future in futures.items():
+        try:
+            outputs[index] = future.result()
+        except Exception as error:  # pylint: disable=broad-except
+            results[index].error = f"{type(error).__name__}: {error}"
+    return outputs
+
+
+class DocumentationQAEngine:
+    """Answers questions about the documents in the vector DB.
+
+    The engine owns the resources used to answer questions: the vector DB
+    collection handle, the embedding function, the OpenAI clients, the BM25
+    keyword index and the precomputed prompt prefixes. These are created
+    once (lazily, or upfront via `warm_up`) and reused across questions, so
+    that answering a question incurs no per-request setup. An engine is safe
+    to share across threads.
+
+    Hyperparameters are read when answering each question (rather than when
+    the engine is created), so that a single engine serves all executions of
+    an Inductor playground or test suite. Prompt prefixes are precomputed
+    once per distinct prompt.
+
+    Concurrent identical questions are answered once, and share the answer
+    (see `answer` and `answer_async`). The number of coalesced questions is
+    available via `coalescer.stats`.
+
+    The collection handle is kept for the lifetime of the engine, so after
+    re-creating or syncing the collection (by running `python setup_db.py`),
+    create a new engine (or restart the process).
+
+    Attributes:
+        coalescer: Coalesces concurrent identical questions.
+    """
+
+    def __init__(
+        self,
+        openai_client: Optional[openai.OpenAI] = None,
+        async_openai_client: Optional[openai.AsyncOpenAI] = None,
+        embedding_function: Optional[
+            chromadb.EmbeddingFunction[chromadb.Documents]] = None):
+        """Create a DocumentationQAEngine.
+
+        Args:
+            openai_client: OpenAI client used by the sync entrypoints. If not
+                provided, a client is created.
+            async_openai_client: OpenAI client used by the async
+                entrypoints. If not provided, a client is created. A single
+                client is shared so that concurrent requests reuse the same
+                HTTP connection pool.
+            embedding_function: Function used to embed questions, both for
+                vector DB queries and for the semantic answer cache. Must be
+                the embedding function that the documents in the vector DB
+                were embedded with. Defaults to Chroma's default embedding
+                function with embeddings cached on disk (see
+                `setup_db.get_embedding_function`), whose model is loaded on
+                first use.
+        """
+        self.openai_client = (
+            openai_client if openai_client is not None else openai.OpenAI())
+        self.async_openai_client = (
+            async_openai_client if async_openai_client is not None
+            else openai.AsyncOpenAI())
+        self.embedding_function = (
+            embedding_function if embedding_function is not None
+            else setup_db.get_embedding_function())
+        # Worker threads used to rephrase questions concurrently with
+        # speculative vector DB queries (see `_speculative_query`).
+        self._rephrase_executor = concurrent.futures.ThreadPoolExecutor(
+            thread_name_prefix="rephrase")
+        self.coalescer = caching.SingleFlight()
+        self._collection: Optional[chromadb.Collection] = None
+        self._bm25_index: Optional[bm25.BM25Index] = None
+        self._vector_store: Optional[vector_store.VectorStore] = None
+        self._lock = threading.Lock()
+        # Precomputed main prompt prefixes and prompt hashes, keyed on
+        # prompt. Entries are only ever added (with `dict.setdefault`, which
+        # is atomic), so no lock is needed.
+        self._main_prompt_prefixes: Dict[str, str] = {}
+        self._prompt_hashes: Dict[str, str] = {}
+
+    def warm_up(self):
+        """Initializes the engine's collection, models and indexes.
+
+        The vector DB collection handle, embedding model and (depending on
+        the hyperparameters) BM25 index and cross-encoder are otherwise
+        initialized lazily, while answering the first question. Call this
+        method at startup (e.g. before serving requests) to instead pay that
+        cost upfront.
+        """
+        collection = self._get_collection()
+        # Loads the embedding model, bypassing the embedding cache (in which
+        # the warm-up text is likely cached).
+        embedding_function = self.embedding_function
+        if isinstance(embedding_function, setup_db.CachedEmbeddingFunction):
+            embedding_function = embedding_function.embedding_function
+        embedding_function(["warm-up"])
+        self._get_main_prompt_prefix(prompts.MAIN_PROMPT_DEFAULT)
+        self._get_prompt_hash(prompts.MAIN_PROMPT_DEFAULT)
+        self._get_prompt_hash(prompts.REPHRASE_PROMPT_DEFAULT)
+        self._get_retriever(collection)
+        if _hparam("retrieval_mode", "vector") == "hybrid":
+            self._get_bm25_index(collection)
+        if _hparam("rerank_candidate_num", 0) > 0:
+            reranking.get_cross_encoder(_hparam(
+                "rerank_model", reranking.DEFAULT_CROSS_ENCODER_MODEL))
+
+    def _get_collection(self) -> chromadb.Collection:
+        """Returns the vector DB collection created by `setup_db.py`."""
+        with self._lock:
+            if self._collection is None:
+                try:
+                    # The collection shares the engine's embedding function,
+                    # so that its embedding model is only loaded once.
+                    self._collection = (
+                        setup_db.get_chroma_client().get_collection(
+                            name=setup_db.COLLECTION_NAME,
+                            embedding_function=self.embedding_function))
+                except ValueError as error:
+                    print("Vector DB collection not found. Please create the "
+                          "collection by running `python3 setup_db.py`.")
+                    raise error
+            return self._collection
+
+    def _get_bm25_index(
+        self, collection: chromadb.Collection) -> bm25.BM25Index:
+        """Returns the BM25 keyword index created by `setup_db.py`.
+
+        The index is loaded from disk on first use, and reloaded if it was
+        not built alongside the given collection.
+
+        Args:
+            collection: The vector DB collection that the index was built
+                alongside.
+        """
+        with self._lock:
+            if (self._bm25_index is None or
+                self._bm25_index.collection_version !=
+                setup_db.get_collection_version(collection)):
+                try:
+                    self._bm25_index = bm25.BM25Index.load(
+                        setup_db.BM25_INDEX_PATH)
+                except (FileNotFoundError, ValueError) as error:
+                    print("BM25 index not found or outdated. Please create "
+                          "the index by running `python3 setup_db.py`.")
+                    raise error
+            return self._bm25_index
+
+    def _get_vector_store(
+        self, collection: chromadb.Collection) -> vector_store.VectorStore:
+        """Returns the in-process vector store created by `setup_db.py`.
+
+        The store is loaded on first use, and reloaded if it was not built
+        alongside the given collection.
+
+        Args:
+            collection: The vector DB collection that the store was built
+                alongside.
+        """
+        with self._lock:
+            if (self._vector_store is None or
+                self._vector_store.collection_version !=
+                setup_db.get_collection_version(collection)):
+                try:
+                    self._vector_store = vector_store.VectorStore(
+                        setup_db.VECTOR_STORE_PATH, self.embedding_function)
+                except (FileNotFoundError, ValueError) as error:
+                    print("Vector store not found or outdated. Please "
+                          "create the store by running `python3 "
+                          "setup_db.py`.")
+                    raise error
+            return self._vector_store
+
+    def _get_retriever(
+        self, collection: chromadb.Collection) -> retrievers.Retriever:
+        """Returns the retriever of the selected vector search backend.
+
+        If the "vector_backend" hyperparameter is "numpy", the in-process
+        vector store (see `vector_store.py`), which holds the same embeddings
+        as the vector DB in memory-mapped files, is searched instead of
+        querying the vector DB, which avoids the vector DB client's per-query
+        overhead. Otherwise (if it is "chroma", the default), the vector DB
+        is queried.
+
+        Args:
+            collection: The vector DB collection.
+
+        Raises:
+            ValueError: If the "vector_backend" hyperparameter is not a
+                supported backend.
+        """
+        vector_backend = _hparam("vector_backend", "chroma")
+        if vector_backend == "chroma":
+            return retrievers.ChromaRetriever(collection)
+        if vector_backend == "numpy":
+            return self._get_vector_store(collection)
+        raise ValueError(f"Unsupported vector backend: {vector_backend}")
+
+    def _get_main_prompt_prefix(self, main_prompt: str) -> str:
+        """Returns the main system message up to the retrieved contexts.
+
+        Args:
+            main_prompt: The main prompt.
+        """
+        prefix = self._main_prompt_prefixes.get(main_prompt)
+        if prefix is None:
+            prefix = self._main_prompt_prefixes.setdefault(
+                main_prompt, f"{main_prompt}CONTEXTs:\n")
+        return prefix
+
+    def _get_prompt_hash(self, prompt: str) -> str:
+        """Returns the hash of a prompt, used in cache keys.
+
+        Args:
+            prompt: The main or rephrase prompt.
+        """
+        prompt_hash = self._prompt_hashes.get(prompt)
+        if prompt_hash is None:
+            prompt_hash = self._prompt_hashes.setdefault(
+                prompt, caching.hash_text(prompt))
+        return prompt_hash
+
+    def _get_rephrase_messages(
+        self, question: str) -> Tuple[List[Dict[str, str]], str]:
+        """Returns the LLM messages used to rephrase the user's question.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            A tuple of (messages, rephrase cache key). Cache keys are the
+            normalized question and a hash of the rephrase prompt.
+        """
+        rephrase_prompt_system = _hparam(
+            "rephrase_prompt",
+            prompts.REPHRASE_PROMPT_DEFAULT)
+        messages = [
+            {"role": "system", "content": rephrase_prompt_system},
+            {"role": "user",
+             "content": _REPHRASE_PROMPT_USER_PREFIX + question}]
+        cache_key = (
+            f"{self._get_prompt_hash(rephrase_prompt_system)}:"
+            f"{caching.normalize_text(question)}")
+        return messages, cache_key
+
+    def _get_main_messages(
+        self, question: str, contexts: str) -> List[Dict[str, str]]:
+        """Returns the LLM messages used to answer the user's question.
+
+        Args:
+            question: The user's question.
+            contexts: The contexts retrieved from the vector DB.
+        """
+        prompt_prefix = self._get_main_prompt_prefix(
+            _hparam("main_prompt", prompts.MAIN_PROMPT_DEFAULT))
+        return [
+            {"role": "system", "content": prompt_prefix + contexts},
+            {"role": "user", "content": question}]
+
+    def _query_collection(
+        self,
+        collection: chromadb.Collection,
+        query_texts: List[str],
+        n_results: int) -> Dict[str, Any]:
+        """Queries the vector DB collection for documents relevant to texts.
+
+        If the "retrieval_mode" hyperparameter is "hybrid", the BM25 keyword
+        index is also searched for each query text, and the vector and
+        keyword results are fused using reciprocal rank fusion. Keyword
+        search matches exact terms (such as API names) that vector search can
+        miss, so hybrid retrieval can reach a given recall with fewer
+        results. Otherwise (if it is "vector", the default), only the vector
+        DB is queried.
+
+        The vector search backend is selected by the "vector_backend"
+        hyperparameter (see `_get_retriever`).
+
+        If the "rerank_candidate_num" hyperparameter is positive, that many
+        candidates are retrieved per query text and then reranked by a local
+        cross-encoder (see `reranking.py`), keeping the `n_results` highest
+        scoring candidates. The number of candidates reranked and the rerank
+        latency are logged.
+
+        Args:
+            collection: The vector DB collection.
+            query_texts: Texts to query the collection with.
+            n_results: Number of results to retrieve per query text.
+
+        Returns:
+            A vector DB query result, with one list of results per query
+            text.
+        """
+        rerank_candidate_num = _hparam("rerank_candidate_num", 0)
+        num_candidates = max(n_results, rerank_candidate_num)
+        # The vector DB query includes embedding the query texts.
+        with spans.span("vector_search"):
+            query_result = self._get_retriever(collection).query(
+                query_texts, num_candidates)
+
+        if _hparam("retrieval_mode", "vector") == "hybrid":
+            with spans.span("keyword_search"):
+                bm25_index = self._get_bm25_index(collection)
+                hybrid_result = {"ids": [], "documents": [], "metadatas": []}
+                for i, query_text in enumerate(query_texts):
+                    fused_result = bm25.reciprocal_rank_fusion(
+                        [{key: [query_result[key][i]]
+                          for key in hybrid_result},
+                         bm25_index.search(query_text, num_candidates)],
+                        num_candidates)
+                    for key, values in hybrid_result.items():
+                        values.append(fused_result[key][0])
+            query_result = hybrid_result
+
+        if rerank_candidate_num > 0:
+            num_reranked = sum(len(ids) for ids in query_result["ids"])
+            rerank_start_time = time.perf_counter()
+            with spans.span("rerank") as rerank_span:
+                rerank_span.set(num_candidates=num_reranked)
+                query_result = reranking.rerank(
+                    query_texts,
+                    query_result,
+                    n_results,
+                    batch_size=_hparam("rerank_batch_size", 32),
+                    model_name=_hparam(
+                        "rerank_model",
+                        reranking.DEFAULT_CROSS_ENCODER_MODEL))
+            inductor.log(
+                {"num_candidates": num_reranked,
+                 "latency_seconds": time.perf_counter() - rerank_start_time},
+                name="rerank")
+        return query_result
+
+    def rephrase_question(self, question: str) -> str:
+        """Rephrase the user's question in a specific context.
+
+        See the module-level `rephrase_question`.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            The question rephrased in a specific context.
+        """
+        # Caching can be disabled via the "use_rephrase_cache" hyperparameter
+        # (e.g. to observe the variability of rephrased questions across test
+        # suite replicas).
+        use_rephrase_cache = _hparam("use_rephrase_cache", True)
+        messages, cache_key = self._get_rephrase_messages(question)
+        if use_rephrase_cache:
+            rephrase_response = rephrase_cache.get(cache_key)
+            if rephrase_response is not None:
+                return rephrase_response
+
+        with spans.span("rephrase") as rephrase_span:
+            response = self.openai_client.chat.completions.create(
+                messages=messages,
+                model="gpt-4o")
+            rephrase_span.set_token_usage(response.usage)
+        rephrase_response = response.choices[0].message.content
+        if use_rephrase_cache:
+            rephrase_cache.set(cache_key, rephrase_response)
+        return rephrase_response
+
+    async def rephrase_question_async(self, question: str) -> str:
+        """Rephrase the user's question in a specific context.
+
+        Async variant of `rephrase_question`.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            The question rephrased in a specific context.
+        """
+        use_rephrase_cache = _hparam("use_rephrase_cache", True)
+        messages, cache_key = self._get_rephrase_messages(question)
+        if use_rephrase_cache:
+            rephrase_response = rephrase_cache.get(cache_key)
+            if rephrase_response is not None:
+                return rephrase_response
+
+        with spans.span("rephrase") as rephrase_span:
+            response = await self.async_openai_client.chat.completions.create(
+                messages=messages,
+                model="gpt-4o")
+            rephrase_span.set_token_usage(response.usage)
+        rephrase_response = response.choices[0].message.content
+        if use_rephrase_cache:
+            rephrase_cache.set(cache_key, rephrase_response)
+        return rephrase_response
+
+    def _speculative_query(
+        self,
+        collection: chromadb.Collection,
+        question: str,
+        n_results: int) -> Dict[str, Any]:
+        """Queries the vector DB while the user's question is being rephrased.
+
+        The vector DB is queried using the user's original question (a
+        speculative query) while the question is rephrased in a worker
+        thread. If the rephrased question is available before the deadline
+        given by the "speculative_rephrase_deadline" hyperparameter (in
+        seconds, measured from the start of this method), the vector DB is
+        also queried using the rephrased question and the two results are
+        resolved by `_resolve_speculative_query_results`. Otherwise, the
+        speculative result is used on its own. (In that case, the rephrase
+        is cancelled if it has not started yet; otherwise, it is left to
+        complete in the background and its result is discarded.)
+
+        The rephrase runs in a copy of the caller's context, so that its
+        `inductor.log` calls and latency spans are attributed to this
+        question's execution (and never to that of another question handled
+        later by the same worker thread), even if it completes after the
+        deadline.
+
+        Args:
+            collection: The vector DB collection.
+            question: The user's question.
+            n_results: Number of results to retrieve.
+
+        Returns:
+            A vector DB query result for a single query text.
+        """
+        start_time = time.monotonic()
+        deadline = _hparam("speculative_rephrase_deadline", 2.0)
+        rephrase_future = self._rephrase_executor.submit(
+            contextvars.copy_context().run, self.rephrase_question, question)
+
+        speculative_result = self._query_collection(
+            collection, [question], n_results)
+
+        try:
+            rephrased_question = rephrase_future.result(
+                timeout=max(deadline - (time.monotonic() - start_time), 0))
+        except concurrent.futures.TimeoutError:
+            rephrase_future.cancel()
+            inductor.log(question, name="vector_query_text")
+            inductor.log(
+                "deadline_missed", name="speculative_retrieval_outcome")
+            return speculative_result
+        inductor.log(rephrased_question, name="vector_query_text")
+
+        rephrased_result = self._query_collection(
+            collection, [rephrased_question], n_results)
+        return _resolve_speculative_query_results(
+            speculative_result, rephrased_result, n_results)
+
+    async def _speculative_query_async(
+        self,
+        collection: chromadb.Collection,
+        question: str,
+        n_results: int) -> Dict[str, Any]:
+        """Queries the vector DB while the user's question is being rephrased.
+
+        Async variant of `_speculative_query`. If the deadline is missed, the
+        rephrase request is cancelled.
+
+        Args:
+            collection: The vector DB collection.
+            question: The user's question.
+            n_results: Number of results to retrieve.
+
+        Returns:
+            A vector DB query result for a single query text.
+        """
+        start_time = time.monotonic()
+        deadline = _hparam("speculative_rephrase_deadline", 2.0)
+        rephrase_task = asyncio.create_task(
+            self.rephrase_question_async(question))
+
+        speculative_result = await asyncio.to_thread(
+            self._query_collection, collection, [question], n_results)
+
+        try:
+            rephrased_question = await asyncio.wait_for(
+                rephrase_task,
+                timeout=max(deadline - (time.monotonic() - start_time), 0))
+        except asyncio.TimeoutError:
+            inductor.log(question, name="vector_query_text")
+            inductor.log(
+                "deadline_missed", name="speculative_retrieval_outcome")
+            return speculative_result
+        inductor.log(rephrased_question, name="vector_query_text")
+
+        rephrased_result = await asyncio.to_thread(
+            self._query_collection, collection, [rephrased_question],
+            n_results)
+        return _resolve_speculative_query_results(
+            speculative_result, rephrased_result, n_results)
+
+    def _retrieve_contexts(self, question: str) -> str:
+        """Retrieves the contexts relevant to the user's question.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            The contexts retrieved from the vector DB, formatted for
+            inclusion in the main prompt.
+        """
+        collection = self._get_collection()
+        n_results = _hparam("vector_query_result_num", 4)
+
+        # Decide whether to use the user's original question or a version of
+        # the question rephrased by an LLM as the query text for the vector
+        # DB. The rephrased question is intended to provide a more
+        # informative and relevant vector DB query by incorporating more
+        # relevant keywords and phrases. However, this RAG strategy is not
+        # universally effective and incurs additional latency and cost due to
+        # the additional LLM API call used to generate the rephrased
+        # question. We use a hyperparameter to toggle this strategy on or
+        # off, enabling easy experimentation and evaluation of the strategy's
+        # effectiveness.
+        # The "speculative" strategy hides most of the rephrase latency by
+        # querying the vector DB using the original question while the
+        # question is being rephrased (see `_speculative_query`).
+        vector_query_text_type = _hparam(
+            "vector_query_text_type", "rephrase")
+        if vector_query_text_type == "speculative":
+            query_result = self._speculative_query(
+                collection, question, n_results)
+            return _get_contexts(query_result)
+        if vector_query_text_type == "rephrase":
+            rephrased_question = self.rephrase_question(question)
+            query_text = rephrased_question
+        else:
+            query_text = question
+        inductor.log(query_text, name="vector_query_text")
+
+        query_result = self._query_collection(
+            collection, [query_text], n_results)
+        return _get_contexts(query_result)
+
+    async def _retrieve_contexts_async(self, question: str) -> str:
+        """Retrieves the contexts relevant to the user's question.
+
+        Async variant of `_retrieve_contexts`. The (blocking) vector DB query
+        is run in a worker thread.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            The contexts retrieved from the vector DB, formatted for
+            inclusion in the main prompt.
+        """
+        collection = self._get_collection()
+        n_results = _hparam("vector_query_result_num", 4)
+
+        vector_query_text_type = _hparam(
+            "vector_query_text_type", "rephrase")
+        if vector_query_text_type == "speculative":
+            query_result = await self._speculative_query_async(
+                collection, question, n_results)
+            return _get_contexts(query_result)
+        if vector_query_text_type == "rephrase":
+            rephrased_question = await self.rephrase_question_async(question)
+            query_text = rephrased_question
+        else:
+            query_text = question
+        inductor.log(query_text, name="vector_query_text")
+
+        query_result = await asyncio.to_thread(
+            self._query_collection, collection, [query_text], n_results)
+        return _get_contexts(query_result)
+
+    def _get_answer_cache_key(
+        self, question: str) -> Tuple[str, List[float]]:
+        """Returns the semantic answer cache key for the user's question.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            A tuple of (namespace, question embedding). The namespace
+            identifies the vector DB collection version and the main prompt.
+        """
+        # The collection version changes whenever nodes are added to or
+        # removed from the collection by setup_db.py.
+        collection_version = setup_db.get_collection_version(
+            self._get_collection())
+        main_prompt_hash = self._get_prompt_hash(
+            _hparam("main_prompt", prompts.MAIN_PROMPT_DEFAULT))
+        namespace = f"{collection_version}:{main_prompt_hash}"
+        with spans.span("embedding"):
+            embedding = list(self.embedding_function([question])[0])
+        return namespace, embedding
+
+    def _get_coalescing_key(self, question: str) -> str:
+        """Returns the key used to coalesce concurrent identical questions.
+
+        Args:
+            question: The user's question.
+        """
+        return caching.hash_text(json.dumps(
+            [caching.normalize_text(question), _get_coalescing_hparams()],
+            sort_keys=True,
+            default=str))
+
+    def _answer_question(self, question: str, contexts: str) -> str:
+        """Answers the user's question using the given contexts.
+
+        Args:
+            question: The user's question.
+            contexts: The contexts retrieved from the vector DB.
+        """
+        with spans.span("llm") as llm_span:
+            response = self.openai_client.chat.completions.create(
+                messages=self._get_main_messages(question, contexts),
+                model="gpt-4o")
+            llm_span.set_token_usage(response.usage)
+        return response.choices[0].message.content
+
+    def answer(self, question: str) -> str:
+        """Answers a question. See `documentation_qa`.
+
+        If an identical question (see `_get_coalescing_hparams`) is already
+        being answered, waits for and returns its answer instead, in which
+        case only the fact that the question was coalesced is logged.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            The answer to the user's question.
+        """
+        if not _hparam("coalesce_requests", COALESCE_REQUESTS):
+            return self._answer_uncoalesced(question)
+        answer, coalesced = self.coalescer.do(
+            self._get_coalescing_key(question),
+            functools.partial(self._answer_uncoalesced, question))
+        if coalesced:
+            inductor.log(True, name="coalesced")
+        return answer
+
+    def _answer_uncoalesced(self, question: str) -> str:
+        """Answers a question, without coalescing. See `answer`.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            The answer to the user's question.
+        """
+        use_semantic_cache = _hparam("use_semantic_cache", False)
+        if use_semantic_cache:
+            answer_cache_key = self._get_answer_cache_key(question)
+            cached_answer = _get_cached_answer(answer_cache_key)
+            if cached_answer is not None:
+                return cached_answer
+
+        contexts = self._retrieve_contexts(question)
+        response = self._answer_question(question, contexts)
+        if use_semantic_cache:
+            _cache_answer(answer_cache_key, question, contexts, response)
+        return response
+
+    def answer_stream(self, question: str) -> Iterator[str]:
+        """Answers a question, streaming. See `documentation_qa_stream`.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            An iterator over the text deltas of the answer to the user's
+            question.
+        """
+        use_semantic_cache = _hparam("use_semantic_cache", False)
+        if use_semantic_cache:
+            answer_cache_key = self._get_answer_cache_key(question)
+            cached_answer = _get_cached_answer(answer_cache_key)
+            if cached_answer is not None:
+                return iter([cached_answer])
+
+        contexts = self._retrieve_contexts(question)
+
+        on_complete = (
+            functools.partial(
+                _cache_answer, answer_cache_key, question, contexts)
+            if use_semantic_cache else None)
+        # For streamed answers, the "llm" span measures the time until the
+        # stream is opened, rather than until the whole answer is generated.
+        with spans.span("llm"):
+            stream = self.openai_client.chat.completions.create(
+                messages=self._get_main_messages(question, contexts),
+                model="gpt-4o",
+                stream=True)
+        return _iter_answer_deltas(stream, on_complete)
+
+    async def answer_async(self, question: str) -> str:
+        """Answers a question. See `documentation_qa_async`.
+
+        Identical questions are coalesced as in `answer` (including with
+        questions being answered by `answer`).
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            The answer to the user's question.
+        """
+        if not _hparam("coalesce_requests", COALESCE_REQUESTS):
+            return await self._answer_uncoalesced_async(question)
+        answer, coalesced = await self.coalescer.do_async(
+            self._get_coalescing_key(question),
+            functools.partial(self._answer_uncoalesced_async, question))
+        if coalesced:
+            inductor.log(True, name="coalesced")
+        return answer
+
+    async def _answer_uncoalesced_async(self, question: str) -> str:
+        """Answers a question, without coalescing. See `answer_async`.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            The answer to the user's question.
+        """
+        use_semantic_cache = _hparam("use_semantic_cache", False)
+        if use_semantic_cache:
+            answer_cache_key = await asyncio.to_thread(
+                self._get_answer_cache_key, question)
+            cached_answer = _get_cached_answer(answer_cache_key)
+            if cached_answer is not None:
+                return cached_answer
+
+        contexts = await self._retrieve_contexts_async(question)
+
+        with spans.span("llm") as llm_span:
+            response = await self.async_openai_client.chat.completions.create(
+                messages=self._get_main_messages(question, contexts),
+                model="gpt-4o")
+            llm_span.set_token_usage(response.usage)
+        response = response.choices[0].message.content
+        if use_semantic_cache:
+            _cache_answer(answer_cache_key, question, contexts, response)
+        return response
+
+    async def answer_stream_async(self, question: str) -> AsyncIterator[str]:
+        """Answers a question, streaming. See `documentation_qa_stream_async`.
+
+        Args:
+            question: The user's question.
+
+        Yields:
+            The text deltas of the answer to the user's question.
+        """
+        use_semantic_cache = _hparam("use_semantic_cache", False)
+        if use_semantic_cache:
+            answer_cache_key = await asyncio.to_thread(
+                self._get_answer_cache_key, question)
+            cached_answer = _get_cached_answer(answer_cache_key)
+            if cached_answer is not None:
+                inductor.log(cached_answer, name="answer")
+                yield cached_answer
+                return
+
+        contexts = await self._retrieve_contexts_async(question)
+
+        with spans.span("llm"):
+            stream = await self.async_openai_client.chat.completions.create(
+                messages=self._get_main_messages(question, contexts),
+                model="gpt-4o",
+                stream=True)
+        answer_deltas = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                answer_deltas.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        answer = "".join(answer_deltas)
+        inductor.log(answer, name="answer")
+        if use_semantic_cache:
+            _cache_answer(answer_cache_key, question, contexts, answer)
+
+    def answer_batch(
+        self,
+        questions: List[str],
+        max_concurrency: int = 8) -> List[BatchAnswer]:
+        """Answers many questions at once. See `documentation_qa_batch`.
+
+        Args:
+            questions: The users' questions.
+            max_concurrency: Maximum number of LLM API calls in flight at
+                once.
+
+        Returns:
+            The answers to the questions, in the same order as the
+            questions.
+        """
+        results = [BatchAnswer(question=question) for question in questions]
+        if not questions:
+            return results
+        collection = self._get_collection()
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_concurrency) as executor:
+            vector_query_text_type = _hparam(
+                "vector_query_text_type", "rephrase")
+            if vector_query_text_type in ("rephrase", "speculative"):
+                rephrase_args = {
+                    index: (question,)
+                    for index, question in enumerate(questions)}
+                query_texts = _map_batch(
+                    executor, self.rephrase_question, rephrase_args, results)
+            else:
+                query_texts = dict(enumerate(questions))
+            inductor.log(
+                [query_texts.get(index) for index in range(len(questions))],
+                name="vector_query_text")
+            if not query_texts:
+                return results
+
+            query_indices = list(query_texts)
+            try:
+                query_result = self._query_collection(
+                    collection,
+                    [query_texts[index] for index in query_indices],
+                    _hparam("vector_query_result_num", 4))
+            except Exception as error:  # pylint: disable=broad-except
+                for index in query_indices:
+                    results[index].error = f"{type(error).__name__}: {error}"
+                return results
+            inductor.log(query_result, name="vector_query_result")
+
+            contexts = {}
+            for i, index in enumerate(query_indices):
+                documents = retrievers.get_documents(query_result, i)
+                contexts[index] = _format_contexts(
+                    [document.text for document in documents],
+                    [document.metadata for document in documents])
+            inductor.log(
+                [contexts.get(index) for index in range(len(questions))],
+                name="contexts")
+
+            answers = _map_batch(
+                executor,
+                self._answer_question,
+                {index: (questions[index], contexts[index])
+                 for index in query_indices},
+                results)
+        for index, answer in answers.items():
+            results[index].answer = answer
+        return results
+
+
+# Engine shared by the app's entrypoints below. Creating it is cheap, as its
+# collection handle and models are initialized lazily (see `warm_up`).
+engine = DocumentationQAEngine()
+
+
+def warm_up():
+    """Initializes the app's clients, models and indexes.
+
+    The vector DB client, embedding model and (depending on the
+    hyperparameters) BM25 index and cross-encoder are otherwise initialized
+    lazily, while answering the first question. Call this function at
+    startup (e.g. before serving requests) to instead pay that cost upfront.
+    """
+    engine.warm_up()
+
+
 def rephrase_question(question: str) -> str:
     """Rephrase the user's question in a specific context.
 
@@ -24,27 +1231,29 @@ def rephrase_question(question: str) -> str:
     question is intended to provide a more informative and relevant vector DB
     query by incorporating more relevant keywords and phrases.
 
+    Rephrased questions are cached in `rephrase_cache`.
+
     Args:
         question: The user's question.
 
     Returns:
         The question rephrased in a specific context.
     """
-    rephrase_prompt_system = inductor.hparam(
-        "rephrase_prompt",
-        prompts.REPHRASE_PROMPT_DEFAULT)
-    rephrase_prompt_user = (
-        "Rephrase the following question to fit the context of the "
-        "provided subject matter.\n"
-        f"QUESTION:\n{question}")
+    return engine.rephrase_question(question)
 
-    response = openai_client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": rephrase_prompt_system},
-            {"role": "user", "content": rephrase_prompt_user}],
-        model="gpt-4o")
-    rephrase_response = response.choices[0].message.content
-    return rephrase_response
+
+async def rephrase_question_async(question: str) -> str:
+    """Rephrase the user's question in a specific context.
+
+    Async variant of `rephrase_question`.
+
+    Args:
+        question: The user's question.
+
+    Returns:
+        The question rephrased in a specific context.
+    """
+    return await engine.rephrase_question_async(question)
 
 
 @inductor.logger
@@ -53,59 +1262,97 @@ def documentation_qa(question: str) -> str:
 
     Args:
         question: The user's question.
-    
+
     Returns:
         The answer to the user's question.
     """
-    try:
-        collection = setup_db.chroma_client.get_collection(
-            name=setup_db.COLLECTION_NAME)
-    except ValueError as error:
-        print("Vector DB collection not found. Please create the collection "
-              "by running `python3 setup_db.py`.")
-        raise error
-
-    # Decide whether to use the user's original question or a version of the
-    # question rephrased by an LLM as the query text for the vector DB.
-    # The rephrased question is intended to provide a more informative and
-    # relevant vector DB query by incorporating more relevant keywords and
-    # phrases. However, this RAG strategy is not universally effective and
-    # incurs additional latency and cost due to the additional LLM API call
-    # used to generate the rephrased question. We use a hyperparameter to
-    # toggle this strategy on or off, enabling easy experimentation and
-    # evaluation of the strategy's effectiveness.
-    vector_query_text_type = inductor.hparam(
-        "vector_query_text_type", "rephrase")
-    if vector_query_text_type == "rephrase":
-        rephrased_question = rephrase_question(question)
-        query_text = rephrased_question
-    else:
-        query_text = question
-    inductor.log(query_text, name="vector_query_text")
-
-    query_result = collection.query(
-        query_texts=[query_text],
-        n_results=inductor.hparam("vector_query_result_num", 4))
-    documents = query_result["documents"][0]
-    metadatas = query_result["metadatas"][0]
-    inductor.log(query_result, name="vector_query_result")
+    return engine.answer(question)
 
-    contexts = []
-    for document, metadata in zip(documents, metadatas):
-        context = (
-            "CONTEXT: " + document + "\n\n"
-            "REFERENCE: " + metadata.get("url", "N/A") + "\n\n")
-        contexts.append(context)
-    contexts = "\n\n".join(contexts)
-    inductor.log(contexts, name="contexts")
 
-    prompt = inductor.hparam("main_prompt", prompts.MAIN_PROMPT_DEFAULT)
-    prompt += f"CONTEXTs:\n{contexts}"
+@inductor.logger
+def documentation_qa_stream(question: str) -> Iterator[str]:
+    """Answer a question about one or more markdown documents, streaming.
+
+    Streaming variant of `documentation_qa`. Retrieval is performed (and its
+    values logged) before this function returns, and the answer is then
+    streamed from the LLM as it is generated, so that the first part of the
+    answer is available as soon as the LLM produces it.
+
+    `inductor.logger` wraps the returned iterator and, once it is exhausted,
+    logs the concatenation of the yielded deltas (i.e. the final assembled
+    answer) as the output of this execution.
+
+    Args:
+        question: The user's question.
 
-    response = openai_client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": question}],
-        model="gpt-4o")
-    response = response.choices[0].message.content
-    return response
+    Returns:
+        An iterator over the text deltas of the answer to the user's question.
+    """
+    return engine.answer_stream(question)
+
+
+# NOTE: `inductor.logger` does not currently support coroutine functions, so
+# this function is not decorated with it. Inductor playgrounds and test suites
+# run coroutine functions natively (e.g. `inductor playground
+# app:documentation_qa_async`), in which case the `inductor.log` calls below
+# are recorded as usual.
+async def documentation_qa_async(question: str) -> str:
+    """Answer a question about one or more markdown documents.
+
+    Async variant of `documentation_qa`, which uses the same hyperparameters
+    and logged values. The LLM API calls are awaited on the engine's shared
+    async OpenAI client, and the (blocking) vector DB query is run in a
+    worker thread, so that a single event loop can serve many questions
+    concurrently.
+
+    Args:
+        question: The user's question.
+
+    Returns:
+        The answer to the user's question.
+    """
+    return await engine.answer_async(question)
+
+
+async def documentation_qa_stream_async(question: str) -> AsyncIterator[str]:
+    """Answer a question about one or more markdown documents, streaming.
+
+    Async variant of `documentation_qa_stream`. As with
+    `documentation_qa_async`, this function is not decorated with
+    `inductor.logger`, so the final assembled answer is logged explicitly
+    (under the name "answer") once the stream is exhausted.
+
+    Args:
+        question: The user's question.
+
+    Yields:
+        The text deltas of the answer to the user's question.
+    """
+    async for answer_delta in engine.answer_stream_async(question):
+        yield answer_delta
+
+
+@inductor.logger
+def documentation_qa_batch(
+    questions: List[str],
+    max_concurrency: int = 8) -> List[BatchAnswer]:
+    """Answer many questions about one or more markdown documents at once.
+
+    Batch variant of `documentation_qa` (e.g. for backfills and evaluation
+    replays), which uses the same hyperparameters. The query texts for all
+    questions are embedded and queried in a single vector DB call, and the
+    LLM API calls are made concurrently. Since latency is not a concern
+    for batches, the "speculative" vector query text type is treated as
+    "rephrase".
+
+    An error answering one question does not fail the whole batch; instead,
+    it is recorded on that question's `BatchAnswer`.
+
+    Args:
+        questions: The users' questions.
+        max_concurrency: Maximum number of LLM API calls in flight at once.
+
+    Returns:
+        The answers to the questions, in the same order as the questions.
+    """
+    return engine.answer_batch(questions, max_concurrency)
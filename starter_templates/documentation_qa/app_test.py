@@ -0,0 +1,103 @@
+"""Unit Tests for the Hyperparameters of `app.py`
+
+Checks (without importing the app) that every hyperparameter that the app
+reads is either part of the key that concurrent identical questions are
+coalesced on, or known not to affect the answer, and that each is read with
+a single default value.
+
+Usage (from this directory, with pytest installed):
+    python -m pytest app_test.py
+"""
+import ast
+import collections
+import os
+from typing import List, Set
+
+import pytest
+
+
+_APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+@pytest.fixture(name="module", scope="module")
+def fixture_module() -> ast.Module:
+    """Returns the syntax tree of `app.py`."""
+    with open(_APP_PATH, "r", encoding="utf-8") as f:
+        return ast.parse(f.read())
+
+
+def _get_tuple_constant(module: ast.Module, name: str) -> Set[str]:
+    """Returns the strings of a module-level tuple constant."""
+    for node in module.body:
+        if (isinstance(node, ast.Assign) and
+            isinstance(node.targets[0], ast.Name) and
+            node.targets[0].id == name):
+            return set(ast.literal_eval(node.value))
+    raise AssertionError(f"{name} is not defined.")
+
+
+def _get_function(module: ast.Module, name: str) -> ast.FunctionDef:
+    """Returns the function (or method) of the given name."""
+    for node in ast.walk(module):
+        if isinstance(node, ast.FunctionDef) and node.name == name:
+            return node
+    raise AssertionError(f"{name} is not defined.")
+
+
+def _get_calls(node: ast.AST, func_name: str) -> List[ast.Call]:
+    """Returns the calls to a function (or attribute) within a node."""
+    calls = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            func = child.func
+            if ((isinstance(func, ast.Name) and func.id == func_name) or
+                (isinstance(func, ast.Attribute) and func.attr == func_name)):
+                calls.append(child)
+    return calls
+
+
+def _get_hparam_names(node: ast.AST) -> Set[str]:
+    """Returns the names of the hyperparameters read within a node."""
+    names = set()
+    for call in _get_calls(node, "_hparam"):
+        assert isinstance(call.args[0], ast.Constant), (
+            f"Line {call.lineno}: hyperparameter names must be literals.")
+        names.add(call.args[0].value)
+    return names
+
+
+def test_hparams_are_read_through_hparam(module: ast.Module):
+    """Checks that `inductor.hparam` is only called by `_hparam`."""
+    calls = _get_calls(module, "hparam")
+    allowed = _get_calls(_get_function(module, "_hparam"), "hparam")
+    assert len(calls) == len(allowed), "Read hyperparameters with `_hparam`."
+
+
+def test_hparams_are_listed(module: ast.Module):
+    """Checks that every hyperparameter read is part of the coalescing key
+    or listed as not affecting the answer."""
+    coalescing = _get_hparam_names(
+        _get_function(module, "_get_coalescing_hparams"))
+    non_coalescing = _get_tuple_constant(
+        module, "_NON_COALESCING_HPARAM_NAMES")
+    names = _get_hparam_names(module)
+    unlisted = names - coalescing - non_coalescing
+    assert not unlisted, (
+        f"Add {sorted(unlisted)} to _get_coalescing_hparams (or, if they do "
+        "not affect the answer, to _NON_COALESCING_HPARAM_NAMES).")
+    assert not non_coalescing - names, (
+        "Remove the hyperparameters that are no longer read from "
+        "_NON_COALESCING_HPARAM_NAMES.")
+
+
+def test_hparams_have_single_default(module: ast.Module):
+    """Checks that each hyperparameter is read with the same default value
+    everywhere, so that no other default is recorded for it."""
+    defaults = collections.defaultdict(set)
+    for call in _get_calls(module, "_hparam"):
+        defaults[call.args[0].value].add(ast.unparse(call.args[1]))
+    inconsistent = {
+        name: sorted(values) for name, values in defaults.items()
+        if len(values) > 1}
+    assert not inconsistent, (
+        f"Hyperparameters read with different defaults: {inconsistent}")
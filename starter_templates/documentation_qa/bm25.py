@@ -0,0 +1,260 @@
+"""BM25 Keyword Index for Documentation Question-Answering (Q&A) Bot"""
+import collections
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Format version of the persisted index. Increment when the format changes.
+_INDEX_FORMAT_VERSION = 2
+
+# Tokens are runs of letters, digits and underscores, so that identifiers such
+# as `model_construct` are matched as a whole.
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into lowercase keyword tokens.
+
+    Args:
+        text: Text to tokenize.
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """In-process inverted index that ranks documents using Okapi BM25.
+
+    The index is built from the same documents as the vector DB collection
+    (see `setup_db.py`) and complements it by matching exact keywords, such
+    as API names, which embedding search can miss. Search results have the
+    same format as the results of a Chroma collection query for a single
+    query text.
+
+    Attributes:
+        collection_version: Version of the vector DB collection that the
+            index was built alongside, if any (see
+            `setup_db.get_collection_version`).
+        ids: ID of each indexed document.
+        documents: Text of each indexed document.
+        metadatas: Metadata of each indexed document.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Optional[Dict[str, Any]]],
+        postings: Dict[str, List[List[int]]],
+        doc_lengths: List[int],
+        collection_version: Optional[str] = None,
+        k1: float = 1.5,
+        b: float = 0.75):
+        """Create a BM25Index from precomputed postings.
+
+        Use `BM25Index.build` to build an index from documents, or
+        `BM25Index.load` to load a persisted index.
+
+        Args:
+            ids: ID of each indexed document.
+            documents: Text of each indexed document.
+            metadatas: Metadata of each indexed document.
+            postings: Maps each term to a list of [document index, term
+                frequency] pairs.
+            doc_lengths: Number of tokens in each indexed document.
+            collection_version: Version of the vector DB collection that
+                the index was built alongside, if any.
+            k1: BM25 term frequency saturation parameter.
+            b: BM25 document length normalization parameter.
+        """
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.collection_version = collection_version
+        self._postings = postings
+        self._doc_lengths = doc_lengths
+        self._k1 = k1
+        self._b = b
+
+        # Precompute the BM25 score contribution of each term to each
+        # document containing it, so that a search only sums these weights.
+        num_documents = len(documents)
+        lengths = np.asarray(doc_lengths, dtype=np.float32)
+        average_length = float(lengths.mean()) if num_documents else 0.0
+        self._term_weights: Dict[str, Any] = {}
+        for term, term_postings in postings.items():
+            postings_array = np.asarray(term_postings, dtype=np.int64)
+            doc_indices = postings_array[:, 0]
+            frequencies = postings_array[:, 1].astype(np.float32)
+            idf = math.log(
+                1 + (num_documents - len(term_postings) + 0.5) /
+                (len(term_postings) + 0.5))
+            length_norm = 1 - b + b * lengths[doc_indices] / average_length
+            weights = idf * frequencies * (k1 + 1) / (
+                frequencies + k1 * length_norm)
+            self._term_weights[term] = (doc_indices, weights)
+
+    @classmethod
+    def build(
+        cls,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Optional[Dict[str, Any]]],
+        collection_version: Optional[str] = None) -> "BM25Index":
+        """Builds an index of the given documents.
+
+        Args:
+            ids: ID of each document.
+            documents: Text of each document.
+            metadatas: Metadata of each document.
+            collection_version: Version of the vector DB collection that
+                the index is built alongside, if any.
+
+        Returns:
+            The built index.
+        """
+        postings = collections.defaultdict(list)
+        doc_lengths = []
+        for doc_index, document in enumerate(documents):
+            tokens = tokenize(document)
+            doc_lengths.append(len(tokens))
+            for term, frequency in collections.Counter(tokens).items():
+                postings[term].append([doc_index, frequency])
+        return cls(
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            postings=dict(postings),
+            doc_lengths=doc_lengths,
+            collection_version=collection_version)
+
+    def save(self, path: str):
+        """Persists the index to a JSON file.
+
+        Args:
+            path: Path of the file to write.
+        """
+        # Serialized with `json.dumps` rather than `json.dump`, as the latter
+        # does not use the (much faster) C encoder.
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "version": _INDEX_FORMAT_VERSION,
+                "collection_version": self.collection_version,
+                "k1": self._k1,
+                "b": self._b,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+                "doc_lengths": self._doc_lengths,
+                "postings": self._postings,
+            }))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Loads an index persisted by `save`.
+
+        Args:
+            path: Path of the file to read.
+
+        Returns:
+            The loaded index.
+
+        Raises:
+            ValueError: If the file was written in an unsupported format.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != _INDEX_FORMAT_VERSION:
+            raise ValueError(
+                "Unsupported BM25 index format version: "
+                f"{data.get('version')}")
+        return cls(
+            ids=data["ids"],
+            documents=data["documents"],
+            metadatas=data["metadatas"],
+            postings=data["postings"],
+            doc_lengths=data["doc_lengths"],
+            collection_version=data["collection_version"],
+            k1=data["k1"],
+            b=data["b"])
+
+    def search(self, query: str, n_results: int) -> Dict[str, Any]:
+        """Returns the documents that best match the query's keywords.
+
+        Documents that do not contain any of the query's keywords are never
+        returned, so fewer than `n_results` documents may be returned.
+
+        Args:
+            query: Query text.
+            n_results: Maximum number of documents to return.
+
+        Returns:
+            The matching documents, in the format of a Chroma collection query
+            result for a single query text (with BM25 scores, rather than
+            distances, under "scores").
+        """
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_weights = self._term_weights.get(term)
+            if term_weights is not None:
+                doc_indices, weights = term_weights
+                scores[doc_indices] += weights
+
+        matching = np.flatnonzero(scores)
+        if len(matching) > n_results:
+            matching = matching[
+                np.argpartition(-scores[matching], n_results - 1)[:n_results]]
+        top_indices = matching[np.argsort(-scores[matching], kind="stable")]
+        return {
+            "ids": [[self.ids[i] for i in top_indices]],
+            "documents": [[self.documents[i] for i in top_indices]],
+            "metadatas": [[self.metadatas[i] for i in top_indices]],
+            "scores": [[float(scores[i]) for i in top_indices]],
+        }
+
+
+def reciprocal_rank_fusion(
+    query_results: Sequence[Dict[str, Any]],
+    n_results: int,
+    k: int = 60) -> Dict[str, Any]:
+    """Fuses ranked query results using reciprocal rank fusion (RRF).
+
+    Each document is scored by the sum of 1 / (k + rank) over the results that
+    contain it (with ranks starting at 1), so documents ranked highly by
+    several retrievers are ranked highest.
+
+    Args:
+        query_results: Results to fuse, each in the format of a Chroma
+            collection query result for a single query text.
+        n_results: Maximum number of documents to return.
+        k: RRF smoothing constant. Larger values reduce the influence of the
+            top ranks.
+
+    Returns:
+        The fused result, in the format of a Chroma collection query result
+        for a single query text.
+    """
+    fused_scores = collections.defaultdict(float)
+    documents = {}
+    metadatas = {}
+    for query_result in query_results:
+        for rank, (result_id, document, metadata) in enumerate(
+            zip(query_result["ids"][0],
+                query_result["documents"][0],
+                query_result["metadatas"][0]),
+            start=1):
+            fused_scores[result_id] += 1 / (k + rank)
+            documents[result_id] = document
+            metadatas[result_id] = metadata
+    # Ties are broken by the order in which documents were first seen.
+    top_ids = sorted(
+        fused_scores, key=lambda result_id: -fused_scores[result_id]
+    )[:n_results]
+    return {
+        "ids": [top_ids],
+        "documents": [[documents[result_id] for result_id in top_ids]],
+        "metadatas": [[metadatas[result_id] for result_id in top_ids]],
+    }
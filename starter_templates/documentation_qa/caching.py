@@ -0,0 +1,467 @@
+"""Caches for Documentation Question-Answering (Q&A) Bot"""
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import (
+    Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple)
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Returns text normalized for use in a cache key.
+
+    Normalization lowercases the text and collapses all whitespace, so that
+    trivially different versions of the same text share a cache entry.
+
+    Args:
+        text: Text to normalize.
+    """
+    return " ".join(text.lower().split())
+
+
+def hash_text(text: str) -> str:
+    """Returns a stable hex digest of the given text.
+
+    Args:
+        text: Text to hash.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional entry expiry.
+
+    Attributes:
+        max_size: Maximum number of entries. When exceeded, the least recently
+            used entry is evicted.
+        ttl: Number of seconds after which an entry expires, or None if
+            entries do not expire.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        """Create an LRUCache.
+
+        Args:
+            max_size: Maximum number of entries.
+            ttl: Number of seconds after which an entry expires, or None if
+                entries do not expire.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        # Maps keys to (expiry time, value) tuples, in least to most
+        # recently used order.
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the value for the given key, or None if not cached.
+
+        Args:
+            key: Cache key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        """Caches a value under the given key.
+
+        Args:
+            key: Cache key.
+            value: Value to cache. Must not be None.
+        """
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCache:
+    """Thread-safe on-disk cache with optional entry expiry, using SQLite.
+
+    Values are stored as JSON, so they must be JSON-serializable.
+
+    Attributes:
+        path: Path to the SQLite database file.
+        ttl: Number of seconds after which an entry expires, or None if
+            entries do not expire.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        """Create an SQLiteCache.
+
+        Creates the database file if it does not exist, and deletes any
+        expired entries from it.
+
+        Args:
+            path: Path to the SQLite database file.
+            ttl: Number of seconds after which an entry expires, or None if
+                entries do not expire.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+            self._connection.execute(
+                "DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the value for the given key, or None if not cached.
+
+        Args:
+            key: Cache key.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                with self._connection:
+                    self._connection.execute(
+                        "DELETE FROM cache WHERE key = ?", (key,))
+                return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        """Caches a value under the given key.
+
+        Args:
+            key: Cache key.
+            value: JSON-serializable value to cache. Must not be None.
+        """
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at))
+
+
+class TwoTierCache:
+    """In-memory LRU cache backed by an optional on-disk cache.
+
+    Lookups check the in-memory tier first and then the on-disk tier (if
+    any). Values found on disk are promoted to the in-memory tier. Hits (per
+    tier) and misses are counted.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None):
+        """Create a TwoTierCache.
+
+        Args:
+            max_size: Maximum number of entries in the in-memory tier.
+            ttl: Number of seconds after which an entry expires (in either
+                tier), or None if entries do not expire.
+            path: Path to the SQLite database file used for the on-disk
+                tier, or None to only cache values in memory.
+        """
+        self._memory = LRUCache(max_size, ttl)
+        self._disk = SQLiteCache(path, ttl) if path is not None else None
+        self._counts = collections.Counter()
+        self._counts_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the value for the given key, or None if not cached.
+
+        Args:
+            key: Cache key.
+        """
+        value = self._memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self._disk is not None:
+            value = self._disk.get(key)
+            if value is not None:
+                self._memory.set(key, value)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any):
+        """Caches a value under the given key in all tiers.
+
+        Args:
+            key: Cache key.
+            value: JSON-serializable value to cache. Must not be None.
+        """
+        self._memory.set(key, value)
+        if self._disk is not None:
+            self._disk.set(key, value)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counts since the cache was created."""
+        with self._counts_lock:
+            counts = dict(self._counts)
+        for name in ("memory_hits", "disk_hits", "misses"):
+            counts.setdefault(name, 0)
+        counts["hits"] = counts["memory_hits"] + counts["disk_hits"]
+        return counts
+
+    def _count(self, name: str):
+        """Increments the named counter."""
+        with self._counts_lock:
+            self._counts[name] += 1
+
+
+class SemanticCache:
+    """Thread-safe cache of values keyed on text embedding similarity.
+
+    Entries are grouped into namespaces, and a lookup only matches entries
+    within the same namespace. Namespaces should identify everything other
+    than the text that the cached values depend on (e.g. the documents and
+    prompt used to generate a cached answer), so that entries are implicitly
+    invalidated when any of it changes. When the cache is full, the least
+    recently used entry (in any namespace) is evicted.
+
+    Attributes:
+        max_size: Maximum number of entries.
+    """
+
+    def __init__(self, max_size: int):
+        """Create a SemanticCache.
+
+        Args:
+            max_size: Maximum number of entries.
+        """
+        self.max_size = max_size
+        # Maps entry IDs to (namespace, unit-normalized embedding, value)
+        # tuples, in least to most recently used order.
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._next_entry_id = 0
+        self._counts = collections.Counter()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        namespace: str,
+        embedding: Sequence[float],
+        similarity_threshold: float) -> Optional[Tuple[Any, float]]:
+        """Returns the cached value with the most similar embedding.
+
+        Args:
+            namespace: Namespace to look up the embedding in.
+            embedding: Embedding of the text to look up.
+            similarity_threshold: Minimum cosine similarity between the given
+                embedding and the embedding of a cached entry for the entry
+                to match.
+
+        Returns:
+            A tuple of (cached value, cosine similarity) for the most similar
+            matching entry, or None if no entry matches.
+        """
+        query = _unit_normalize(embedding)
+        with self._lock:
+            entry_ids = [
+                entry_id
+                for entry_id, (entry_namespace, _, _) in self._entries.items()
+                if entry_namespace == namespace]
+            if entry_ids:
+                similarities = np.stack(
+                    [self._entries[entry_id][1] for entry_id in entry_ids]
+                ) @ query
+                best_index = int(np.argmax(similarities))
+                similarity = float(similarities[best_index])
+                if similarity >= similarity_threshold:
+                    best_entry_id = entry_ids[best_index]
+                    self._entries.move_to_end(best_entry_id)
+                    self._counts["hits"] += 1
+                    return self._entries[best_entry_id][2], similarity
+            self._counts["misses"] += 1
+            return None
+
+    def set(self, namespace: str, embedding: Sequence[float], value: Any):
+        """Caches a value under the given namespace and embedding.
+
+        Args:
+            namespace: Namespace to cache the value in.
+            embedding: Embedding of the text that the value corresponds to.
+            value: Value to cache.
+        """
+        with self._lock:
+            self._entries[self._next_entry_id] = (
+                namespace, _unit_normalize(embedding), value)
+            self._next_entry_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counts since the cache was created."""
+        with self._lock:
+            return {
+                "hits": self._counts["hits"],
+                "misses": self._counts["misses"],
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single call.
+
+    The first caller for a key (the leader) makes the call; callers with the
+    same key that arrive while the call is in flight (followers) wait for it
+    and share its result (or exception), rather than making the call again.
+    Nothing is cached: once the call completes, the next caller for the key
+    makes a new call. Sync and async callers share calls with each other.
+
+    Calls and coalesced calls (i.e. followers) are counted.
+    """
+
+    def __init__(self):
+        """Create a SingleFlight."""
+        # Maps the key of each in-flight call to a tuple of (future of the
+        # call's result, event loop of the leader if it is async, else
+        # None).
+        self._calls: Dict[str, Tuple[
+            concurrent.futures.Future,
+            Optional[asyncio.AbstractEventLoop]]] = {}
+        self._counts = collections.Counter()
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Calls a function, unless a call with the same key is in flight.
+
+        Args:
+            key: Key identifying the call.
+            func: Function to call.
+
+        Returns:
+            A tuple of (result of the call, whether the call was coalesced
+            with an in-flight call).
+        """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        with self._lock:
+            self._counts["calls"] += 1
+            call = self._calls.get(key)
+            if call is None:
+                future = concurrent.futures.Future()
+                self._calls[key] = (future, None)
+            elif running_loop is None or call[1] is not running_loop:
+                self._counts["coalesced"] += 1
+        if call is not None:
+            if running_loop is not None and call[1] is running_loop:
+                # Blocking this thread on a call led by a coroutine running
+                # on this thread's event loop would deadlock, so the function
+                # is called separately instead.
+                return func(), False
+            return call[0].result(), True
+        try:
+            result = func()
+        except BaseException as error:
+            self._finish(key, future, error=error)
+            raise
+        self._finish(key, future, result=result)
+        return result, False
+
+    async def do_async(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Awaits a call, unless a call with the same key is in flight.
+
+        Async variant of `do`.
+
+        Args:
+            key: Key identifying the call.
+            func: Coroutine function to call.
+
+        Returns:
+            A tuple of (result of the call, whether the call was coalesced
+            with an in-flight call).
+        """
+        with self._lock:
+            self._counts["calls"] += 1
+            call = self._calls.get(key)
+            if call is None:
+                future = concurrent.futures.Future()
+                self._calls[key] = (future, asyncio.get_running_loop())
+            else:
+                self._counts["coalesced"] += 1
+        if call is not None:
+            # Shielded so that cancelling a follower does not cancel the
+            # call for the leader and other followers.
+            return await asyncio.shield(asyncio.wrap_future(call[0])), True
+        try:
+            result = await func()
+        except BaseException as error:
+            self._finish(key, future, error=error)
+            raise
+        self._finish(key, future, result=result)
+        return result, False
+
+    def _finish(
+        self,
+        key: str,
+        future: concurrent.futures.Future,
+        result: Any = None,
+        error: Optional[BaseException] = None):
+        """Ends an in-flight call and passes its outcome to its followers."""
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Call and coalesced call counts since creation."""
+        with self._lock:
+            return {
+                "calls": self._counts["calls"],
+                "coalesced": self._counts["coalesced"],
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def _unit_normalize(embedding: Sequence[float]) -> np.ndarray:
+    """Returns the embedding as a float32 array scaled to unit length.
+
+    Args:
+        embedding: Embedding to normalize.
+    """
+    array = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
@@ -0,0 +1,172 @@
+"""Section Chunking for Documentation Question-Answering (Q&A) Bot"""
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pydantic
+
+import context_packing
+
+
+# Separator between the sections merged into a single chunk.
+_SECTION_SEPARATOR = "\n\n"
+
+
+class ChunkingConfig(pydantic.BaseModel):
+    """Configuration of how Markdown sections are chunked into nodes.
+
+    Sizes are in gpt-4o tokens (see `context_packing.count_tokens`).
+
+    Attributes:
+        chunk_size: Maximum size of a chunk, or None to make each section a
+            single chunk regardless of its size (in which case the other
+            attributes are ignored).
+        chunk_overlap: Maximum number of tokens at the end of a chunk that
+            are repeated at the start of the next chunk of the same section.
+            Overlap is at sentence granularity.
+        min_chunk_size: Sections smaller than this are merged with adjacent
+            sections of the same file, as long as the merged chunk fits
+            within `chunk_size`.
+    """
+    chunk_size: Optional[pydantic.PositiveInt] = None
+    chunk_overlap: pydantic.NonNegativeInt = 0
+    min_chunk_size: pydantic.NonNegativeInt = 0
+
+    @pydantic.model_validator(mode="after")
+    def _check_overlap(self) -> "ChunkingConfig":
+        """Checks that the overlap is smaller than the chunk size."""
+        if (self.chunk_size is not None and
+            self.chunk_overlap >= self.chunk_size):
+            raise ValueError("chunk_overlap must be smaller than chunk_size.")
+        return self
+
+
+def _split_section(
+    section: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """Splits a section into chunks of at most `chunk_size` tokens.
+
+    The section's body is split into sentences (see
+    `context_packing.split_sentences`; sentences larger than a chunk are
+    split into token windows), which are packed into chunks in order. Each
+    chunk starts with the section's header, if any, so that it can be
+    understood (and cited) on its own, and with the trailing sentences of
+    the previous chunk, up to `chunk_overlap` tokens.
+
+    Args:
+        section: Markdown section, whose first line is its header if it
+            starts with "# ".
+        chunk_size: Maximum number of tokens of each chunk.
+        chunk_overlap: Maximum number of overlapping tokens between
+            consecutive chunks.
+
+    Returns:
+        The chunks of the section.
+    """
+    header, _, body = section.partition("\n")
+    if header.startswith("# "):
+        prefix = f"{header}\n"
+    else:
+        prefix, body = "", section
+    budget = max(chunk_size - context_packing.count_tokens(prefix), 1)
+
+    # Tuples of (text, number of tokens) of each piece of the body.
+    pieces: List[Tuple[str, int]] = []
+    for sentence in context_packing.split_sentences(body):
+        num_tokens = context_packing.count_tokens(sentence)
+        if num_tokens <= budget:
+            pieces.append((sentence, num_tokens))
+        else:
+            pieces.extend(
+                (piece, context_packing.count_tokens(piece))
+                for piece in context_packing.split_tokens(sentence, budget))
+
+    windows: List[List[Tuple[str, int]]] = []
+    window: List[Tuple[str, int]] = []
+    window_tokens = 0
+    for piece, num_tokens in pieces:
+        if window and window_tokens + num_tokens > budget:
+            windows.append(window)
+            # The next window starts with the trailing pieces of this one
+            # (but never all of them, so that each window makes progress).
+            overlap: List[Tuple[str, int]] = []
+            overlap_tokens = 0
+            for previous_piece in reversed(window[1:]):
+                overlap_tokens += previous_piece[1]
+                if (overlap_tokens > chunk_overlap or
+                    overlap_tokens + num_tokens > budget):
+                    overlap_tokens -= previous_piece[1]
+                    break
+                overlap.insert(0, previous_piece)
+            window, window_tokens = overlap, overlap_tokens
+        window.append((piece, num_tokens))
+        window_tokens += num_tokens
+    if window:
+        windows.append(window)
+
+    chunks = []
+    for window in windows:
+        text = "".join(piece for piece, _ in window).strip()
+        if text:
+            chunks.append(prefix + text)
+    return chunks or [section]
+
+
+def chunk_sections(
+    sections: Iterable[str],
+    config: ChunkingConfig) -> Iterator[Tuple[str, str]]:
+    """Chunks the Markdown sections of a file.
+
+    Header boundaries are kept: sections larger than `config.chunk_size`
+    are split into several chunks (see `_split_section`), and adjacent
+    sections smaller than `config.min_chunk_size` are merged into a single
+    chunk, but a chunk never contains part of one section along with
+    (part of) another. Sections are consumed lazily.
+
+    Args:
+        sections: Sections of a Markdown file, in order (e.g. as yielded by
+            `setup_db._split_markdown_by_header`).
+        config: Chunking configuration.
+
+    Yields:
+        A tuple of (the section that the chunk starts with, the chunk) for
+        each chunk, in order. The section can be used to derive the chunk's
+        citation URL.
+    """
+    if config.chunk_size is None:
+        for section in sections:
+            yield section, section
+        return
+
+    # Sections pending to be merged with the next section, and their total
+    # number of tokens (including the separators between them).
+    pending: List[str] = []
+    pending_tokens = 0
+    separator_tokens = context_packing.count_tokens(_SECTION_SEPARATOR)
+    for section in sections:
+        num_tokens = context_packing.count_tokens(section)
+        if (pending and
+            min(pending_tokens, num_tokens) < config.min_chunk_size and
+            pending_tokens + separator_tokens + num_tokens <=
+            config.chunk_size):
+            pending.append(section)
+            pending_tokens += separator_tokens + num_tokens
+            continue
+        yield from _flush_sections(pending, pending_tokens, config)
+        pending = [section]
+        pending_tokens = num_tokens
+    yield from _flush_sections(pending, pending_tokens, config)
+
+
+def _flush_sections(
+    sections: List[str],
+    num_tokens: int,
+    config: ChunkingConfig) -> Iterator[Tuple[str, str]]:
+    """Yields the chunks of sections pending in `chunk_sections`."""
+    if not sections:
+        return
+    if len(sections) > 1:
+        yield sections[0], _SECTION_SEPARATOR.join(sections)
+    elif num_tokens > config.chunk_size:
+        for chunk in _split_section(
+            sections[0], config.chunk_size, config.chunk_overlap):
+            yield sections[0], chunk
+    else:
+        yield sections[0], sections[0]
@@ -0,0 +1,150 @@
+"""Context Packing for Documentation Question-Answering (Q&A) Bot"""
+import codecs
+import functools
+import re
+from typing import Any, Callable, Dict, List
+
+import pydantic
+import tiktoken
+
+
+# Splits text at sentence boundaries (whitespace following sentence-ending
+# punctuation) and line breaks. The boundaries are captured so that the text
+# can be reassembled exactly.
+_SENTENCE_BOUNDARY_PATTERN = re.compile(r"((?<=[.!?])\s+|\n+)")
+
+
+class PackedDocuments(pydantic.BaseModel):
+    """Documents selected to fit within a token budget.
+
+    Attributes:
+        documents: Selected documents (some of which may be truncated), in
+            their original order.
+        metadatas: Metadata of each selected document.
+        num_truncated: Number of documents that were truncated to fit within
+            the token budget.
+        num_dropped: Number of documents that were dropped entirely.
+    """
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    num_truncated: int = 0
+    num_dropped: int = 0
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding() -> tiktoken.Encoding:
+    """Returns the tokenizer of the LLM that answers questions (gpt-4o)."""
+    return tiktoken.encoding_for_model("gpt-4o")
+
+
+def count_tokens(text: str) -> int:
+    """Returns the number of gpt-4o tokens in the given text.
+
+    Args:
+        text: Text to count the tokens of.
+    """
+    return len(_get_encoding().encode(text, disallowed_special=()))
+
+
+def split_tokens(text: str, max_tokens: int) -> List[str]:
+    """Splits text into pieces of at most (about) the given number of tokens.
+
+    Pieces are cut at token boundaries, except that characters whose UTF-8
+    bytes span two tokens are kept whole, so joining the pieces reproduces
+    the original text.
+
+    Args:
+        text: Text to split.
+        max_tokens: Maximum number of gpt-4o tokens of each piece.
+    """
+    encoding = _get_encoding()
+    tokens = encoding.encode(text, disallowed_special=())
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pieces = []
+    for i in range(0, len(tokens), max_tokens):
+        piece = decoder.decode(
+            encoding.decode_bytes(tokens[i:i + max_tokens]),
+            final=i + max_tokens >= len(tokens))
+        if piece:
+            pieces.append(piece)
+    return pieces
+
+
+def split_sentences(text: str) -> List[str]:
+    """Splits text into sentences and lines.
+
+    Each returned piece includes its trailing whitespace, so that joining the
+    pieces reproduces the original text.
+
+    Args:
+        text: Text to split.
+    """
+    parts = _SENTENCE_BOUNDARY_PATTERN.split(text)
+    sentences = []
+    for i in range(0, len(parts), 2):
+        sentence = "".join(parts[i:i + 2])
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def pack_documents(
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    format_context: Callable[[str, Dict[str, Any]], str],
+    token_budget: int,
+    separator: str = "\n\n") -> PackedDocuments:
+    """Selects documents that fit within a token budget, in relevance order.
+
+    Documents are considered in the given (relevance) order. A document that
+    fits within the remaining budget is kept as is. A document that does not
+    fit is truncated at a sentence boundary to fit within the remaining
+    budget, or dropped if not even its first sentence fits. Later (smaller)
+    documents may still be kept after an earlier document was truncated or
+    dropped.
+
+    Args:
+        documents: Retrieved documents, in order of relevance.
+        metadatas: Metadata of each retrieved document.
+        format_context: Function that formats a document and its metadata for
+            inclusion in the prompt. Used to account for the tokens added by
+            formatting (e.g. the document's reference).
+        token_budget: Maximum total number of tokens of the formatted
+            documents, including the separators between them.
+        separator: Text that the formatted documents are joined with in the
+            prompt.
+
+    Returns:
+        The selected documents.
+    """
+    packed = PackedDocuments(documents=[], metadatas=[])
+    remaining_tokens = token_budget
+    separator_tokens = count_tokens(separator)
+    for document, metadata in zip(documents, metadatas):
+        overhead_tokens = count_tokens(format_context("", metadata))
+        # Every document after the first kept one is preceded by a separator.
+        if packed.documents:
+            overhead_tokens += separator_tokens
+        document_tokens = count_tokens(document)
+        if overhead_tokens + document_tokens <= remaining_tokens:
+            packed.documents.append(document)
+            packed.metadatas.append(metadata)
+            remaining_tokens -= overhead_tokens + document_tokens
+            continue
+
+        kept_sentences = []
+        used_tokens = overhead_tokens
+        for sentence in split_sentences(document):
+            sentence_tokens = count_tokens(sentence)
+            if used_tokens + sentence_tokens > remaining_tokens:
+                break
+            kept_sentences.append(sentence)
+            used_tokens += sentence_tokens
+        if kept_sentences:
+            packed.documents.append("".join(kept_sentences).rstrip())
+            packed.metadatas.append(metadata)
+            packed.num_truncated += 1
+            remaining_tokens -= used_tokens
+        else:
+            packed.num_dropped += 1
+    return packed
@@ -0,0 +1,264 @@
+"""Near-Duplicate Detection for Documentation Question-Answering (Q&A) Bot"""
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pydantic
+
+import bm25
+
+
+# Signatures are computed for groups of texts with at most this many
+# shingles in total at once, which bounds the memory used by the (number of
+# permutations x number of shingles) matrix of hash values.
+_MAX_SHINGLES_PER_GROUP = 2**15
+
+# Maximum number of distinct tokens whose hashes are cached by a `MinHasher`.
+_MAX_CACHED_TOKEN_HASHES = 2**20
+
+# Weights of the probabilities of false positives and false negatives of LSH
+# candidates when choosing the LSH parameters (see `_get_lsh_params`). False
+# negatives are weighted more heavily, as candidates are verified by their
+# estimated similarity, so a false positive only costs a comparison, while a
+# false negative is a missed near-duplicate.
+_FALSE_POSITIVE_WEIGHT = 0.05
+_FALSE_NEGATIVE_WEIGHT = 0.95
+
+
+class NearDuplicateConfig(pydantic.BaseModel):
+    """Configuration of near-duplicate node detection.
+
+    Nodes are compared by the Jaccard similarity of their sets of shingles
+    (runs of `shingle_size` consecutive keyword tokens, see `bm25.tokenize`),
+    which is estimated from MinHash signatures of `num_perm` hash values.
+
+    Attributes:
+        threshold: Jaccard similarity at or above which a node is a
+            near-duplicate of another, or None to disable near-duplicate
+            detection.
+        num_perm: Number of hash functions (permutations) of each MinHash
+            signature. More are more accurate, but slower.
+        shingle_size: Number of tokens of each shingle.
+        seed: Seed of the hash functions.
+    """
+    threshold: Optional[float] = pydantic.Field(default=None, gt=0, le=1)
+    num_perm: pydantic.PositiveInt = 128
+    shingle_size: pydantic.PositiveInt = 3
+    seed: int = 1
+
+
+class MinHasher:
+    """Computes MinHash signatures of texts.
+
+    Uses multiply-shift hashing on 64-bit shingle hashes, vectorized with
+    NumPy over all shingles of a group of texts. Signatures only depend on
+    the configuration, so they can be computed in different processes and
+    compared.
+    """
+
+    def __init__(self, config: NearDuplicateConfig):
+        """Initializes the hash functions.
+
+        Args:
+            config: Near-duplicate detection configuration.
+        """
+        self.num_perm = config.num_perm
+        self.shingle_size = config.shingle_size
+        rng = np.random.default_rng(config.seed)
+        max_value = np.iinfo(np.uint64).max
+        # Multiply-shift hashing requires odd multipliers.
+        self._multipliers = rng.integers(
+            max_value, size=self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._offsets = rng.integers(
+            max_value, size=self.num_perm, dtype=np.uint64)
+        # Combines the hashes of the tokens of a shingle into its hash.
+        self._token_multipliers = rng.integers(
+            max_value, size=self.shingle_size, dtype=np.uint64) | np.uint64(1)
+        self._token_hashes: Dict[str, int] = {}
+
+    def _get_shingle_hashes(self, text: str) -> np.ndarray:
+        """Returns the 64-bit hashes of the shingles of a text.
+
+        A text with fewer tokens than a shingle has a single shingle of all
+        of its tokens (or, if it has no tokens, a single shingle with a hash
+        of 0).
+        """
+        tokens = bm25.tokenize(text)
+        if len(self._token_hashes) > _MAX_CACHED_TOKEN_HASHES:
+            self._token_hashes.clear()
+        for token in set(tokens).difference(self._token_hashes):
+            self._token_hashes[token] = zlib.crc32(token.encode("utf-8"))
+        token_hashes = np.fromiter(
+            map(self._token_hashes.__getitem__, tokens),
+            dtype=np.uint64, count=len(tokens))
+        shingle_size = min(self.shingle_size, len(tokens))
+        if shingle_size == 0:
+            return np.zeros(1, dtype=np.uint64)
+        num_shingles = len(tokens) - shingle_size + 1
+        shingle_hashes = np.zeros(num_shingles, dtype=np.uint64)
+        for i in range(shingle_size):
+            shingle_hashes += (
+                token_hashes[i:i + num_shingles] * self._token_multipliers[i])
+        return shingle_hashes
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """Returns the MinHash signatures of texts.
+
+        Args:
+            texts: Texts to compute the signatures of.
+
+        Returns:
+            A (number of texts x `num_perm`) array of 32-bit hash values.
+        """
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        group_start = 0
+        group_hashes: List[np.ndarray] = []
+        num_group_shingles = 0
+        for i, text in enumerate(texts):
+            shingle_hashes = self._get_shingle_hashes(text)
+            group_hashes.append(shingle_hashes)
+            num_group_shingles += len(shingle_hashes)
+            if (num_group_shingles >= _MAX_SHINGLES_PER_GROUP or
+                i == len(texts) - 1):
+                signatures[group_start:i + 1] = self._get_min_hashes(
+                    group_hashes)
+                group_start = i + 1
+                group_hashes = []
+                num_group_shingles = 0
+        return signatures
+
+    def _get_min_hashes(self, shingle_hashes: List[np.ndarray]) -> np.ndarray:
+        """Returns the signatures of texts, given their shingle hashes."""
+        starts = np.cumsum([0] + [len(hashes) for hashes in shingle_hashes])
+        # The top 32 bits of (a * x + b) mod 2^64 for each hash function
+        # (a, b) and shingle hash x. Each row is reduced separately, which is
+        # faster than reducing columns.
+        hashes = np.multiply.outer(
+            self._multipliers, np.concatenate(shingle_hashes))
+        hashes += self._offsets[:, None]
+        hashes >>= np.uint64(32)
+        return np.minimum.reduceat(hashes, starts[:-1], axis=1).T.astype(
+            np.uint32)
+
+
+def _get_lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """Returns the number of LSH bands and rows per band for a threshold.
+
+    Signatures are split into bands, and two signatures are candidate
+    near-duplicates if any of their bands are equal, which happens with
+    probability 1 - (1 - s^rows)^bands for Jaccard similarity s. Chooses the
+    parameters that minimize the weighted sum of the probabilities of false
+    positives (below the threshold) and false negatives (at or above it).
+    """
+    below = np.linspace(0, threshold, 64)
+    above = np.linspace(threshold, 1, 64)
+    best_params = (1, num_perm)
+    best_error = float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positive = np.trapz(
+                1 - (1 - below**rows)**bands, below)
+            false_negative = np.trapz(
+                (1 - above**rows)**bands, above)
+            error = (_FALSE_POSITIVE_WEIGHT * false_positive +
+                     _FALSE_NEGATIVE_WEIGHT * false_negative)
+            if error < best_error:
+                best_params = (bands, rows)
+                best_error = error
+    return best_params
+
+
+class NearDuplicateIndex:
+    """Locality-sensitive hashing (LSH) index of MinHash signatures.
+
+    Keeps one representative per cluster of near-duplicates: each added
+    signature is compared with the representatives that share one of its
+    LSH bands, and it becomes a duplicate of the most similar one whose
+    estimated Jaccard similarity is at or above the threshold, or a new
+    representative otherwise. Only the signatures of representatives are
+    stored (in a NumPy array), along with a hash of each of their bands, so
+    memory grows by roughly 2 KB per representative (with 128
+    permutations), and millions of nodes can be indexed.
+
+    The first representative in a band bucket keeps it, so a later
+    representative is only found through its other bands.
+    """
+
+    def __init__(self, config: NearDuplicateConfig):
+        """Initializes an empty index.
+
+        Args:
+            config: Near-duplicate detection configuration, whose threshold
+                must not be None.
+        """
+        self.threshold = config.threshold
+        self._num_perm = config.num_perm
+        self._num_bands, self._rows_per_band = _get_lsh_params(
+            config.threshold, config.num_perm)
+        self._buckets: List[Dict[int, int]] = [
+            {} for _ in range(self._num_bands)]
+        self._signatures = np.empty((1024, config.num_perm), dtype=np.uint32)
+        self._keys: List[Any] = []
+        # Maps the index of each representative that has duplicates to a
+        # list of tuples of (duplicate key, estimated similarity).
+        self._duplicates: Dict[int, List[Tuple[Any, float]]] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of representatives in the index."""
+        return len(self._keys)
+
+    def add(self, key: Any, signature: np.ndarray) -> Optional[Any]:
+        """Adds a signature, unless it is a near-duplicate.
+
+        Args:
+            key: Key of the signature (e.g. the ID of its node).
+            signature: MinHash signature (see `MinHasher.signatures`).
+
+        Returns:
+            The key of the representative that the signature is a
+            near-duplicate of, or None if it was added as a representative.
+        """
+        band_hashes = [
+            hash(signature[start:start + self._rows_per_band].tobytes())
+            for start in range(
+                0, self._num_bands * self._rows_per_band,
+                self._rows_per_band)]
+        best_index = None
+        best_similarity = 0.0
+        checked = set()
+        for buckets, band_hash in zip(self._buckets, band_hashes):
+            index = buckets.get(band_hash)
+            if index is None or index in checked:
+                continue
+            checked.add(index)
+            similarity = np.count_nonzero(
+                self._signatures[index] == signature) / self._num_perm
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_index = index
+                best_similarity = similarity
+        if best_index is not None:
+            self._duplicates.setdefault(best_index, []).append(
+                (key, best_similarity))
+            return self._keys[best_index]
+
+        index = len(self._keys)
+        if index == len(self._signatures):
+            self._signatures = np.concatenate(
+                [self._signatures, np.empty_like(self._signatures)])
+        self._signatures[index] = signature
+        self._keys.append(key)
+        for buckets, band_hash in zip(self._buckets, band_hashes):
+            buckets.setdefault(band_hash, index)
+        return None
+
+    def iter_clusters(self) -> Iterator[Tuple[Any, List[Tuple[Any, float]]]]:
+        """Yields each cluster of near-duplicates found so far.
+
+        Yields:
+            A tuple of (the key of the representative, a list of tuples of
+            (key, estimated Jaccard similarity to the representative) of its
+            near-duplicates) for each representative with near-duplicates,
+            in the order in which the representatives were added.
+        """
+        for index in sorted(self._duplicates):
+            yield self._keys[index], self._duplicates[index]
@@ -0,0 +1,97 @@
+"""Cross-Encoder Reranking for Documentation Question-Answering (Q&A) Bot"""
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+# Small cross-encoder trained for passage reranking, which is fast enough to
+# score a few dozen candidates per question on a CPU.
+DEFAULT_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+# Cross-encoders loaded so far, keyed on model name.
+_cross_encoders: Dict[str, Any] = {}
+_cross_encoders_lock = threading.Lock()
+
+
+def get_cross_encoder(model_name: str = DEFAULT_CROSS_ENCODER_MODEL):
+    """Returns the cross-encoder with the given name, loading it if needed.
+
+    Each model is loaded at most once per process, on first use.
+
+    Args:
+        model_name: Name of the Sentence-Transformers cross-encoder model.
+
+    Returns:
+        A `sentence_transformers.CrossEncoder`.
+    """
+    with _cross_encoders_lock:
+        cross_encoder = _cross_encoders.get(model_name)
+        if cross_encoder is None:
+            # Imported here, as importing Sentence-Transformers (and PyTorch)
+            # is slow and reranking is optional.
+            # pylint: disable-next=import-outside-toplevel
+            import sentence_transformers
+            cross_encoder = sentence_transformers.CrossEncoder(
+                model_name, device="cpu")
+            _cross_encoders[model_name] = cross_encoder
+        return cross_encoder
+
+
+def rerank(
+    query_texts: List[str],
+    query_result: Dict[str, Any],
+    n_results: int,
+    batch_size: int = 32,
+    model_name: str = DEFAULT_CROSS_ENCODER_MODEL) -> Dict[str, Any]:
+    """Reranks candidate documents using a cross-encoder.
+
+    Unlike the bi-encoder used for vector search, a cross-encoder scores each
+    (query text, document) pair jointly, which is more accurate but too slow
+    to run over a whole collection. It is therefore only run over the
+    candidates retrieved for each query text. The pairs for all query texts
+    are scored together, in batches of `batch_size` pairs.
+
+    Args:
+        query_texts: Query texts that the candidates were retrieved for.
+        query_result: Candidates retrieved for each query text, in the
+            format of a Chroma collection query result.
+        n_results: Number of documents to keep per query text.
+        batch_size: Number of (query text, document) pairs scored per
+            forward pass of the cross-encoder.
+        model_name: Name of the Sentence-Transformers cross-encoder model.
+
+    Returns:
+        The `n_results` highest scoring candidates for each query text, in
+        the format of a Chroma collection query result (with cross-encoder
+        scores under "rerank_scores").
+    """
+    pairs = [
+        (query_text, document)
+        for query_text, documents in zip(
+            query_texts, query_result["documents"])
+        for document in documents]
+    scores = (
+        get_cross_encoder(model_name).predict(
+            pairs, batch_size=batch_size, show_progress_bar=False)
+        if pairs else [])
+
+    reranked_result = {
+        "ids": [], "documents": [], "metadatas": [], "rerank_scores": []}
+    offset = 0
+    for ids, documents, metadatas in zip(
+        query_result["ids"],
+        query_result["documents"],
+        query_result["metadatas"]):
+        candidate_scores = np.asarray(scores[offset:offset + len(ids)])
+        offset += len(ids)
+        top_indices = np.argsort(-candidate_scores, kind="stable")[:n_results]
+        reranked_result["ids"].append([ids[i] for i in top_indices])
+        reranked_result["documents"].append(
+            [documents[i] for i in top_indices])
+        reranked_result["metadatas"].append(
+            [metadatas[i] for i in top_indices])
+        reranked_result["rerank_scores"].append(
+            [float(candidate_scores[i]) for i in top_indices])
+    return reranked_result
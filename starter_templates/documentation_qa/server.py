@@ -0,0 +1,93 @@
+"""ASGI Server for Documentation Question-Answering (Q&A) Bot
+
+Serves `documentation_qa` over HTTP:
+
+    POST /documentation_qa {"question": "What is ORM mode?"}
+        -> {"answer": "..."}
+    POST /documentation_qa {"question": "What is ORM mode?", "stream": true}
+        -> The answer, streamed as plain text as it is generated.
+
+Usage:
+    python server.py --port 8000 --max-concurrency 16
+    curl -N localhost:8000/documentation_qa \\
+        -d '{"question": "What is ORM mode?", "stream": true}'
+
+The app is warmed up (see `app.warm_up`) before the server accepts requests,
+and concurrent identical questions are coalesced (see
+`app.COALESCE_REQUESTS`) unless `--no-coalesce-requests` is passed.
+Other ASGI servers can serve the app created by `create_app` (e.g. `uvicorn
+--factory server:create_app`).
+"""
+import argparse
+from typing import Any, Dict, Iterator
+
+import app
+import asgi
+
+
+def _documentation_qa(request: Dict[str, Any]) -> Dict[str, str]:
+    """Handles a (non-streaming) documentation Q&A request."""
+    question = asgi.get_field(request, "question")
+    return {"answer": app.documentation_qa(question)}
+
+
+def _documentation_qa_stream(request: Dict[str, Any]) -> Iterator[str]:
+    """Handles a streaming documentation Q&A request."""
+    return app.documentation_qa_stream(asgi.get_field(request, "question"))
+
+
+def create_app(
+    max_concurrency: int = 16,
+    max_pending: int = 64,
+    coalesce_requests: bool = True) -> asgi.App:
+    """Returns the ASGI app serving the documentation Q&A bot.
+
+    Args:
+        max_concurrency: Maximum number of questions answered at once.
+        max_pending: Maximum number of questions waiting to be answered,
+            beyond which requests are rejected with a 503 status code.
+        coalesce_requests: Whether concurrent identical questions are
+            answered once (unless the "coalesce_requests" hyperparameter is
+            set). Sets `app.COALESCE_REQUESTS`.
+    """
+    app.COALESCE_REQUESTS = coalesce_requests
+    return asgi.App(
+        {"/documentation_qa": asgi.Endpoint(
+            _documentation_qa, _documentation_qa_stream)},
+        max_concurrency=max_concurrency,
+        max_pending=max_pending,
+        on_startup=app.warm_up)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to.")
+    parser.add_argument(
+        "--port", type=int, default=8000, help="Port to bind to.")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=16,
+        help="Maximum number of questions answered at once.")
+    parser.add_argument(
+        "--max-pending", type=int, default=64,
+        help="Maximum number of questions waiting to be answered.")
+    parser.add_argument(
+        "--keep-alive", type=float, default=5.0,
+        help="Number of seconds to keep idle HTTP connections open.")
+    parser.add_argument(
+        "--no-coalesce-requests", action="store_true",
+        help="Answer each of concurrent identical questions separately.")
+    args = parser.parse_args()
+    asgi.serve(
+        create_app(
+            args.max_concurrency,
+            args.max_pending,
+            coalesce_requests=not args.no_coalesce_requests),
+        host=args.host,
+        port=args.port,
+        keep_alive=args.keep_alive)
+
+
+if __name__ == "__main__":
+    main()
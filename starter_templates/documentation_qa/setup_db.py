@@ -1,12 +1,32 @@
 """Set up the Vector DB for Documentation Question-Answering (Q&A) Bot"""
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
 import re
-from typing import Dict, List, Optional, Union
+import threading
+import time
+from typing import (
+    Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union)
 import uuid
 
 import chromadb
 from chromadb import config
+from chromadb.utils import embedding_functions
+import numpy as np
 import pydantic
 
+import bm25
+import chunking
+import embedding_cache
+import near_duplicates
+import vector_store
+
 
 # List of Markdown files with optional base URLs for citations
 MARKDOWN_FILES = [
@@ -27,10 +47,187 @@ MARKDOWN_FILES = [
 
 
 COLLECTION_NAME = "markdown_collection"
+# Path of the BM25 keyword index, which is built from the same documents as
+# the collection and stored alongside it (see `bm25.py`).
+BM25_INDEX_PATH = os.path.join("chroma", "bm25_index.json")
+# Path of the in-process vector store, which holds the collection's embeddings
+# and documents in memory-mapped files, so that the app can search them
+# without querying the vector DB (see `vector_store.py`).
+VECTOR_STORE_PATH = os.path.join("chroma", "vector_store")
+# Path of the report of the clusters of near-duplicate nodes found during the
+# last ingestion, if near-duplicate detection is enabled.
+NEAR_DUPLICATES_PATH = os.path.join("chroma", "near_duplicates.json")
+# Path of the manifest of ingested files, which records the size, modification
+# time and content hash of each file along with the IDs of its nodes, so that
+# `python setup_db.py --sync` only re-embeds the nodes of files that changed.
+MANIFEST_PATH = os.path.join("chroma", "ingest_manifest.json")
+
+# Format version of the manifest. Increment when the format changes, or when
+# the way files are split into nodes changes (so that unchanged files are
+# split again).
+_MANIFEST_FORMAT_VERSION = 2
+
+# Key of the collection version in the collection's metadata (see
+# `get_collection_version`).
+_COLLECTION_VERSION_KEY = "version"
+
+# Pattern of a Markdown header line, capturing its level and text.
+_HEADER_PATTERN = re.compile(r"^(#+) +(.*)")
+
+# Ingestion is pipelined (see `_ingest`): Markdown files are read and split
+# into nodes in a pool of INGEST_PROCESSES worker processes (None for one per
+# CPU), while nodes are embedded and added to the collection in batches of
+# INGEST_BATCH_SIZE nodes in a background thread. At most
+# INGEST_MAX_PENDING_BATCHES batches wait to be added, and at most two files
+# per worker process are split ahead, so that memory use does not grow with
+# the number of files.
+INGEST_PROCESSES: Optional[int] = None
+INGEST_BATCH_SIZE = 256
+INGEST_MAX_PENDING_BATCHES = 2
+
+# Sections are chunked into nodes as configured by the CHUNK_* constants (see
+# `chunking.ChunkingConfig`, sizes are in tokens). By default (CHUNK_SIZE of
+# None), each section is a single node. Otherwise, sections larger than
+# CHUNK_SIZE are split into chunks that overlap by up to CHUNK_OVERLAP (or a
+# quarter of CHUNK_SIZE, if smaller), and adjacent sections smaller than
+# MIN_CHUNK_SIZE are merged.
+CHUNK_SIZE: Optional[int] = None
+CHUNK_OVERLAP = 64
+MIN_CHUNK_SIZE = 32
+
+# Nodes whose estimated Jaccard similarity (of their word 3-grams) to an
+# earlier node is at least NEAR_DUPLICATE_THRESHOLD are skipped as
+# near-duplicates (see `near_duplicates.py`), keeping one representative per
+# cluster of near-duplicates. None disables near-duplicate detection. Exact
+# duplicates are always skipped.
+NEAR_DUPLICATE_THRESHOLD: Optional[float] = None
+
+# Name under which the embeddings of Chroma's default embedding function are
+# cached (see `get_embedding_function` and `embedding_cache.py`).
+EMBEDDING_MODEL_NAME = "chroma-onnx/all-MiniLM-L6-v2"
+
+
+# Chroma client, created on first use (see `get_chroma_client`) rather than at
+# import time, as opening the persistent vector DB is slow.
+_chroma_client: Optional[chromadb.ClientAPI] = None
+_chroma_client_lock = threading.Lock()
+_embedding_function: Optional["CachedEmbeddingFunction"] = None
+_embedding_function_lock = threading.Lock()
 
 
-chroma_client = chromadb.PersistentClient(
-    settings=config.Settings(allow_reset=True))
+def get_chroma_client() -> chromadb.ClientAPI:
+    """Returns the Chroma client, creating it if needed.
+
+    The client is created at most once per process, on first use.
+    """
+    global _chroma_client  # pylint: disable=global-statement
+    with _chroma_client_lock:
+        if _chroma_client is None:
+            _chroma_client = chromadb.PersistentClient(
+                settings=config.Settings(allow_reset=True))
+        return _chroma_client
+
+
+class CachedEmbeddingFunction(
+    chromadb.EmbeddingFunction[chromadb.Documents]):
+    """Chroma embedding function whose embeddings are cached on disk.
+
+    Texts whose embeddings are in the embedding cache (see
+    `embedding_cache.py`) are not embedded again, so the wrapped embedding
+    function's model is only loaded once a text is not cached.
+
+    Attributes:
+        embedding_function: Wrapped embedding function.
+        model_name: Name under which the embeddings are cached.
+    """
+
+    def __init__(
+        self,
+        embedding_function: chromadb.EmbeddingFunction[chromadb.Documents],
+        model_name: str):
+        """Create a CachedEmbeddingFunction.
+
+        Args:
+            embedding_function: Embedding function to wrap.
+            model_name: Name under which the embeddings are cached. Must
+                identify the wrapped embedding function's model.
+        """
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+
+    def __call__(
+        self,
+        input: chromadb.Documents  # pylint: disable=redefined-builtin
+    ) -> chromadb.Embeddings:
+        """Returns the embeddings of texts, computing those not cached."""
+        return embedding_cache.get_or_compute(
+            self.model_name, input, self.embedding_function).tolist()
+
+
+def get_embedding_function() -> CachedEmbeddingFunction:
+    """Returns the embedding function of the collection.
+
+    The embedding function is Chroma's default embedding function, with
+    embeddings cached on disk. It is created at most once per process, on
+    first use.
+    """
+    global _embedding_function  # pylint: disable=global-statement
+    with _embedding_function_lock:
+        if _embedding_function is None:
+            _embedding_function = CachedEmbeddingFunction(
+                embedding_functions.DefaultEmbeddingFunction(),
+                EMBEDDING_MODEL_NAME)
+        return _embedding_function
+
+
+def get_collection_version(collection: chromadb.Collection) -> str:
+    """Returns the version of the documents in a collection.
+
+    The version is a hash of the IDs of the collection's nodes, which are
+    derived from the nodes' content, so it changes whenever nodes are added
+    or removed (whether by re-creating or syncing the collection), and is
+    the same for collections of the same documents. Collections created
+    before versions were recorded are identified by their ID instead.
+
+    Args:
+        collection: The vector DB collection.
+    """
+    return (collection.metadata or {}).get(
+        _COLLECTION_VERSION_KEY, str(collection.id))
+
+
+class IngestReport(pydantic.BaseModel):
+    """Summary of the ingestion of the Markdown files into the collection.
+
+    Attributes:
+        num_files: Number of Markdown files.
+        num_files_changed: Number of files that were split into nodes, as
+            they were new or changed since the last ingestion (or some of
+            their nodes were missing from the collection). The nodes of
+            other files are taken from the manifest.
+        num_nodes: Number of nodes in the collection after ingestion.
+        num_added: Number of nodes embedded and added to the collection.
+        num_deleted: Number of nodes deleted from the collection.
+        num_unchanged: Number of nodes left unchanged in the collection.
+        num_near_duplicates: Number of nodes skipped as near-duplicates of
+            other nodes.
+        num_near_duplicate_clusters: Number of clusters of near-duplicates
+            (each of which is represented by a single node).
+        seconds: Wall time of the ingestion, in seconds.
+        seconds_saved: Estimated number of seconds saved by not re-embedding
+            unchanged nodes, based on the embedding time per node measured
+            during this or the previous ingestion.
+    """
+    num_files: int
+    num_files_changed: int
+    num_nodes: int
+    num_added: int
+    num_deleted: int
+    num_unchanged: int
+    num_near_duplicates: int = 0
+    num_near_duplicate_clusters: int = 0
+    seconds: float
+    seconds_saved: float
 
 
 class _Node(pydantic.BaseModel):
@@ -47,115 +244,772 @@ class _Node(pydantic.BaseModel):
     metadata: Optional[Dict[str, Union[str, int, float]]] = None
 
 
-def _split_markdown_by_header(text: str) -> List[str]:
+def _split_markdown_by_header(lines: Iterable[str]) -> Iterator[str]:
     """Splits a Markdown text into sections based on headers.
 
-    Divides a Markdown string into sections defined by headers, including the
+    Divides a Markdown text into sections defined by headers, including the
     header and its following content up to the next header or text end.
-    Headers within code blocks are ignored.
+    Headers within code blocks are ignored. Sections are yielded as soon as
+    they end, so a file object can be split without reading it into memory
+    at once. Sections that are empty after stripping surrounding whitespace
+    (e.g. blank lines before the first header) are skipped.
     
     Args:
-        text: Markdown text to split.
+        lines: Lines of the Markdown text to split, with or without their
+            trailing newlines (e.g. a file object opened in text mode, or
+            `text.splitlines()`).
     
-    Returns:
-        A list of strings, each containing a section of the input text.
+    Yields:
+        Each section of the input text.
     """
-    chunks = []
-    lines = text.split("\n")
     code_block = False
-    current_section = ""
+    current_section: List[str] = []
 
     for line in lines:
+        line = line.rstrip("\n")
         if line.startswith("```"):
             code_block = not code_block
-        header_match = re.match(r"^(#+) +(.*)", line)
-        if header_match and not code_block:
-            if current_section != "":
-                chunks.append(current_section.strip())
-            current_section = f"# {header_match.group(2)}\n"
-        else:
-            current_section += line + "\n"
-    return chunks
+        elif not code_block and line.startswith("#"):
+            header_match = _HEADER_PATTERN.match(line)
+            if header_match:
+                section = "\n".join(current_section).strip()
+                if section:
+                    yield section
+                current_section = [f"# {header_match.group(2)}"]
+                continue
+        current_section.append(line)
+    section = "\n".join(current_section).strip()
+    if section:
+        yield section
+
+
+def _get_node_id(text: str, metadata: Optional[Dict[str, Any]]) -> str:
+    """Returns the ID of a node, derived from its content.
+
+    Nodes with the same text and metadata have the same ID, so re-ingesting
+    an unchanged node yields an ID that is already in the collection.
+
+    Args:
+        text: Text content of the node.
+        metadata: Metadata of the node.
+    """
+    return hashlib.sha256(json.dumps(
+        [text, metadata], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _get_default_chunk_overlap(chunk_size: Optional[int]) -> int:
+    """Returns the default chunk overlap for a chunk size.
+
+    The overlap is CHUNK_OVERLAP, capped at a quarter of the chunk size so
+    that it is always smaller than the chunk size.
+
+    Args:
+        chunk_size: Maximum size of a chunk, or None if sections are not
+            chunked.
+    """
+    if chunk_size is None:
+        return CHUNK_OVERLAP
+    return min(CHUNK_OVERLAP, chunk_size // 4)
+
+
+def _get_chunking_config() -> chunking.ChunkingConfig:
+    """Returns the chunking configuration defined by the CHUNK_* constants."""
+    return chunking.ChunkingConfig(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=_get_default_chunk_overlap(CHUNK_SIZE),
+        min_chunk_size=MIN_CHUNK_SIZE)
+
+
+def _get_near_duplicate_config() -> near_duplicates.NearDuplicateConfig:
+    """Returns the near-duplicate detection configuration defined by the
+    NEAR_DUPLICATE_THRESHOLD constant."""
+    return near_duplicates.NearDuplicateConfig(
+        threshold=NEAR_DUPLICATE_THRESHOLD)
 
 
 def _get_nodes_from_file(
     file_path: str,
-    base_url: Optional[str] = None) -> List[_Node]:
+    base_url: Optional[str] = None,
+    chunking_config: Optional[chunking.ChunkingConfig] = None
+) -> List[_Node]:
     """Extracts nodes from a Markdown file.
 
-    Reads a Markdown file and splits it into nodes based on headers. Each node
-    is assigned a unique ID.
+    Reads a Markdown file and splits it into nodes based on headers (see
+    `chunking.chunk_sections`). Each node is assigned an ID derived from its
+    content (see `_get_node_id`).
     If a base URL is provided, it is combined with the header text to create a
-    URL for the node. This URL is added to the node's metadata.
+    URL for the node. This URL is added to the node's metadata. Chunks of the
+    same section share the section's URL.
     
     Args:
         file_path: Path to the Markdown file.
         base_url: Base URL to use for generating node URLs.
+        chunking_config: Chunking configuration, or None for the one defined
+            by the CHUNK_* constants.
     
     Returns:
-        A list of Node objects, each containing a section of the input text.
+        A list of Node objects, each containing a chunk of the input text.
     """
     with open(file_path, "r", encoding="utf-8") as f:
-        text = f.read()
+        return _get_nodes_from_lines(f, base_url, chunking_config)
 
-    chunks = _split_markdown_by_header(text)
+
+def _get_nodes_from_lines(
+    lines: Iterable[str],
+    base_url: Optional[str] = None,
+    chunking_config: Optional[chunking.ChunkingConfig] = None
+) -> List[_Node]:
+    """Extracts nodes from the lines of a Markdown file.
+
+    See `_get_nodes_from_file`.
+
+    Args:
+        lines: Lines of the Markdown text (e.g. a file object).
+        base_url: Base URL to use for generating node URLs.
+        chunking_config: Chunking configuration, or None for the one defined
+            by the CHUNK_* constants.
+
+    Returns:
+        A list of Node objects, each containing a chunk of the input text.
+    """
+    chunks = chunking.chunk_sections(
+        _split_markdown_by_header(lines),
+        chunking_config or _get_chunking_config())
 
     nodes = []
-    for chunk in chunks:
+    for section, chunk in chunks:
         if base_url is not None:
-            first_line = chunk.split("\n", 1)[0]
+            first_line = section.split("\n", 1)[0]
             if first_line.startswith("# "):
                 url = f"{base_url}#{'-'.join(first_line[2:].lower().split())}"
             else:
                 url = base_url
-            nodes.append(_Node(text=chunk, metadata={"url": url}))
+            metadata = {"url": url}
         else:
-            nodes.append(_Node(text=chunk))
+            metadata = None
+        nodes.append(_Node(
+            text=chunk, id=_get_node_id(chunk, metadata), metadata=metadata))
     return nodes
 
 
-def _create_collection() -> chromadb.Collection:
+def _iter_markdown_files() -> Iterator[Tuple[str, Optional[str]]]:
+    """Yields a tuple of (file path, base URL) for each Markdown file."""
+    for entry in MARKDOWN_FILES:
+        if isinstance(entry, tuple):
+            yield entry
+        else:
+            yield entry, None
+
+
+def _split_file(
+    file_path: str,
+    base_url: Optional[str],
+    known_hash: Optional[str],
+    chunking_config: chunking.ChunkingConfig,
+    min_hasher: Optional[near_duplicates.MinHasher]
+) -> Tuple[str, Optional[List[_Node]], Optional[np.ndarray]]:
+    """Hashes a Markdown file and splits it into nodes.
+
+    Runs in ingestion worker processes (see `_iter_split_files`).
+
+    Args:
+        file_path: Path to the Markdown file.
+        base_url: Base URL to use for generating node URLs.
+        known_hash: Content hash of the file at the last ingestion, if any.
+        chunking_config: Chunking configuration.
+        min_hasher: MinHasher that computes the signatures of the nodes for
+            near-duplicate detection, or None if it is disabled.
+
+    Returns:
+        A tuple of (hex digest of the SHA-256 hash of the file's content, the
+        file's nodes, the MinHash signatures of the nodes). The nodes are None
+        if the hash is `known_hash` (i.e. the file is unchanged), and the
+        signatures are None if the nodes or `min_hasher` are None.
+    """
+    with open(file_path, "rb") as f:
+        content = f.read()
+    file_hash = hashlib.sha256(content).hexdigest()
+    if file_hash == known_hash:
+        return file_hash, None, None
+    # Decoded as `open` does in text mode (e.g. translating newlines).
+    with io.TextIOWrapper(io.BytesIO(content), encoding="utf-8") as f:
+        nodes = _get_nodes_from_lines(f, base_url, chunking_config)
+    if min_hasher is None:
+        return file_hash, nodes, None
+    return file_hash, nodes, min_hasher.signatures(
+        [node.text for node in nodes])
+
+
+def _iter_split_files(
+    files: List[Tuple[Any, ...]],
+    processes: Optional[int]
+) -> Iterator[Tuple[str, Optional[List[_Node]], Optional[np.ndarray]]]:
+    """Splits Markdown files into nodes in parallel, in order.
+
+    Files are split by `_split_file` in a pool of worker processes, at most
+    two files per process ahead of the file whose result is being consumed,
+    so that the results of at most that many files are held in memory at
+    once. A single file (or process) is split in this process.
+
+    Args:
+        files: Arguments of `_split_file` for each file.
+        processes: Number of worker processes, or None for one per CPU.
+
+    Yields:
+        The result of `_split_file` for each file, in order.
+    """
+    processes = min(processes or os.cpu_count() or 1, len(files))
+    if processes <= 1:
+        for file_args in files:
+            yield _split_file(*file_args)
+        return
+
+    # Worker processes are spawned (rather than forked), as forking a
+    # process that has started threads (e.g. Chroma's) is unsafe.
+    with concurrent.futures.ProcessPoolExecutor(
+        processes, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        files_iter = iter(files)
+        pending: Deque[concurrent.futures.Future] = collections.deque(
+            executor.submit(_split_file, *file_args)
+            for file_args in itertools.islice(files_iter, 2 * processes))
+        while pending:
+            result = pending.popleft().result()
+            file_args = next(files_iter, None)
+            if file_args is not None:
+                pending.append(executor.submit(_split_file, *file_args))
+            yield result
+
+
+class _CollectionWriter:
+    """Adds nodes to a collection in batches, in a background thread.
+
+    Adding nodes to a collection embeds them, which is the slowest part of
+    ingestion, so it runs concurrently with reading and splitting files. If
+    `max_pending_batches` batches are waiting to be added, `add` blocks until
+    one of them has been added (applying backpressure to the rest of the
+    pipeline), so that memory use is bounded.
+
+    Attributes:
+        num_added: Number of nodes added so far.
+        seconds: Total time spent adding batches (i.e. embedding), in
+            seconds.
+    """
+
+    def __init__(
+        self,
+        collection: chromadb.Collection,
+        batch_size: int,
+        max_pending_batches: int):
+        """Create a _CollectionWriter.
+
+        Args:
+            collection: The collection to add nodes to.
+            batch_size: Number of nodes per `collection.add` call.
+            max_pending_batches: Maximum number of batches waiting to be
+                added.
+        """
+        self.num_added = 0
+        self.seconds = 0.0
+        self._collection = collection
+        self._batch_size = batch_size
+        self._max_pending_batches = max_pending_batches
+        self._batch: List[_Node] = []
+        self._pending: Deque[concurrent.futures.Future] = collections.deque()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ingest")
+
+    def add(self, node: _Node):
+        """Adds a node, in a batch once the batch is full."""
+        self._batch.append(node)
+        if len(self._batch) >= self._batch_size:
+            self._flush()
+
+    def close(self):
+        """Adds any remaining nodes and waits until all nodes are added."""
+        try:
+            self._flush()
+            while self._pending:
+                self._wait_for_oldest_batch()
+        finally:
+            self._executor.shutdown()
+
+    def _flush(self):
+        """Submits the current batch to be added."""
+        if not self._batch:
+            return
+        while len(self._pending) >= self._max_pending_batches:
+            self._wait_for_oldest_batch()
+        self._pending.append(
+            self._executor.submit(self._add_batch, self._batch))
+        self._batch = []
+
+    def _wait_for_oldest_batch(self):
+        """Waits until the oldest pending batch is added."""
+        self._pending.popleft().result()
+
+    def _add_batch(self, batch: List[_Node]):
+        """Adds a batch of nodes to the collection."""
+        start_time = time.perf_counter()
+        self._collection.add(
+            documents=[node.text for node in batch],
+            ids=[node.id for node in batch],
+            metadatas=[node.metadata for node in batch])
+        self.seconds += time.perf_counter() - start_time
+        self.num_added += len(batch)
+
+
+def _load_manifest() -> Dict[str, Any]:
+    """Returns the manifest of the last ingestion, or an empty manifest."""
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"files": {}}
+    if manifest.get("version") != _MANIFEST_FORMAT_VERSION:
+        return {"files": {}}
+    return manifest
+
+
+def _ingest(
+    reset: bool,
+    processes: Optional[int] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    chunking_config: Optional[chunking.ChunkingConfig] = None,
+    near_duplicate_config: Optional[
+        near_duplicates.NearDuplicateConfig] = None) -> Tuple[
+            chromadb.Collection, IngestReport]:
+    """Ingests the Markdown files into the collection.
+
+    Nodes have content-derived IDs, so the nodes of the Markdown files can be
+    compared with the nodes in the collection by ID: only nodes whose IDs are
+    not yet in the collection are embedded and added, and nodes whose IDs no
+    longer belong to any file are deleted. Files whose size and modification
+    time (or, failing that, content hash) match the manifest are not split
+    into nodes; their node IDs are taken from the manifest instead, unless
+    the chunking configuration changed since the last ingestion.
+
+    Ingestion is pipelined: the other files are split into nodes in worker
+    processes (see `_iter_split_files`), while their new nodes are embedded
+    and added to the collection in batches (see `_CollectionWriter`). Only
+    the IDs of all nodes (rather than their text) are held in memory.
+
+    Duplicate nodes (i.e. nodes with the same text as an earlier node) are
+    skipped. If near-duplicate detection is enabled, so are nodes that are
+    near-duplicates of an earlier node (see
+    `near_duplicates.NearDuplicateIndex`), in which case all files are split
+    (though only new nodes are embedded), as all nodes are compared, and the
+    clusters of near-duplicates are saved to NEAR_DUPLICATES_PATH. After
+    ingestion, the collection version (see
+    `get_collection_version`) is updated, the BM25 keyword index and the
+    in-process vector store are rebuilt from the collection's nodes (which
+    requires no embedding) if they changed, and the manifest is saved.
+
+    Args:
+        reset: Whether to reset the Chroma client (deleting all collections)
+            and ingest all files from scratch, rather than syncing the
+            existing collection with the files.
+        processes: Number of worker processes used to split files, or None
+            for INGEST_PROCESSES.
+        batch_size: Number of nodes embedded and added to the collection at
+            once.
+        chunking_config: Chunking configuration, or None for the one defined
+            by the CHUNK_* constants.
+        near_duplicate_config: Near-duplicate detection configuration, or
+            None for the one defined by NEAR_DUPLICATE_THRESHOLD.
+
+    Returns:
+        A tuple of (the collection, ingestion report).
+    """
+    start_time = time.perf_counter()
+    chunking_config = chunking_config or _get_chunking_config()
+    near_duplicate_config = (
+        near_duplicate_config or _get_near_duplicate_config())
+    if near_duplicate_config.threshold is not None:
+        min_hasher = near_duplicates.MinHasher(near_duplicate_config)
+        near_duplicate_index = near_duplicates.NearDuplicateIndex(
+            near_duplicate_config)
+    else:
+        min_hasher = None
+        near_duplicate_index = None
+    chroma_client = get_chroma_client()
+    if reset:
+        chroma_client.reset()
+        manifest = {"files": {}}
+    else:
+        manifest = _load_manifest()
+        if (manifest.get("chunking") != chunking_config.model_dump() or
+            near_duplicate_index is not None):
+            # All files are split again, as their nodes would differ, or
+            # their text is needed to find near-duplicates.
+            manifest["files"] = {}
+    collection = chroma_client.get_or_create_collection(
+        name=COLLECTION_NAME, embedding_function=get_embedding_function())
+    existing_ids = set(collection.get(include=[])["ids"])
+
+    # A file's nodes can be taken from the manifest if the file (and its base
+    # URL) is unchanged. Files are compared by size and modification time
+    # here, and by content hash (computed while splitting them) only if those
+    # differ.
+    files = list(_iter_markdown_files())
+    stats = {file_path: os.stat(file_path) for file_path, _ in files}
+    reusable_entries = {}
+    files_to_split = []
+    for file_path, base_url in files:
+        entry = manifest["files"].get(file_path)
+        if entry is None or entry["base_url"] != base_url:
+            files_to_split.append(
+                (file_path, base_url, None, chunking_config, min_hasher))
+        elif (entry["size"] == stats[file_path].st_size and
+              entry["mtime_ns"] == stats[file_path].st_mtime_ns):
+            reusable_entries[file_path] = entry
+        else:
+            files_to_split.append((
+                file_path, base_url, entry["sha256"], chunking_config,
+                min_hasher))
+
+    # Maps each file path to its manifest entry.
+    file_entries: Dict[str, Dict[str, Any]] = {}
+    node_ids = []
+    # Duplicate nodes are identified by the hash of their text, so that they
+    # are skipped whether or not their file was split.
+    text_hashes = set()
+    # Files whose nodes were taken from the manifest but are missing from
+    # the collection (e.g. if it was modified by other means), which are
+    # split again below so that the missing nodes can be added.
+    files_missing_nodes = []
+    num_files_split = 0
+    num_near_duplicates = 0
+    writer = _CollectionWriter(
+        collection, batch_size, INGEST_MAX_PENDING_BATCHES)
+    split_results = _iter_split_files(
+        files_to_split,
+        processes if processes is not None else INGEST_PROCESSES)
+    try:
+        for file_path, base_url in files:
+            stat = stats[file_path]
+            nodes_by_id: Dict[str, _Node] = {}
+            signatures = None
+            entry = reusable_entries.get(file_path)
+            if entry is None:
+                file_hash, nodes, signatures = next(split_results)
+                if nodes is None:
+                    # The file was touched, but its content is unchanged.
+                    entry = {
+                        **manifest["files"][file_path],
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns}
+                else:
+                    num_files_split += 1
+                    nodes_by_id = {node.id: node for node in nodes}
+                    entry = {
+                        "base_url": base_url,
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "sha256": file_hash,
+                        # Node IDs and text hashes, in file order.
+                        "nodes": [
+                            [node.id, hashlib.sha256(
+                                node.text.encode("utf-8")).hexdigest()]
+                            for node in nodes],
+                    }
+            file_entries[file_path] = entry
+
+            missing_node_ids = set()
+            for i, (node_id, text_hash) in enumerate(entry["nodes"]):
+                if text_hash in text_hashes:
+                    if node_id in nodes_by_id:
+                        print("Duplicate node found:\n"
+                              f"{nodes_by_id[node_id].text}")
+                        print("Skipping duplicate node.")
+                    continue
+                text_hashes.add(text_hash)
+                if near_duplicate_index is not None:
+                    # Nodes are identified in the near-duplicate clusters by
+                    # their ID and citation URL (or file path).
+                    source = (nodes_by_id[node_id].metadata or {}).get(
+                        "url", file_path)
+                    if near_duplicate_index.add(
+                        (node_id, source), signatures[i]) is not None:
+                        num_near_duplicates += 1
+                        continue
+                node_ids.append(node_id)
+                if node_id in existing_ids:
+                    continue
+                if node_id in nodes_by_id:
+                    writer.add(nodes_by_id[node_id])
+                else:
+                    missing_node_ids.add(node_id)
+            if missing_node_ids:
+                files_missing_nodes.append(
+                    (file_path, base_url, missing_node_ids))
+
+        for file_path, base_url, missing_node_ids in files_missing_nodes:
+            num_files_split += 1
+            for node in _get_nodes_from_file(
+                file_path, base_url, chunking_config):
+                if node.id in missing_node_ids:
+                    writer.add(node)
+    finally:
+        split_results.close()
+        writer.close()
+
+    deleted_ids = list(existing_ids.difference(node_ids))
+    for i in range(0, len(deleted_ids), batch_size):
+        collection.delete(ids=deleted_ids[i:i + batch_size])
+    previous_version = get_collection_version(collection)
+    collection_version = hashlib.sha256(
+        "\n".join(sorted(node_ids)).encode("utf-8")).hexdigest()
+    collection.modify(metadata={_COLLECTION_VERSION_KEY: collection_version})
+
+    # The BM25 index and the vector store are rebuilt from the collection (in
+    # file order), as they include all nodes, including unchanged ones. They
+    # are left as is if the collection's nodes are unchanged.
+    if (collection_version != previous_version or
+        not os.path.exists(BM25_INDEX_PATH) or
+        not vector_store.exists(VECTOR_STORE_PATH)):
+        documents = []
+        metadatas = []
+        # The collection is read in batches, so that only a batch of
+        # embeddings is held in memory at once.
+        with vector_store.VectorStoreWriter(
+            VECTOR_STORE_PATH, len(node_ids),
+            collection_version=collection_version) as store_writer:
+            for i in range(0, len(node_ids), batch_size):
+                batch_ids = node_ids[i:i + batch_size]
+                result = collection.get(
+                    ids=batch_ids,
+                    include=["embeddings", "documents", "metadatas"])
+                indices = {
+                    node_id: index
+                    for index, node_id in enumerate(result["ids"])}
+                order = [indices[node_id] for node_id in batch_ids]
+                batch_documents = [result["documents"][j] for j in order]
+                batch_metadatas = [result["metadatas"][j] for j in order]
+                store_writer.add(
+                    batch_ids,
+                    [result["embeddings"][j] for j in order],
+                    batch_documents,
+                    batch_metadatas)
+                documents.extend(batch_documents)
+                metadatas.extend(batch_metadatas)
+        bm25.BM25Index.build(
+            node_ids, documents, metadatas,
+            collection_version=collection_version
+        ).save(BM25_INDEX_PATH)
+
+    seconds_per_node = (
+        writer.seconds / writer.num_added if writer.num_added
+        else manifest.get("seconds_per_node", 0.0))
+    num_unchanged = len(node_ids) - writer.num_added
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "version": _MANIFEST_FORMAT_VERSION,
+            "seconds_per_node": seconds_per_node,
+            "chunking": chunking_config.model_dump(),
+            "files": file_entries,
+        }))
+    if near_duplicate_index is not None:
+        num_near_duplicate_clusters = _save_near_duplicate_clusters(
+            near_duplicate_index)
+    else:
+        num_near_duplicate_clusters = 0
+        if os.path.exists(NEAR_DUPLICATES_PATH):
+            os.remove(NEAR_DUPLICATES_PATH)
+
+    return collection, IngestReport(
+        num_files=len(file_entries),
+        num_files_changed=num_files_split,
+        num_nodes=len(node_ids),
+        num_added=writer.num_added,
+        num_deleted=len(deleted_ids),
+        num_unchanged=num_unchanged,
+        num_near_duplicates=num_near_duplicates,
+        num_near_duplicate_clusters=num_near_duplicate_clusters,
+        seconds=time.perf_counter() - start_time,
+        seconds_saved=num_unchanged * seconds_per_node)
+
+
+def _save_near_duplicate_clusters(
+    index: near_duplicates.NearDuplicateIndex) -> int:
+    """Saves the clusters of near-duplicate nodes to NEAR_DUPLICATES_PATH.
+
+    Clusters are saved from largest to smallest. Each node is identified by
+    its ID and source (citation URL or file path).
+
+    Args:
+        index: Near-duplicate index of the ingested nodes, keyed by tuples of
+            (node ID, source).
+
+    Returns:
+        The number of clusters.
+    """
+    clusters = [
+        {
+            "representative": {"id": node_id, "source": source},
+            "duplicates": [
+                {"id": duplicate_id,
+                 "source": duplicate_source,
+                 "similarity": similarity}
+                for (duplicate_id, duplicate_source), similarity
+                in duplicates],
+        }
+        for (node_id, source), duplicates in index.iter_clusters()]
+    clusters.sort(key=lambda cluster: -len(cluster["duplicates"]))
+    with open(NEAR_DUPLICATES_PATH, "w", encoding="utf-8") as f:
+        f.write(json.dumps(
+            {"threshold": index.threshold, "clusters": clusters}, indent=2))
+    return len(clusters)
+
+
+def _create_collection(
+    processes: Optional[int] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    chunking_config: Optional[chunking.ChunkingConfig] = None,
+    near_duplicate_config: Optional[
+        near_duplicates.NearDuplicateConfig] = None
+) -> chromadb.Collection:
     """Creates a collection from a Markdown file.
     
     Resets the Chroma client and creates a new collection with a name defined
     by the COLLECTION_NAME constant.
 
     Reads the markdown files, defined by the MARKDOWN_FILES list, chunking the
-    text based on headers to create nodes, which are added to the collection.
+    text based on headers (and, if configured, by size; see
+    `chunking.chunk_sections`) to create nodes, which are added to the
+    collection.
     Each node contains:
     - The text content of the chunk.
-    - A unique ID.
+    - An ID derived from the node's content.
     - A URL that is associated with the node, stored in the node's metadata.
 
+    Also builds a BM25 keyword index of the nodes, which is saved to
+    BM25_INDEX_PATH, writes the in-process vector store of the nodes to
+    VECTOR_STORE_PATH, and saves the manifest of ingested files to
+    MANIFEST_PATH.
+
+    Args:
+        processes: Number of worker processes used to split files, or None
+            for INGEST_PROCESSES.
+        batch_size: Number of nodes embedded and added to the collection at
+            once.
+        chunking_config: Chunking configuration, or None for the one defined
+            by the CHUNK_* constants.
+        near_duplicate_config: Near-duplicate detection configuration, or
+            None for the one defined by NEAR_DUPLICATE_THRESHOLD.
+
     Returns:
         The created collection.
     """
-    chroma_client.reset()
-    collection = chroma_client.create_collection(name=COLLECTION_NAME)
+    collection, report = _ingest(
+        reset=True,
+        processes=processes,
+        batch_size=batch_size,
+        chunking_config=chunking_config,
+        near_duplicate_config=near_duplicate_config)
+    _print_report(report)
+    return collection
 
-    nodes = []
-    node_text = set()
-    for entry in MARKDOWN_FILES:
-        if isinstance(entry, tuple):
-            file_path, base_url = entry
-        else:
-            file_path, base_url = entry, None
-        nodes_from_file = _get_nodes_from_file(file_path, base_url)
-        for node in nodes_from_file:
-            if node.text in node_text:
-                print(f"Duplicate node found:\n{node.text}")
-                print("Skipping duplicate node.")
-                continue
-            node_text.add(node.text)
-            nodes.append(node)
 
-    documents, ids, metadatas = (
-        map(list,
-            zip(*[(node.text, node.id, node.metadata) for node in nodes])))
-    collection.add(documents=documents, ids=ids, metadatas=metadatas)
+def _sync_collection(
+    processes: Optional[int] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    chunking_config: Optional[chunking.ChunkingConfig] = None,
+    near_duplicate_config: Optional[
+        near_duplicates.NearDuplicateConfig] = None
+) -> IngestReport:
+    """Syncs the collection with the Markdown files.
 
-    return collection
+    Unlike `_create_collection`, only embeds the nodes that are not yet in
+    the collection (i.e. new or changed sections), deletes the nodes that no
+    longer belong to any Markdown file and leaves the other nodes unchanged.
+    Creates the collection if it does not exist. See `_ingest`.
+
+    Args:
+        processes: Number of worker processes used to split files, or None
+            for INGEST_PROCESSES.
+        batch_size: Number of nodes embedded and added to the collection at
+            once.
+        chunking_config: Chunking configuration, or None for the one defined
+            by the CHUNK_* constants.
+        near_duplicate_config: Near-duplicate detection configuration, or
+            None for the one defined by NEAR_DUPLICATE_THRESHOLD.
+
+    Returns:
+        The ingestion report.
+    """
+    _, report = _ingest(
+        reset=False,
+        processes=processes,
+        batch_size=batch_size,
+        chunking_config=chunking_config,
+        near_duplicate_config=near_duplicate_config)
+    _print_report(report)
+    return report
+
+
+def _print_report(report: IngestReport):
+    """Prints an ingestion report."""
+    print(f"Ingested {report.num_files} file(s) "
+          f"({report.num_files_changed} new or changed) into "
+          f"{report.num_nodes} node(s) in {report.seconds:.2f}s: "
+          f"{report.num_added} added, {report.num_deleted} deleted, "
+          f"{report.num_unchanged} unchanged "
+          f"(~{report.seconds_saved:.2f}s of embedding saved).")
+    if report.num_near_duplicates:
+        print(f"Skipped {report.num_near_duplicates} near-duplicate node(s) "
+              f"in {report.num_near_duplicate_clusters} cluster(s); see "
+              f"{NEAR_DUPLICATES_PATH}.")
 
 
 if __name__ == "__main__":
-    _create_collection()
+    parser = argparse.ArgumentParser(
+        description=("Create or sync the vector database, BM25 index and "
+                     "in-process vector store."))
+    parser.add_argument(
+        "--sync", action="store_true",
+        help="Only embed new or changed sections and delete removed ones, "
+             "rather than re-creating the vector database from scratch.")
+    parser.add_argument(
+        "--processes", type=int,
+        help="Number of worker processes used to read and split Markdown "
+             "files (default: one per CPU).")
+    parser.add_argument(
+        "--batch-size", type=int, default=INGEST_BATCH_SIZE,
+        help="Number of sections embedded and added to the vector database "
+             "at once.")
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE,
+        help="Maximum size of a node, in tokens. Larger sections are split "
+             "into several nodes (default: one node per section).")
+    parser.add_argument(
+        "--chunk-overlap", type=int,
+        help="Maximum number of tokens repeated between consecutive nodes of "
+             "the same section. Must be smaller than --chunk-size (default: "
+             f"{CHUNK_OVERLAP}, or a quarter of --chunk-size if smaller).")
+    parser.add_argument(
+        "--min-chunk-size", type=int, default=MIN_CHUNK_SIZE,
+        help="Adjacent sections smaller than this many tokens are merged "
+             "into a single node.")
+    parser.add_argument(
+        "--near-duplicate-threshold", type=float,
+        default=NEAR_DUPLICATE_THRESHOLD,
+        help="Skip sections whose estimated Jaccard similarity to an earlier "
+             "section is at least this (e.g. 0.9), keeping one section per "
+             "cluster of near-duplicates (default: disabled).")
+    args = parser.parse_args()
+    ingest_args = (
+        args.processes,
+        args.batch_size,
+        chunking.ChunkingConfig(
+            chunk_size=args.chunk_size,
+            chunk_overlap=(
+                _get_default_chunk_overlap(args.chunk_size)
+                if args.chunk_overlap is None else args.chunk_overlap),
+            min_chunk_size=args.min_chunk_size),
+        near_duplicates.NearDuplicateConfig(
+            threshold=args.near_duplicate_threshold))
+    if args.sync:
+        _sync_collection(*ingest_args)
+    else:
+        _create_collection(*ingest_args)
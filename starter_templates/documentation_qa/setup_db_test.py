@@ -0,0 +1,56 @@
+"""Unit Tests for the Markdown Splitting of `setup_db.py`
+
+Usage (from this directory, with pytest installed):
+    python -m pytest setup_db_test.py
+"""
+from typing import List
+
+import pytest
+
+import setup_db
+
+
+@pytest.mark.parametrize("text,expected", [
+    pytest.param("", [], id="empty text"),
+    pytest.param(
+        "# A\nText of A.\n## B\nText of B.\n",
+        ["# A\nText of A.", "# B\nText of B."],
+        id="final section"),
+    pytest.param(
+        "# A\nText of A.\n# B\nText of B.",
+        ["# A\nText of A.", "# B\nText of B."],
+        id="no trailing newline"),
+    pytest.param(
+        "Preamble.\n\n# A\nText of A.\n",
+        ["Preamble.", "# A\nText of A."],
+        id="text before the first header"),
+    pytest.param(
+        "\n\n# A\nText of A.\n",
+        ["# A\nText of A."],
+        id="blank lines before the first header"),
+    pytest.param(
+        "# A\n```python\n# Not a header.\n```\nText of A.\n# B\n",
+        ["# A\n```python\n# Not a header.\n```\nText of A.", "# B"],
+        id="header within a code block"),
+    pytest.param(
+        "# A\n#hashtag\n#\n",
+        ["# A\n#hashtag\n#"],
+        id="not a header"),
+])
+@pytest.mark.parametrize("keepends", [False, True])
+def test_split_markdown_by_header(
+    text: str, expected: List[str], keepends: bool):
+    """Checks the sections of a text, split with or without newlines."""
+    # pylint: disable=protected-access
+    lines = text.splitlines(keepends=keepends)
+    assert list(setup_db._split_markdown_by_header(lines)) == expected
+
+
+def test_split_markdown_by_header_file(tmp_path):
+    """Checks that a file object is split like its lines."""
+    # pylint: disable=protected-access
+    file_path = tmp_path / "doc.md"
+    file_path.write_text("# A\nText of A.\n## B\nText of B.", encoding="utf-8")
+    with open(file_path, "r", encoding="utf-8") as f:
+        sections = list(setup_db._split_markdown_by_header(f))
+    assert sections == ["# A\nText of A.", "# B\nText of B."]
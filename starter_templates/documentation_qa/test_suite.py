@@ -172,6 +172,10 @@ test_suite.add(
 
 
 test_suite.add(
+    # To also evaluate speculative retrieval (see `_speculative_query` in
+    # app.py), add "speculative" to the values of this hyperparameter. Its
+    # behavior can be tuned via the "speculative_rephrase_deadline" and
+    # "speculative_overlap_threshold" hyperparameters.
     inductor.HparamSpec(
         hparam_name="vector_query_text_type",
         hparam_type="SHORT_STRING",
@@ -180,6 +184,32 @@ test_suite.add(
         hparam_name="vector_query_result_num",
         hparam_type="NUMBER",
         values=[2, 4]),
+    # To evaluate hybrid (vector and BM25 keyword) retrieval (see `bm25.py`),
+    # uncomment the following lines.
+    # inductor.HparamSpec(
+    #     hparam_name="retrieval_mode",
+    #     hparam_type="SHORT_STRING",
+    #     values=["vector", "hybrid"]),
+    # To compare querying the vector DB with searching the in-process vector
+    # store (see `vector_store.py`), uncomment the following lines.
+    # inductor.HparamSpec(
+    #     hparam_name="vector_backend",
+    #     hparam_type="SHORT_STRING",
+    #     values=["chroma", "numpy"]),
+    # To evaluate reranking retrieved candidates with a cross-encoder (see
+    # `reranking.py`), uncomment the following lines. A value of 0 disables
+    # reranking.
+    # inductor.HparamSpec(
+    #     hparam_name="rerank_candidate_num",
+    #     hparam_type="NUMBER",
+    #     values=[0, 16]),
+    # To evaluate the effect of limiting the number of context tokens in the
+    # main prompt (see `context_packing.py`), uncomment the following lines.
+    # A budget of 0 includes all retrieved documents in full.
+    # inductor.HparamSpec(
+    #     hparam_name="context_token_budget",
+    #     hparam_type="NUMBER",
+    #     values=[0, 1000, 2000]),
 
     # To compare different prompts with this test suite, uncomment the
     # following lines and define the prompts in the prompts.py file.
@@ -1,16 +1,27 @@
 """Documentation Question-Answering (Q&A) Bot Using MongoDB Atlas"""
 import os
+import threading
+from typing import List, Optional
 
 import inductor
 import openai
-import sentence_transformers
 
 import prompts
+import retrievers
 import setup_db
+import spans
+import vector_store
 
 
 openai_client = openai.OpenAI()
 
+# Name of the collection's MongoDB Atlas Vector Search index.
+VECTOR_SEARCH_INDEX_NAME = "vector_index"
+
+# In-process vector store, loaded on first use (see `_get_vector_store`).
+_vector_store: Optional[vector_store.VectorStore] = None
+_vector_store_lock = threading.Lock()
+
 
 # Explicitly set the tokenizers parallelism to false to avoid transformers
 # warnings.
@@ -39,15 +50,80 @@ def rephrase_question(question: str) -> str:
         "provided subject matter.\n"
         f"QUESTION:\n{question}")
 
-    response = openai_client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": rephrase_prompt_system},
-            {"role": "user", "content": rephrase_prompt_user}],
-        model="gpt-4o")
+    with spans.span("rephrase") as rephrase_span:
+        response = openai_client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": rephrase_prompt_system},
+                {"role": "user", "content": rephrase_prompt_user}],
+            model="gpt-4o")
+        rephrase_span.set_token_usage(response.usage)
     rephrase_response = response.choices[0].message.content
     return rephrase_response
 
 
+def _embed_query_texts(texts: List[str]) -> List[List[float]]:
+    """Returns the embeddings of query texts, within an "embedding" span."""
+    with spans.span("embedding"):
+        return setup_db.embed_texts(texts)
+
+
+def _get_vector_store() -> vector_store.VectorStore:
+    """Returns the in-process vector store created by `setup_db.py`.
+
+    The store is loaded at most once per process, on first use, so after
+    repopulating the collection (by running `python setup_db.py`), restart
+    the process.
+    """
+    global _vector_store  # pylint: disable=global-statement
+    with _vector_store_lock:
+        if _vector_store is None:
+            try:
+                _vector_store = vector_store.VectorStore(
+                    setup_db.VECTOR_STORE_PATH, _embed_query_texts)
+            except (FileNotFoundError, ValueError) as error:
+                print("Vector store not found or outdated. Please create the "
+                      "store by running `python3 setup_db.py`.")
+                raise error
+        return _vector_store
+
+
+def _get_retriever() -> retrievers.Retriever:
+    """Returns the retriever of the selected vector search backend.
+
+    If the "vector_backend" hyperparameter is "numpy", the in-process vector
+    store (see `vector_store.py`), which holds the same embeddings as the
+    MongoDB collection in memory-mapped files, is searched instead of running
+    a MongoDB Atlas Vector Search query, which avoids a round trip to the
+    database. Otherwise (if it is "mongodb_atlas", the default), MongoDB
+    Atlas Vector Search is queried.
+
+    Raises:
+        ValueError: If the "vector_backend" hyperparameter is not a supported
+            backend.
+    """
+    vector_backend = inductor.hparam("vector_backend", "mongodb_atlas")
+    if vector_backend == "mongodb_atlas":
+        return retrievers.MongoDBAtlasRetriever(
+            setup_db.get_documentation_collection(),
+            _embed_query_texts,
+            VECTOR_SEARCH_INDEX_NAME)
+    if vector_backend == "numpy":
+        return _get_vector_store()
+    raise ValueError(f"Unsupported vector backend: {vector_backend}")
+
+
+def warm_up():
+    """Initializes the app's MongoDB client, retriever and embedding model.
+
+    These are otherwise initialized lazily, while answering the first
+    question. Call this function at startup (e.g. before serving requests) to
+    instead pay that cost upfront.
+    """
+    setup_db.get_documentation_collection()
+    _get_retriever()
+    setup_db.get_embedding_model()
+
+
 @inductor.logger
 def documentation_qa(question: str) -> str:
     """Answer a question about one or more markdown documents.
@@ -58,8 +134,6 @@ def documentation_qa(question: str) -> str:
     Returns:
         The answer to the user's question.
     """
-    documentation_collection = setup_db.documentation_collection
-
     # Decide whether to use the user's original question or a version of the
     # question rephrased by an LLM as the query text for the vector DB.
     # The rephrased question is intended to provide a more informative and
@@ -78,37 +152,18 @@ def documentation_qa(question: str) -> str:
         query_text = question
     inductor.log(query_text, name="vector_query_text")
 
-    embedding_model = sentence_transformers.SentenceTransformer(
-        "all-MiniLM-L6-v2")
-    query_vector = embedding_model.encode(query_text).tolist()
-
-    pipeline = [
-        {
-            "$vectorSearch": {
-                "index": "vector_index",
-                "path": "text_embedding",
-                "queryVector": query_vector,
-                "exact": True,
-                "limit": inductor.hparam("vector_query_result_num", 4),
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "text": 1,
-                "metadata": 1,
-                "score": {"$meta": "vectorSearchScore"},
-            }
-        },
-    ]
-    query_result = documentation_collection.aggregate(pipeline)
+    # The query includes embedding the query text (see
+    # `_embed_query_texts`).
+    with spans.span("vector_search"):
+        query_result = _get_retriever().query(
+            [query_text], inductor.hparam("vector_query_result_num", 4))
 
     contexts = []
-    for document in query_result:
-        inductor.log(document, name="document")
+    for document in retrievers.get_documents(query_result):
+        inductor.log(document.model_dump(), name="document")
         context = (
-            "CONTEXT: " + document["text"] + "\n\n"
-            "REFERENCE: " + document["metadata"].get("url", "N/A") + "\n\n")
+            "CONTEXT: " + document.text + "\n\n"
+            "REFERENCE: " + document.metadata.get("url", "N/A") + "\n\n")
         contexts.append(context)
     contexts = "\n\n".join(contexts)
     inductor.log(contexts, name="contexts")
@@ -116,10 +171,12 @@ def documentation_qa(question: str) -> str:
     prompt = inductor.hparam("main_prompt", prompts.MAIN_PROMPT_DEFAULT)
     prompt += f"CONTEXTs:\n{contexts}"
 
-    response = openai_client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": question}],
-        model="gpt-4o")
+    with spans.span("llm") as llm_span:
+        response = openai_client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": question}],
+            model="gpt-4o")
+        llm_span.set_token_usage(response.usage)
     response = response.choices[0].message.content
     return response
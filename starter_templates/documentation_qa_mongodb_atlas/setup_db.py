@@ -1,13 +1,22 @@
 """Set up the MongoDB Atlas DB for Documentation Question-Answering (Q&A) Bot"""
+import argparse
+import concurrent.futures
+import multiprocessing
 import os
 import re
-from typing import Any, Dict, List, Optional, TypeVar, Union
+import threading
+import time
+from typing import (
+    Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar,
+    Union)
 import uuid
 
 import pydantic
 import pymongo
 from pymongo import operations
-import sentence_transformers
+
+import embedding_cache
+import vector_store
 
 
 # List of Markdown files with optional base URLs for citations
@@ -27,16 +36,108 @@ MARKDOWN_FILES = [
     # ("path/to/file_with_url.md","https://example.com/docs/file.html"),
 ]
 
-MONGO_CLIENT_URI = os.environ.get("MONGO_CLIENT_URI")
-if MONGO_CLIENT_URI is None:
-    raise ValueError(
-        "MONGO_CLIENT_URI environment variable is required to be set. "
-        "Please see the README for instructions on how to set up the "
-        "MongoDB Atlas cluster and obtain the connection URI.")
-mongodb_client = pymongo.MongoClient(MONGO_CLIENT_URI)
-documentation_collection = mongodb_client[
-        "inductor_starter_templates"]["documentation_qa"]
-embedding_model = sentence_transformers.SentenceTransformer("all-MiniLM-L6-v2")
+# Name of the Sentence-Transformers model that embeds both the nodes and the
+# app's query texts.
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# During ingestion, the nodes' texts are embedded in batches of
+# EMBEDDING_BATCH_SIZE texts (see `_embed_texts_in_batches`), as encoding a
+# batch at once is much faster than encoding each text on its own. Batches
+# are embedded in a pool of EMBEDDING_PROCESSES worker processes, each
+# loading its own copy of the embedding model, or in this process if 0.
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_PROCESSES = 0
+
+# Path of the in-process vector store of the collection, searched by the app
+# instead of running MongoDB Atlas Vector Search queries when the
+# "vector_backend" hyperparameter is "numpy" (see `vector_store.py`).
+VECTOR_STORE_PATH = "vector_store"
+
+# Pattern of a Markdown header line, capturing its level and text.
+_HEADER_PATTERN = re.compile(r"^(#+) +(.*)")
+
+
+# The MongoDB collection and the embedding models are created on first use
+# (see `get_documentation_collection` and `get_embedding_model`) rather than
+# at import time, as connecting to MongoDB and loading a model are slow.
+_documentation_collection: Optional[pymongo.collection.Collection] = None
+_documentation_collection_lock = threading.Lock()
+# Embedding models loaded so far, keyed on model name.
+_embedding_models: Dict[str, Any] = {}
+_embedding_models_lock = threading.Lock()
+
+
+def get_documentation_collection() -> pymongo.collection.Collection:
+    """Returns the MongoDB collection, connecting to MongoDB if needed.
+
+    The MongoDB client is created at most once per process, on first use.
+
+    Raises:
+        ValueError: If the MONGO_CLIENT_URI environment variable is not set.
+    """
+    global _documentation_collection  # pylint: disable=global-statement
+    with _documentation_collection_lock:
+        if _documentation_collection is None:
+            mongo_client_uri = os.environ.get("MONGO_CLIENT_URI")
+            if mongo_client_uri is None:
+                raise ValueError(
+                    "MONGO_CLIENT_URI environment variable is required to be "
+                    "set. Please see the README for instructions on how to "
+                    "set up the MongoDB Atlas cluster and obtain the "
+                    "connection URI.")
+            mongodb_client = pymongo.MongoClient(mongo_client_uri)
+            _documentation_collection = mongodb_client[
+                "inductor_starter_templates"]["documentation_qa"]
+        return _documentation_collection
+
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL_NAME):
+    """Returns the embedding model with the given name, loading it if needed.
+
+    Each model is loaded at most once per process, on first use, and is
+    shared by ingestion (`setup_db.py`) and the app's queries. A loaded model
+    has already encoded a text once, as the first encoding is slower than
+    subsequent ones. The model is safe to use from multiple threads.
+
+    Args:
+        model_name: Name of the Sentence-Transformers model.
+
+    Returns:
+        A `sentence_transformers.SentenceTransformer`.
+    """
+    with _embedding_models_lock:
+        embedding_model = _embedding_models.get(model_name)
+        if embedding_model is None:
+            # Imported here, as importing Sentence-Transformers (and
+            # PyTorch) is slow and the model is not needed for questions
+            # whose embeddings are cached.
+            # pylint: disable-next=import-outside-toplevel
+            import sentence_transformers
+            embedding_model = sentence_transformers.SentenceTransformer(
+                model_name)
+            embedding_model.encode("warm-up")
+            _embedding_models[model_name] = embedding_model
+        return embedding_model
+
+
+def embed_texts(
+    texts: Sequence[str],
+    model_name: str = EMBEDDING_MODEL_NAME) -> List[List[float]]:
+    """Returns the embeddings of texts, computing those not cached.
+
+    Texts whose embeddings are in the embedding cache (see
+    `embedding_cache.py`) are not embedded again, so the embedding model is
+    only loaded once a text is not cached.
+
+    Args:
+        texts: Texts to embed.
+        model_name: Name of the Sentence-Transformers model to embed the
+            texts with (see `get_embedding_model`).
+    """
+    return embedding_cache.get_or_compute(
+        f"sentence-transformers/{model_name}", texts,
+        lambda texts: get_embedding_model(model_name).encode(texts)
+    ).tolist()
 
 
 _T_Node = TypeVar("_T_Node", bound="_Node")  # pylint: disable=invalid-name
@@ -61,79 +162,168 @@ class _Node(pydantic.BaseModel):
     @classmethod
     def _create_embedding(
         cls: _T_Node, data: Any) -> Any:
-        """Creates an embedding for the text content if not provided."""
+        """Creates an embedding for the text content if not provided.
+
+        Embeds a single text, so that a node can be created ad hoc (e.g.
+        `_Node(text=...)`). Ingestion instead embeds the texts of all nodes
+        in batches, and provides each node's embedding.
+        """
         if isinstance(data, dict):
             if "text" in data and "text_embedding" not in data:
-                data["text_embedding"] = embedding_model.encode(
-                    data["text"]).tolist()
+                data["text_embedding"] = embed_texts([data["text"]])[0]
         return data
 
 
-def _split_markdown_by_header(text: str) -> List[str]:
+def _split_markdown_by_header(lines: Iterable[str]) -> Iterator[str]:
     """Splits a Markdown text into sections based on headers.
 
-    Divides a Markdown string into sections defined by headers, including the
+    Divides a Markdown text into sections defined by headers, including the
     header and its following content up to the next header or text end.
-    Headers within code blocks are ignored.
+    Headers within code blocks are ignored. Sections are yielded as soon as
+    they end, so a file object can be split without reading it into memory
+    at once. Sections that are empty after stripping surrounding whitespace
+    (e.g. blank lines before the first header) are skipped.
     
     Args:
-        text: Markdown text to split.
+        lines: Lines of the Markdown text to split, with or without their
+            trailing newlines (e.g. a file object opened in text mode, or
+            `text.splitlines()`).
     
-    Returns:
-        A list of strings, each containing a section of the input text.
+    Yields:
+        Each section of the input text.
     """
-    chunks = []
-    lines = text.split("\n")
     code_block = False
-    current_section = ""
+    current_section: List[str] = []
 
     for line in lines:
+        line = line.rstrip("\n")
         if line.startswith("```"):
             code_block = not code_block
-        header_match = re.match(r"^(#+) +(.*)", line)
-        if header_match and not code_block:
-            if current_section != "":
-                chunks.append(current_section.strip())
-            current_section = f"# {header_match.group(2)}\n"
-        else:
-            current_section += line + "\n"
-    return chunks
+        elif not code_block and line.startswith("#"):
+            header_match = _HEADER_PATTERN.match(line)
+            if header_match:
+                section = "\n".join(current_section).strip()
+                if section:
+                    yield section
+                current_section = [f"# {header_match.group(2)}"]
+                continue
+        current_section.append(line)
+    section = "\n".join(current_section).strip()
+    if section:
+        yield section
 
 
-def _get_nodes_from_file(
+def _get_chunks_from_file(
     file_path: str,
-    base_url: Optional[str] = None) -> List[_Node]:
-    """Extracts nodes from a Markdown file.
+    base_url: Optional[str] = None
+) -> List[Tuple[str, Optional[Dict[str, str]]]]:
+    """Extracts the chunks of a Markdown file, without embedding them.
 
-    Reads a Markdown file and splits it into nodes based on headers. Each node
-    is assigned a unique ID.
+    Reads a Markdown file and splits it into chunks based on headers.
     If a base URL is provided, it is combined with the header text to create a
-    URL for the node. This URL is added to the node's metadata.
-    
+    URL for the chunk, which is included in the chunk's metadata.
+
     Args:
         file_path: Path to the Markdown file.
-        base_url: Base URL to use for generating node URLs.
-    
+        base_url: Base URL to use for generating chunk URLs.
+
     Returns:
-        A list of Node objects, each containing a section of the input text.
+        A list of (text, metadata) tuples, one per section of the input text.
+        Metadata is None if no base URL is provided.
     """
     with open(file_path, "r", encoding="utf-8") as f:
-        text = f.read()
+        texts = list(_split_markdown_by_header(f))
 
-    chunks = _split_markdown_by_header(text)
-
-    nodes = []
-    for chunk in chunks:
+    chunks = []
+    for text in texts:
         if base_url is not None:
-            first_line = chunk.split("\n", 1)[0]
+            first_line = text.split("\n", 1)[0]
             if first_line.startswith("# "):
                 url = f"{base_url}#{'-'.join(first_line[2:].lower().split())}"
             else:
                 url = base_url
-            nodes.append(_Node(text=chunk, metadata={"url": url}))
+            chunks.append((text, {"url": url}))
         else:
-            nodes.append(_Node(text=chunk))
-    return nodes
+            chunks.append((text, None))
+    return chunks
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    """Embeds a batch of texts (in a worker process of the embedding pool)."""
+    return embed_texts(texts)
+
+
+def _embed_texts_in_batches(
+    texts: List[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    processes: int = EMBEDDING_PROCESSES) -> List[List[float]]:
+    """Embeds texts in batches, reporting progress and throughput.
+
+    Args:
+        texts: Texts to embed.
+        batch_size: Number of texts embedded at once.
+        processes: Number of worker processes that embed batches, or 0 to
+            embed them in this process.
+
+    Returns:
+        The embedding of each text, in order.
+    """
+    batches = [
+        texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    embeddings: List[List[float]] = []
+    start_time = time.perf_counter()
+
+    def report_progress(batch_embeddings: List[List[float]]):
+        embeddings.extend(batch_embeddings)
+        seconds = time.perf_counter() - start_time
+        print(f"Embedded {len(embeddings)}/{len(texts)} chunks "
+              f"({len(embeddings) / seconds:.1f} chunks/sec)",
+              end="\r", flush=True)
+
+    if processes > 0 and len(batches) > 1:
+        # Worker processes are spawned (rather than forked), as forking a
+        # process that has loaded the embedding model (and so started
+        # PyTorch's threads) is unsafe.
+        with concurrent.futures.ProcessPoolExecutor(
+            min(processes, len(batches)),
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            for batch_embeddings in executor.map(_embed_batch, batches):
+                report_progress(batch_embeddings)
+    else:
+        for batch in batches:
+            report_progress(embed_texts(batch))
+
+    seconds = time.perf_counter() - start_time
+    print(f"Embedded {len(texts)} chunks in {seconds:.2f}s "
+          f"({len(texts) / seconds if seconds else 0.0:.1f} chunks/sec).")
+    return embeddings
+
+
+def _get_nodes_from_file(
+    file_path: str,
+    base_url: Optional[str] = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE) -> List[_Node]:
+    """Extracts nodes from a Markdown file.
+
+    Reads a Markdown file and splits it into nodes based on headers (see
+    `_get_chunks_from_file`), embedding the nodes' texts in batches. Each
+    node is assigned a unique ID.
+
+    Args:
+        file_path: Path to the Markdown file.
+        base_url: Base URL to use for generating node URLs.
+        batch_size: Number of texts embedded at once.
+
+    Returns:
+        A list of Node objects, each containing a section of the input text.
+    """
+    chunks = _get_chunks_from_file(file_path, base_url)
+    embeddings = _embed_texts_in_batches(
+        [text for text, _ in chunks], batch_size=batch_size)
+    return [
+        _Node(text=text, text_embedding=embedding, metadata=metadata)
+        for (text, metadata), embedding in zip(chunks, embeddings)]
 
 
 def _create_search_index():
@@ -142,6 +332,7 @@ def _create_search_index():
     If the index already exists, updates the existing index with the latest
     definition.
     """
+    documentation_collection = get_documentation_collection()
     index_name = "text_embedding_vector_search"
     search_index_model = pymongo.operations.SearchIndexModel(
         definition={
@@ -165,38 +356,62 @@ def _create_search_index():
             index_name, search_index_model)
 
 
-def _populate_collection():
+def _populate_collection(
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    processes: int = EMBEDDING_PROCESSES):
     """Populates a database collection from a Markdown file.
     
     Deletes any existing documents in the collection before adding new ones.
 
     Reads the markdown files, defined by the MARKDOWN_FILES list, chunking the
-    text based on headers to create nodes, which are added to the collection.
-    Each node contains:
+    text based on headers. Duplicate chunks are skipped, then the texts of
+    all chunks are embedded in batches (see `_embed_texts_in_batches`) to
+    create nodes, which are added to the collection. Each node contains:
     - The text content of the chunk.
     - An embedding of the text content.
     - A unique ID.
     - A URL that is associated with the node, stored in the node's metadata.
+
+    Then writes the in-process vector store of the same nodes to
+    VECTOR_STORE_PATH.
+
+    Args:
+        batch_size: Number of texts embedded at once.
+        processes: Number of worker processes that embed batches, or 0 to
+            embed them in this process.
     """
+    documentation_collection = get_documentation_collection()
     documentation_collection.delete_many({})
 
-    nodes = []
+    chunks = []
     node_text = set()
     for entry in MARKDOWN_FILES:
         if isinstance(entry, tuple):
             file_path, base_url = entry
         else:
             file_path, base_url = entry, None
-        nodes_from_file = _get_nodes_from_file(file_path, base_url)
-        for node in nodes_from_file:
-            if node.text in node_text:
-                print(f"Duplicate node found:\n{node.text}")
+        for text, metadata in _get_chunks_from_file(file_path, base_url):
+            if text in node_text:
+                print(f"Duplicate node found:\n{text}")
                 print("Skipping duplicate node.")
                 continue
-            node_text.add(node.text)
-            nodes.append(node)
+            node_text.add(text)
+            chunks.append((text, metadata))
+
+    embeddings = _embed_texts_in_batches(
+        [text for text, _ in chunks], batch_size, processes)
+    nodes = [
+        _Node(text=text, text_embedding=embedding, metadata=metadata)
+        for (text, metadata), embedding in zip(chunks, embeddings)]
 
     documentation_collection.insert_many([node.model_dump() for node in nodes])
+    with vector_store.VectorStoreWriter(
+        VECTOR_STORE_PATH, len(nodes)) as writer:
+        writer.add(
+            [node.id for node in nodes],
+            [node.text_embedding for node in nodes],
+            [node.text for node in nodes],
+            [node.metadata for node in nodes])
 
     # Uncomment the below function call to programmatically create a MongoDB
     # Atlas Search Index for Vector Search. As of 8/6/2024, programmatic
@@ -208,4 +423,16 @@ def _populate_collection():
 
 
 if __name__ == "__main__":
-    _populate_collection()
+    parser = argparse.ArgumentParser(
+        description="Populate the MongoDB Atlas collection and the "
+                    "in-process vector store.")
+    parser.add_argument(
+        "--batch-size", type=int, default=EMBEDDING_BATCH_SIZE,
+        help="Number of sections embedded at once.")
+    parser.add_argument(
+        "--processes", type=int, default=EMBEDDING_PROCESSES,
+        help="Number of worker processes that embed batches of sections, "
+             "each loading its own copy of the embedding model (default: "
+             "embed in this process).")
+    args = parser.parse_args()
+    _populate_collection(args.batch_size, args.processes)
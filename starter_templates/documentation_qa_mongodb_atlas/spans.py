@@ -0,0 +1,263 @@
+"""Latency Spans for Documentation Question-Answering (Q&A) Bot"""
+import abc
+import collections
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional
+
+import inductor
+
+
+class SpanSink(abc.ABC):
+    """Destination for the records of finished spans."""
+
+    @abc.abstractmethod
+    def record(self, span_record: Dict[str, Any]):
+        """Records a finished span.
+
+        Args:
+            span_record: Record of the span, including its "name" and
+                "duration_seconds", as well as any attributes set on it
+                (e.g. token counts).
+        """
+
+
+class JsonlSink(SpanSink):
+    """Thread-safe sink that appends span records to a JSON Lines file."""
+
+    def __init__(self, path: str):
+        """Create a JsonlSink.
+
+        Args:
+            path: Path of the file to append span records to.
+        """
+        self.path = path
+        # pylint: disable-next=consider-using-with
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, span_record: Dict[str, Any]):
+        line = json.dumps(span_record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        """Closes the file."""
+        with self._lock:
+            self._file.close()
+
+
+class HistogramSink(SpanSink):
+    """Thread-safe sink that keeps span durations in memory, per span name.
+
+    Attributes:
+        max_samples: Maximum number of durations kept per span name. When
+            exceeded, the oldest durations are discarded.
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        """Create a HistogramSink.
+
+        Args:
+            max_samples: Maximum number of durations kept per span name.
+        """
+        self.max_samples = max_samples
+        self._durations: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span_record: Dict[str, Any]):
+        with self._lock:
+            durations = self._durations.get(span_record["name"])
+            if durations is None:
+                durations = collections.deque(maxlen=self.max_samples)
+                self._durations[span_record["name"]] = durations
+            durations.append(span_record["duration_seconds"])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Returns a summary of the recorded durations of each span name.
+
+        Returns:
+            A dictionary mapping each span name to a dictionary containing
+            the number of recorded durations ("count") and their mean
+            ("mean"), 50th ("p50"), 95th ("p95") and 99th ("p99") percentiles,
+            in seconds.
+        """
+        with self._lock:
+            durations_by_name = {
+                name: sorted(durations)
+                for name, durations in self._durations.items()}
+        return {
+            name: {
+                "count": len(durations),
+                "mean": sum(durations) / len(durations),
+                "p50": _percentile(durations, 50),
+                "p95": _percentile(durations, 95),
+                "p99": _percentile(durations, 99),
+            }
+            for name, durations in durations_by_name.items()}
+
+    def format_summary(self) -> str:
+        """Returns the summary as a table, with durations in milliseconds."""
+        lines = [
+            f"{'span':<24}{'count':>8}{'mean_ms':>10}"
+            f"{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}"]
+        for name, stats in sorted(self.summary().items()):
+            lines.append(
+                f"{name:<24}{stats['count']:>8}"
+                f"{stats['mean'] * 1000:>10.2f}{stats['p50'] * 1000:>10.2f}"
+                f"{stats['p95'] * 1000:>10.2f}{stats['p99'] * 1000:>10.2f}")
+        return "\n".join(lines)
+
+    def reset(self):
+        """Discards all recorded durations."""
+        with self._lock:
+            self._durations.clear()
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Returns the nearest-rank percentile of non-empty sorted values.
+
+    Args:
+        sorted_values: Values in ascending order.
+        pct: Percentile to return, between 0 and 100.
+    """
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Span:
+    """Timer for a stage of the app, used as a context manager.
+
+    On exit, the span's wall time (and any attributes set on it) are logged
+    via `inductor.log` (under the name "span:<span name>") and recorded in the
+    configured sink, if any.
+    """
+
+    __slots__ = ("name", "attributes", "_start_time")
+
+    def __init__(self, name: str):
+        """Create a Span.
+
+        Args:
+            name: Name of the stage (e.g. "vector_search").
+        """
+        self.name = name
+        self.attributes: Dict[str, Any] = {}
+        self._start_time = 0.0
+
+    def set(self, **attributes: Any):
+        """Sets attributes to include in the span's record."""
+        self.attributes.update(attributes)
+
+    def set_token_usage(self, usage: Optional[Any]):
+        """Sets the token counts of an LLM API call on the span.
+
+        Args:
+            usage: `usage` of an OpenAI chat completion, or None if not
+                available.
+        """
+        if usage is not None:
+            self.attributes["prompt_tokens"] = usage.prompt_tokens
+            self.attributes["completion_tokens"] = usage.completion_tokens
+
+    def __enter__(self) -> "Span":
+        self._start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        span_record = {
+            "name": self.name,
+            "duration_seconds": time.perf_counter() - self._start_time,
+            **self.attributes}
+        if exc_type is not None:
+            span_record["error"] = exc_type.__name__
+        _emit(span_record)
+
+
+class _NoOpSpan:
+    """Span returned while spans are disabled, which records nothing."""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any):
+        pass
+
+    def set_token_usage(self, usage: Optional[Any]):
+        pass
+
+    def __enter__(self) -> "_NoOpSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NO_OP_SPAN = _NoOpSpan()
+
+
+# Spans are disabled by default. While disabled, `span` returns a shared no-op
+# span, so that instrumented stages incur negligible overhead.
+_enabled = False
+_log_to_inductor = True
+_sink: Optional[SpanSink] = None
+
+
+def enable(sink: Optional[SpanSink] = None, log_to_inductor: bool = True):
+    """Enables spans.
+
+    Args:
+        sink: Sink to record spans in, if any.
+        log_to_inductor: Whether to also log spans via `inductor.log`. Should
+            be False when the app is not run via Inductor (e.g. in
+            benchmarks), as `inductor.log` is then a no-op that warns.
+    """
+    # pylint: disable-next=global-statement
+    global _enabled, _log_to_inductor, _sink
+    _sink = sink
+    _log_to_inductor = log_to_inductor
+    _enabled = True
+
+
+def disable():
+    """Disables spans."""
+    global _enabled, _sink  # pylint: disable=global-statement
+    _enabled = False
+    _sink = None
+
+
+def span(name: str):
+    """Returns a span that times a stage of the app.
+
+    Usage:
+        with spans.span("llm") as llm_span:
+            response = openai_client.chat.completions.create(...)
+            llm_span.set_token_usage(response.usage)
+
+    Args:
+        name: Name of the stage.
+    """
+    if not _enabled:
+        return _NO_OP_SPAN
+    return Span(name)
+
+
+def _emit(span_record: Dict[str, Any]):
+    """Logs a finished span and records it in the configured sink."""
+    if _log_to_inductor:
+        inductor.log(span_record, name=f"span:{span_record['name']}")
+    sink = _sink
+    if sink is not None:
+        sink.record(span_record)
+
+
+# Spans can also be enabled via environment variables: set SPANS_JSONL_PATH to
+# record spans in a JSON Lines file (as well as logging them via
+# `inductor.log`), or set SPANS_ENABLED=1 to only log them via `inductor.log`.
+if os.environ.get("SPANS_JSONL_PATH"):
+    enable(JsonlSink(os.environ["SPANS_JSONL_PATH"]))
+elif os.environ.get("SPANS_ENABLED", "").lower() in ("1", "true"):
+    enable()
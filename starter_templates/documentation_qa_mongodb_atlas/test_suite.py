@@ -180,6 +180,12 @@ test_suite.add(
         hparam_name="vector_query_result_num",
         hparam_type="NUMBER",
         values=[2, 4]),
+    # To compare MongoDB Atlas Vector Search with searching the in-process
+    # vector store (see `vector_store.py`), uncomment the following lines.
+    # inductor.HparamSpec(
+    #     hparam_name="vector_backend",
+    #     hparam_type="SHORT_STRING",
+    #     values=["mongodb_atlas", "numpy"]),
 
     # To compare different prompts with this test suite, uncomment the
     # following lines and define the prompts in the prompts.py file.
@@ -0,0 +1,281 @@
+"""In-Process Vector Store
+
+The same module is included in each template that retrieves documents by
+embedding similarity.
+"""
+import json
+import mmap
+import os
+import shutil
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Format version of the persisted store. Increment when the format changes.
+_STORE_FORMAT_VERSION = 1
+
+# Names of the files of a persisted store, within its directory.
+_META_FILE = "meta.json"
+_EMBEDDINGS_FILE = "embeddings.npy"
+_OFFSETS_FILE = "offsets.npy"
+_RECORDS_FILE = "records.jsonl"
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Returns embeddings scaled to unit length (zero vectors are kept)."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms > 0, norms, 1)
+
+
+class VectorStoreWriter:
+    """Writes a vector store to disk, in batches.
+
+    The store is written to a temporary directory, which replaces the
+    store's directory when the writer is closed without error, so a store
+    being written is never loaded. Processes that loaded the previous store
+    keep using it, as its files stay mapped until they are unmapped.
+
+    Use as a context manager:
+
+        with VectorStoreWriter(path, num_vectors) as writer:
+            writer.add(ids, embeddings, documents, metadatas)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        num_vectors: int,
+        collection_version: Optional[str] = None):
+        """Create a VectorStoreWriter.
+
+        Args:
+            path: Path of the store's directory.
+            num_vectors: Total number of vectors that will be added.
+            collection_version: Version of the vector DB collection that the
+                store is built alongside, if any.
+        """
+        self.path = path
+        self.num_vectors = num_vectors
+        self.collection_version = collection_version
+        self._temp_path = f"{path}.tmp"
+        shutil.rmtree(self._temp_path, ignore_errors=True)
+        os.makedirs(self._temp_path)
+        self._embeddings: Optional[np.ndarray] = None
+        self._records = open(
+            os.path.join(self._temp_path, _RECORDS_FILE), "wb")
+        self._offsets = [0]
+
+    def __enter__(self) -> "VectorStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._records.close()
+            shutil.rmtree(self._temp_path, ignore_errors=True)
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+        metadatas: Sequence[Optional[Dict[str, Any]]]):
+        """Adds a batch of vectors, with their documents and metadata.
+
+        Args:
+            ids: ID of each vector.
+            embeddings: Embedding of each document. Embeddings are stored
+                normalized to unit length.
+            documents: Text of each document.
+            metadatas: Metadata of each document.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        start = len(self._offsets) - 1
+        if start + len(ids) > self.num_vectors:
+            raise ValueError(
+                f"More than {self.num_vectors} vectors were added.")
+        if self._embeddings is None:
+            self._embeddings = np.lib.format.open_memmap(
+                os.path.join(self._temp_path, _EMBEDDINGS_FILE),
+                mode="w+",
+                dtype=np.float32,
+                shape=(self.num_vectors, embeddings.shape[1]))
+        self._embeddings[start:start + len(ids)] = _normalize(embeddings)
+        for record in zip(ids, documents, metadatas):
+            self._offsets.append(self._offsets[-1] + self._records.write(
+                json.dumps(record).encode("utf-8") + b"\n"))
+
+    def close(self):
+        """Finishes writing the store and replaces the previous one.
+
+        Raises:
+            ValueError: If fewer vectors than `num_vectors` were added.
+        """
+        self._records.close()
+        if len(self._offsets) - 1 != self.num_vectors:
+            raise ValueError(
+                f"{len(self._offsets) - 1} vectors were added, rather than "
+                f"{self.num_vectors}.")
+        if self._embeddings is None:
+            # No vectors were added, so their dimension is unknown.
+            np.save(
+                os.path.join(self._temp_path, _EMBEDDINGS_FILE),
+                np.zeros((0, 0), dtype=np.float32))
+        else:
+            self._embeddings.flush()
+            self._embeddings = None
+        np.save(
+            os.path.join(self._temp_path, _OFFSETS_FILE),
+            np.array(self._offsets, dtype=np.int64))
+        with open(os.path.join(self._temp_path, _META_FILE), "w",
+                  encoding="utf-8") as f:
+            f.write(json.dumps({
+                "version": _STORE_FORMAT_VERSION,
+                "collection_version": self.collection_version,
+                "num_vectors": self.num_vectors,
+            }))
+        old_path = f"{self.path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.rename(self.path, old_path)
+        os.rename(self._temp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+class VectorStore:
+    """Read-only, in-process vector store backed by memory-mapped files.
+
+    Stores unit-length float32 embeddings in a memory-mapped `.npy` file,
+    next to a store of each vector's ID, document and metadata (a JSON
+    Lines file, also memory-mapped, indexed by the byte offset of each
+    line). A query embeds the query texts and scores every vector at once,
+    with a single matrix product, selecting the top results with
+    `np.argpartition`. Search is exact, and avoids the per-query overhead
+    of a vector DB client, which dominates query latency for collections of
+    up to about ten thousand vectors (e.g. a documentation site). Larger
+    collections are faster to search with the vector DB's approximate
+    index, as search time here grows linearly with the number of vectors.
+
+    As the files are memory-mapped read-only, processes that load the same
+    store (e.g. the workers of a server) share their pages through the OS
+    page cache, rather than each holding a copy. The store is safe to query
+    from multiple threads.
+
+    Query results have the same format as the results of a Chroma
+    collection query, with squared L2 distances between the unit-length
+    embeddings (as for a Chroma collection with the default "l2" distance
+    function and normalized embeddings).
+
+    Attributes:
+        collection_version: Version of the vector DB collection that the
+            store was built alongside, if any.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedding_function: Callable[
+            [List[str]], Sequence[Sequence[float]]]):
+        """Loads a store written by `VectorStoreWriter`.
+
+        Args:
+            path: Path of the store's directory.
+            embedding_function: Function used to embed query texts. Must be
+                the embedding function that the stored documents were
+                embedded with.
+
+        Raises:
+            FileNotFoundError: If the store does not exist.
+            ValueError: If the store was written in an unsupported format.
+        """
+        with open(os.path.join(path, _META_FILE), "r",
+                  encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != _STORE_FORMAT_VERSION:
+            raise ValueError(
+                "Unsupported vector store format version: "
+                f"{meta.get('version')}")
+        self.collection_version = meta["collection_version"]
+        self._embedding_function = embedding_function
+        self._embeddings = np.load(
+            os.path.join(path, _EMBEDDINGS_FILE),
+            mmap_mode="r" if meta["num_vectors"] else None)
+        self._offsets = np.load(
+            os.path.join(path, _OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(path, _RECORDS_FILE), "rb") as f:
+            self._records = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if self._offsets[-1] else b"")
+
+    def __len__(self) -> int:
+        """Returns the number of vectors in the store."""
+        return len(self._offsets) - 1
+
+    def _get_record(self, index: int) -> List[Any]:
+        """Returns the [ID, document, metadata] of a vector."""
+        return json.loads(
+            self._records[self._offsets[index]:self._offsets[index + 1]])
+
+    def query(
+        self,
+        query_texts: Optional[List[str]] = None,
+        n_results: int = 10,
+        query_embeddings: Optional[Sequence[Sequence[float]]] = None
+    ) -> Dict[str, Any]:
+        """Returns the documents nearest to each query.
+
+        Args:
+            query_texts: Texts to query the store with. Either these or
+                `query_embeddings` must be given.
+            n_results: Maximum number of results per query.
+            query_embeddings: Embeddings to query the store with, instead of
+                embedding query texts.
+
+        Returns:
+            The nearest documents, in the format of a Chroma collection query
+            result, with one list of results per query.
+        """
+        if query_embeddings is None:
+            query_embeddings = self._embedding_function(query_texts)
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        result = {"ids": [], "documents": [], "metadatas": [],
+                  "distances": []}
+        n_results = min(n_results, len(self))
+        if n_results <= 0:
+            for values in result.values():
+                values.extend([] for _ in queries)
+            return result
+
+        # Cosine similarity of each query with each stored vector.
+        similarities = queries @ self._embeddings.T
+        if n_results < len(self):
+            top_indices = np.argpartition(
+                -similarities, n_results - 1, axis=1)[:, :n_results]
+        else:
+            top_indices = np.broadcast_to(
+                np.arange(len(self)), similarities.shape)
+        top_similarities = np.take_along_axis(
+            similarities, top_indices, axis=1)
+        order = np.argsort(-top_similarities, axis=1, kind="stable")
+        top_indices = np.take_along_axis(top_indices, order, axis=1)
+        top_similarities = np.take_along_axis(top_similarities, order, axis=1)
+        for indices, query_similarities in zip(top_indices, top_similarities):
+            records = [self._get_record(index) for index in indices]
+            result["ids"].append([record[0] for record in records])
+            result["documents"].append([record[1] for record in records])
+            result["metadatas"].append([record[2] for record in records])
+            result["distances"].append(
+                [float(2 - 2 * similarity)
+                 for similarity in query_similarities])
+        return result
+
+
+def exists(path: str) -> bool:
+    """Returns whether a store was written to the given directory.
+
+    Args:
+        path: Path of the store's directory.
+    """
+    return os.path.exists(os.path.join(path, _META_FILE))
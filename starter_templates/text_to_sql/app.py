@@ -9,6 +9,7 @@ import openai
 
 import database
 import prompts
+import spans
 
 
 openai_client = openai.OpenAI()
@@ -21,7 +22,8 @@ def generate_sql(analytics_text: str) -> str:
         analytics_text: Input text describing a data analytics question or
             request.
     """
-    db_schema = database.get_sql_schema()
+    with spans.span("schema_reflection"):
+        db_schema = database.get_sql_schema()
     db_type = database.sql_database_type
     prompt = textwrap.dedent(f"""\
     Given the following {db_type} Database Table Schema:
@@ -38,14 +40,16 @@ def generate_sql(analytics_text: str) -> str:
     *Only* return the raw SQL statement
     """)
 
-    completion = openai_client.chat.completions.create(
-        model=inductor.hparam("model", "gpt-4o"),
-        messages=[
-            {"role": "system",
-                "content": prompts.SYSTEM_PROMPT_DEFAULT},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    with spans.span("sql_generation") as sql_generation_span:
+        completion = openai_client.chat.completions.create(
+            model=inductor.hparam("model", "gpt-4o"),
+            messages=[
+                {"role": "system",
+                    "content": prompts.SYSTEM_PROMPT_DEFAULT},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        sql_generation_span.set_token_usage(completion.usage)
     raw_sql = completion.choices[0].message.content
     inductor.log(raw_sql)
     return raw_sql
@@ -102,10 +106,13 @@ def get_analytics_results(analytics_text: str) -> Dict[str, Any]:
     processed_sql = _process_generated_sql(raw_sql)
     output["processed_sql"] = processed_sql
 
-    if database.is_valid_sql(processed_sql):
+    with spans.span("sql_validation"):
+        valid_sql = database.is_valid_sql(processed_sql)
+    if valid_sql:
         output["valid_sql"] = True
-        columns, results = (
-            database.get_sql_results_headers_and_values(processed_sql))
+        with spans.span("sql_execution"):
+            columns, results = (
+                database.get_sql_results_headers_and_values(processed_sql))
         output["column_headers"] = columns
         output["results"] = results
     else:
@@ -0,0 +1,303 @@
+"""Minimal ASGI Server for Text to SQL LLM App"""
+import asyncio
+import concurrent.futures
+import json
+from typing import (
+    Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple)
+
+
+# Signature of the ASGI `send` callable.
+_Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class BadRequestError(ValueError):
+    """Raised by handlers when a request body is invalid."""
+
+
+def get_field(
+    request: Dict[str, Any], name: str, expected_type: type = str) -> Any:
+    """Returns a field of a request body.
+
+    Args:
+        request: Request body.
+        name: Name of the field.
+        expected_type: Expected type of the field's value.
+
+    Raises:
+        BadRequestError: If the field is missing or has the wrong type.
+    """
+    if name not in request:
+        raise BadRequestError(f"Missing request field: {name}")
+    value = request[name]
+    if not isinstance(value, expected_type):
+        raise BadRequestError(
+            f"Request field {name} must be of type {expected_type.__name__}")
+    return value
+
+
+class Endpoint:
+    """HTTP endpoint that calls an app function.
+
+    Endpoints accept POST requests with a JSON object body, which is passed to
+    the endpoint's handler. If the body contains `"stream": true` and the
+    endpoint has a stream handler, the response is streamed as plain text
+    (using chunked transfer encoding) as it is generated.
+
+    Handlers are (blocking) app functions, which are called in a worker
+    thread so that they are logged by `inductor.logger` as usual. Handlers
+    should raise `BadRequestError` for invalid request bodies, which results
+    in a 400 status code (rather than 500).
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Any],
+        stream_handler: Optional[
+            Callable[[Dict[str, Any]], Iterator[str]]] = None):
+        """Create an Endpoint.
+
+        Args:
+            handler: Function that returns a JSON-serializable response for
+                a request body.
+            stream_handler: Optional function that returns an iterator over
+                text deltas of the response for a request body.
+        """
+        self.handler = handler
+        self.stream_handler = stream_handler
+
+
+class App:
+    """ASGI application that serves a set of endpoints.
+
+    At most `max_concurrency` requests are handled at once. Further requests
+    wait for a free slot, up to `max_pending` waiting requests, beyond which
+    requests are rejected with a 503 status code (so that clients can back
+    off or retry on another worker rather than time out).
+
+    `GET /healthz` returns 200 once the app has started.
+    """
+
+    def __init__(
+        self,
+        endpoints: Dict[str, Endpoint],
+        max_concurrency: int = 16,
+        max_pending: int = 64,
+        on_startup: Optional[Callable[[], None]] = None):
+        """Create an App.
+
+        Args:
+            endpoints: Maps each endpoint's path (e.g. "/documentation_qa")
+                to the endpoint.
+            max_concurrency: Maximum number of requests handled at once.
+            max_pending: Maximum number of requests waiting to be handled.
+            on_startup: Optional function called (in a worker thread) when
+                the server starts, before it accepts requests (e.g. to warm
+                up the app).
+        """
+        self.endpoints = endpoints
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.on_startup = on_startup
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="asgi")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._num_pending = 0
+
+    async def __call__(
+        self,
+        scope: Dict[str, Any],
+        receive: Callable[[], Awaitable[Dict[str, Any]]],
+        send: _Send):
+        if scope["type"] == "lifespan":
+            await self._handle_lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._handle_http(scope, receive, send)
+
+    async def _handle_lifespan(
+        self,
+        receive: Callable[[], Awaitable[Dict[str, Any]]],
+        send: _Send):
+        """Handles the ASGI lifespan protocol."""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    if self.on_startup is not None:
+                        await asyncio.get_running_loop().run_in_executor(
+                            self._executor, self.on_startup)
+                except Exception as error:  # pylint: disable=broad-except
+                    await send({
+                        "type": "lifespan.startup.failed",
+                        "message": f"{type(error).__name__}: {error}"})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle_http(
+        self,
+        scope: Dict[str, Any],
+        receive: Callable[[], Awaitable[Dict[str, Any]]],
+        send: _Send):
+        """Handles an HTTP request."""
+        path = scope["path"]
+        if path == "/healthz":
+            await _send_json(send, 200, {"status": "ok"})
+            return
+        endpoint = self.endpoints.get(path)
+        if endpoint is None:
+            await _send_json(send, 404, {"error": f"Not found: {path}"})
+            return
+        if scope["method"] != "POST":
+            await _send_json(send, 405, {"error": "Method not allowed."})
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        try:
+            request = json.loads(body)
+        except json.JSONDecodeError:
+            request = None
+        if not isinstance(request, dict):
+            await _send_json(
+                send, 400, {"error": "Request body must be a JSON object."})
+            return
+
+        if self._semaphore.locked() and self._num_pending >= self.max_pending:
+            await _send_json(
+                send, 503, {"error": "Server is overloaded."},
+                headers=[(b"retry-after", b"1")])
+            return
+        self._num_pending += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._num_pending -= 1
+        try:
+            if request.get("stream") and endpoint.stream_handler is not None:
+                await self._stream_response(
+                    endpoint.stream_handler, request, send)
+            else:
+                await self._respond(endpoint.handler, request, send)
+        finally:
+            self._semaphore.release()
+
+    async def _respond(
+        self,
+        handler: Callable[[Dict[str, Any]], Any],
+        request: Dict[str, Any],
+        send: _Send):
+        """Sends the JSON response of a handler."""
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(
+                self._executor, handler, request)
+        except BadRequestError as error:
+            await _send_json(send, 400, {"error": str(error)})
+            return
+        except Exception as error:  # pylint: disable=broad-except
+            await _send_json(
+                send, 500, {"error": f"{type(error).__name__}: {error}"})
+            return
+        await _send_json(send, 200, response)
+
+    async def _stream_response(
+        self,
+        stream_handler: Callable[[Dict[str, Any]], Iterator[str]],
+        request: Dict[str, Any],
+        send: _Send):
+        """Streams the text deltas of a stream handler's response.
+
+        The handler's iterator is consumed in a single worker thread (as
+        `inductor.logger` logs the response once the iterator is exhausted),
+        which passes the deltas to the event loop through a queue.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for delta in stream_handler(request):
+                    loop.call_soon_threadsafe(queue.put_nowait, delta)
+            except Exception as error:  # pylint: disable=broad-except
+                loop.call_soon_threadsafe(queue.put_nowait, error)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = loop.run_in_executor(self._executor, produce)
+        item = await queue.get()
+        # Errors raised before the first delta (e.g. during retrieval) are
+        # reported with an error status code, as the response has not yet
+        # started.
+        if isinstance(item, Exception):
+            if isinstance(item, BadRequestError):
+                await _send_json(send, 400, {"error": str(item)})
+            else:
+                await _send_json(
+                    send, 500, {"error": f"{type(item).__name__}: {item}"})
+            await producer
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+        while item is not done:
+            if isinstance(item, Exception):
+                # The response has already started, so the error can only be
+                # reported by ending it early.
+                break
+            await send({
+                "type": "http.response.body",
+                "body": item.encode("utf-8"),
+                "more_body": True})
+            item = await queue.get()
+        await send({"type": "http.response.body", "body": b""})
+        await producer
+
+
+async def _send_json(
+    send: _Send,
+    status: int,
+    value: Any,
+    headers: Optional[List[Tuple[bytes, bytes]]] = None):
+    """Sends a complete JSON response."""
+    body = json.dumps(value, default=str).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            *(headers or [])]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def serve(
+    app: App,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    keep_alive: float = 5.0):
+    """Serves an app with Uvicorn until interrupted.
+
+    Args:
+        app: The app to serve.
+        host: Host to bind to.
+        port: Port to bind to.
+        keep_alive: Number of seconds to keep idle HTTP connections open, so
+            that clients sending many requests reuse connections.
+    """
+    # Imported here, as Uvicorn is only needed to serve the app (and other
+    # ASGI servers can serve `App`s too).
+    import uvicorn  # pylint: disable=import-outside-toplevel
+    uvicorn.run(
+        app,
+        host=host,
+        port=port,
+        timeout_keep_alive=keep_alive,
+        lifespan="on")
@@ -0,0 +1,73 @@
+"""ASGI Server for Text to SQL LLM App
+
+Serves `get_analytics_results` over HTTP:
+
+    POST /get_analytics_results
+        {"analytics_text": "Show me the three most expensive products"}
+        -> The analytics results (see `app.get_analytics_results`).
+
+Responses are not streamed: the analytics results hold the rows returned by
+running the generated SQL query, which can only be run once the LLM has
+generated all of it.
+
+Usage:
+    python server.py --port 8000 --max-concurrency 16
+    curl localhost:8000/get_analytics_results \\
+        -d '{"analytics_text": "Show me the three most expensive products"}'
+
+Other ASGI servers can serve the app created by `create_app` (e.g. `uvicorn
+--factory server:create_app`).
+"""
+import argparse
+from typing import Any, Dict
+
+import app
+import asgi
+
+
+def _get_analytics_results(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Handles an analytics request."""
+    return app.get_analytics_results(
+        asgi.get_field(request, "analytics_text"))
+
+
+def create_app(max_concurrency: int = 16, max_pending: int = 64) -> asgi.App:
+    """Returns the ASGI app serving the text to SQL app.
+
+    Args:
+        max_concurrency: Maximum number of requests handled at once.
+        max_pending: Maximum number of requests waiting to be handled,
+            beyond which requests are rejected with a 503 status code.
+    """
+    return asgi.App(
+        {"/get_analytics_results": asgi.Endpoint(_get_analytics_results)},
+        max_concurrency=max_concurrency,
+        max_pending=max_pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to.")
+    parser.add_argument(
+        "--port", type=int, default=8000, help="Port to bind to.")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=16,
+        help="Maximum number of requests handled at once.")
+    parser.add_argument(
+        "--max-pending", type=int, default=64,
+        help="Maximum number of requests waiting to be handled.")
+    parser.add_argument(
+        "--keep-alive", type=float, default=5.0,
+        help="Number of seconds to keep idle HTTP connections open.")
+    args = parser.parse_args()
+    asgi.serve(
+        create_app(args.max_concurrency, args.max_pending),
+        host=args.host,
+        port=args.port,
+        keep_alive=args.keep_alive)
+
+
+if __name__ == "__main__":
+    main()